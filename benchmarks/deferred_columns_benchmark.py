@@ -0,0 +1,120 @@
+# Confronto prima/dopo delle colonne differite (gruppi details, profile e notes) su un dataset
+# SQLite generato al volo. "Prima" carica le istanze con undefer_group, cioè come quando i testi
+# lunghi facevano parte di ogni SELECT; "dopo" usa la mappatura attuale. I casi misurati sono
+# quelli che caricano le entità senza leggerne i testi: risposte annidate (preset brief),
+# verifiche di esistenza e aggiornamenti di pochi campi.
+#
+#   python benchmarks/deferred_columns_benchmark.py [--rows 2000] [--text-size 4000] [--repeat 5]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import undefer_group
+from src.models.user import db, User
+from src.models.company.company import Company
+from src.models.company.job_posting import Application, JobPosting
+from src.utils.serializers import serialize_many
+from datetime import datetime, timedelta
+import argparse
+import time
+import tracemalloc
+
+def seed(rows, text_size):
+    text = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * (text_size // 56 + 1))[:text_size]
+    now = datetime(2026, 1, 1, 9, 30)
+    companies = [Company(
+        name=f'Azienda {i}', slug=f'azienda-{i}', email=f'info{i}@example.com', password='x',
+        description=text, mission=text, culture=text, benefits=text, locations='["Milano"]'
+    ) for i in range(max(rows // 20, 1))]
+    db.session.add_all(companies)
+    user = User(username='candidato', email='candidato@example.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    job_postings = [JobPosting(
+        company_id=companies[i % len(companies)].id, title=f'Sviluppatore Python {i}', slug=f'sviluppatore-python-{i}',
+        description=text, requirements=text, responsibilities=text, benefits=text, application_instructions=text,
+        location='Milano', job_type='full-time', experience_level='mid', is_published=True,
+        publish_date=now, expiry_date=now + timedelta(days=30)
+    ) for i in range(rows)]
+    db.session.add_all(job_postings)
+    db.session.flush()
+    db.session.add_all(Application(
+        job_posting_id=job_posting.id, user_id=user.id, cover_letter=text, company_notes=text, status='pending'
+    ) for job_posting in job_postings)
+    db.session.commit()
+
+class SelectWidth:
+    # Numero massimo di colonne nelle SELECT eseguite
+    def __init__(self):
+        self.columns = 0
+
+    def __enter__(self):
+        event.listen(db.engine, 'after_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(db.engine, 'after_cursor_execute', self._record)
+
+    def _record(self, connection, cursor, statement, parameters, context, executemany):
+        if cursor.description:
+            self.columns = max(self.columns, len(cursor.description))
+
+def loaded_bytes(instances):
+    # Dimensione dei valori di colonna caricati nelle istanze (i dati ricevuti dal database)
+    return sum(len(str(value)) for instance in instances for key, value in instance.__dict__.items()
+               if not key.startswith('_') and value is not None)
+
+def measure(load, consume, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        consume(load())
+        best = min(best, time.perf_counter() - start)
+    db.session.expunge_all()
+    tracemalloc.start()
+    consume(load())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.expunge_all()
+    with SelectWidth() as width:
+        instances = load()
+        consume(instances)
+    size = loaded_bytes(instances)
+    db.session.expunge_all()
+    return best, peak, width.columns, size
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--text-size', type=int, default=4000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        seed(args.rows, args.text_size)
+        print(f'annunci: {args.rows} - caratteri per colonna di testo: {args.text_size}')
+
+        cases = (
+            ('JobPosting brief (annidati)', JobPosting, 'details', lambda instances: serialize_many(instances, 'brief')),
+            ('Company brief (annidati)', Company, 'profile', lambda instances: serialize_many(instances, 'brief')),
+            ('Application status', Application, 'notes', lambda instances: [application.status for application in instances]),
+        )
+        for label, model, group, consume in cases:
+            print(f'\n{label}')
+            results = {}
+            for name, options in (('prima', [undefer_group(group)]), ('dopo', [])):
+                seconds, peak, columns, size = measure(lambda: model.query.options(*options).all(), consume, args.repeat)
+                results[name] = seconds
+                print(f'  {name:<6} {seconds * 1000:9.2f} ms  picco memoria {peak / 1024 / 1024:8.2f} MiB  '
+                      f'colonne {columns:3d}  dati caricati {size / 1024 / 1024:8.2f} MiB')
+            print(f'  x{results["prima"] / results["dopo"]:.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# Prova delle connessioni agli stream di eventi (SSE) con gunicorn e il worker gevent di
+# gunicorn.conf.py. Avvia un solo worker, apre molte connessioni inattive sullo stream di un
+# utente e verifica che:
+# - il worker non crei un thread per connessione (thread del processo prima e dopo)
+# - una richiesta normale risponda subito anche con tutte le connessioni aperte
+# - un nuovo messaggio arrivi a tutte le connessioni
+# Esce con errore se una delle condizioni non è rispettata.
+#
+# Usa un database SQLite temporaneo; richiede gunicorn e gevent (requirements.txt).
+#
+#   python benchmarks/event_stream_connections.py [--connections 500]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.user import db, User
+from src.models.company.company import Company, CompanyUser
+from src.models.company.communication import Conversation
+from src.routes.company import company_section_bp
+from src.routes.user import user_bp
+from src.utils.event_stream import event_broker
+from src.utils.events import event_bus
+from datetime import datetime
+import argparse
+import http.client
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Applicazione caricata dal worker gunicorn ('benchmarks.event_stream_connections:create_app()')
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['EVENT_STREAM_DATABASE_URL']
+    app.config['EVENT_STREAM_HEARTBEAT'] = 5
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(company_section_bp)
+    db.init_app(app)
+    event_broker.init_app(app)
+    event_bus.init_app(app)
+    return app
+
+def seed():
+    company = Company(name='Azienda eventi', slug='azienda-eventi', email='events@example.com', password='x')
+    user = User(username='eventi', email='eventi@example.com', password='x')
+    db.session.add_all([company, user])
+    db.session.flush()
+    company_user = CompanyUser(company_id=company.id, email='recruiter@example.com', password='x',
+                               first_name='Mario', last_name='Rossi', role='admin')
+    conversation = Conversation(user_id=user.id, company_id=company.id, last_message_at=datetime.utcnow())
+    db.session.add_all([company_user, conversation])
+    db.session.commit()
+    return user.id, company_user.id, conversation.id
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn non si è avviato')
+
+def worker_pid(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as children:
+        return int(children.read().split()[0])
+
+def thread_count(pid):
+    return len(os.listdir(f'/proc/{pid}/task'))
+
+def open_stream(port, user_id):
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f'GET /api/users/{user_id}/events HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n'.encode())
+    return sock
+
+# Legge dal socket finché non riceve marker (o scade il timeout)
+def read_until(sock, marker, timeout):
+    sock.settimeout(timeout)
+    received = b''
+    while marker not in received:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        received += chunk
+    return received
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    start = time.perf_counter()
+    connection.request('GET', path)
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status, time.perf_counter() - start
+
+def post_message(port, conversation_id, company_user_id):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    body = f'{{"sender_type": "company", "sender_id": {company_user_id}, "content": "Ciao"}}'
+    connection.request('POST', f'/api/conversations/{conversation_id}/messages', body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=500)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='event-stream-')
+    database_url = f'sqlite:///{os.path.join(directory, "events.sqlite3")}?timeout=30'
+    os.environ['EVENT_STREAM_DATABASE_URL'] = database_url
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, company_user_id, conversation_id = seed()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--bind', f'127.0.0.1:{port}', '--workers', '1', '--worker-connections', str(args.connections + 100),
+         'benchmarks.event_stream_connections:create_app()'],
+        cwd=ROOT, env=dict(os.environ, EVENT_STREAM_DATABASE_URL=database_url)
+    )
+    streams = []
+    try:
+        wait_for_server(port)
+        status, elapsed = get(port, f'/api/users/{user_id}')
+        assert status == 200, f'GET utente: {status}'
+        worker = worker_pid(server.pid)
+        threads_before = thread_count(worker)
+
+        start = time.perf_counter()
+        for _ in range(args.connections):
+            streams.append(open_stream(port, user_id))
+        for sock in streams:
+            assert b'retry:' in read_until(sock, b'retry:', 10), 'stream non avviato'
+        print(f'{args.connections} stream aperti in {time.perf_counter() - start:.2f}s')
+
+        time.sleep(1)
+        threads_after = thread_count(worker)
+        print(f'thread del worker: {threads_before} prima, {threads_after} con gli stream aperti')
+        assert threads_after - threads_before < 10, 'il worker usa un thread per connessione'
+
+        status, elapsed = get(port, f'/api/users/{user_id}')
+        print(f'GET utente con gli stream aperti: {status} in {elapsed * 1000:.1f}ms')
+        assert status == 200 and elapsed < 1, 'richiesta normale bloccata dagli stream'
+
+        start = time.perf_counter()
+        assert post_message(port, conversation_id, company_user_id) == 201, 'invio del messaggio fallito'
+        delivered = sum(b'event: message' in read_until(sock, b'event: message', 10) for sock in streams)
+        print(f'messaggio consegnato a {delivered}/{args.connections} stream in {time.perf_counter() - start:.2f}s')
+        assert delivered == args.connections, 'messaggio non consegnato a tutti gli stream'
+
+        print(f'\nok: {args.connections} stream inattivi su un worker gevent senza un thread per connessione')
+    finally:
+        for sock in streams:
+            sock.close()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# Confronto prima/dopo dell'anteprima salvata e del testo compresso dei messaggi, su due file
+# SQLite generati con lo stesso dataset (per default un milione di messaggi, una parte lunghi
+# come i messaggi dei recruiter con la descrizione dell'annuncio incollata):
+# - prima: testo in una colonna TEXT, anteprima calcolata in Python dal testo completo
+# - dopo: mappatura attuale (colonna preview e testo compresso oltre COMPRESSION_THRESHOLD)
+# Misura la dimensione della tabella, la lettura delle anteprime di una pagina della casella
+# (ultimo messaggio di 50 conversazioni) e, per trasparenza, la lettura di una pagina di
+# messaggi completi, che dopo la modifica paga la decompressione.
+#
+#   python benchmarks/message_storage_benchmark.py [--messages 1000000] [--long-ratio 0.2] [--repeat 200]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.user import db
+from src.models.company.communication import Message, make_preview
+from src.utils.compression import COMPRESSION_THRESHOLD, decompress_text
+from datetime import datetime
+import argparse
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+MESSAGES_PER_CONVERSATION = 20
+INBOX_PAGE = 50
+BATCH_SIZE = 10000
+
+SHORT_MESSAGES = [
+    'Buongiorno, grazie per la candidatura. Possiamo sentirci domani alle 10?',
+    'Certo, va benissimo. A domani!',
+    'Le invio in allegato il programma del colloquio tecnico.',
+    'Ho aggiornato il CV con l\'ultima esperienza, lo trova nel profilo.',
+]
+
+JOB_DESCRIPTION = (
+    'Siamo alla ricerca di uno sviluppatore backend Python da inserire nel team piattaforma. '
+    'Responsabilità: progettazione e sviluppo di API REST con Flask e SQLAlchemy, ottimizzazione '
+    'delle query su MySQL, revisione del codice e mentoring dei colleghi junior. Requisiti: almeno '
+    'tre anni di esperienza con Python, conoscenza di SQL e dei sistemi di code, buona conoscenza '
+    'della lingua inglese. Offriamo contratto a tempo indeterminato, lavoro ibrido, buoni pasto, '
+    'formazione continua e budget annuale per conferenze. '
+)
+
+def generate_messages(count, long_ratio, seed=42):
+    rng = random.Random(seed)
+    for id in range(1, count + 1):
+        if rng.random() < long_ratio:
+            # Messaggio con la descrizione dell'annuncio incollata (2-8 KB)
+            content = f'Gentile candidato, ecco i dettagli della posizione ({id}).\n' + JOB_DESCRIPTION * rng.randint(4, 16)
+        else:
+            content = f'{rng.choice(SHORT_MESSAGES)} ({id})'
+        yield (id, (id - 1) // MESSAGES_PER_CONVERSATION + 1, 'company' if id % 2 else 'user', 1, content)
+
+def seed_before(path, count, long_ratio):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE message (id INTEGER PRIMARY KEY, conversation_id INTEGER NOT NULL, sender_type VARCHAR(20) NOT NULL, '
+        'sender_id INTEGER NOT NULL, content TEXT NOT NULL, created_at DATETIME)'
+    )
+    connection.execute('CREATE INDEX ix_message_conversation_id_id ON message (conversation_id, id)')
+    now = datetime(2026, 1, 1).isoformat(' ')
+    batch = []
+    for row in generate_messages(count, long_ratio):
+        batch.append(row + (now,))
+        if len(batch) >= BATCH_SIZE:
+            connection.executemany('INSERT INTO message VALUES (?, ?, ?, ?, ?, ?)', batch)
+            batch = []
+    connection.executemany('INSERT INTO message VALUES (?, ?, ?, ?, ?, ?)', batch)
+    connection.commit()
+    connection.execute('VACUUM')
+    connection.close()
+
+def seed_after(count, long_ratio):
+    # Tabella creata dalla mappatura attuale; il tipo della colonna comprime i testi lunghi
+    Message.__table__.create(db.engine)
+    insert = Message.__table__.insert()
+    now = datetime(2026, 1, 1)
+    batch = []
+    for id, conversation_id, sender_type, sender_id, content in generate_messages(count, long_ratio):
+        batch.append({'id': id, 'conversation_id': conversation_id, 'sender_type': sender_type, 'sender_id': sender_id,
+                      'content': content, 'preview': make_preview(content), 'created_at': now})
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(insert, batch)
+            batch = []
+    if batch:
+        db.session.execute(insert, batch)
+    db.session.commit()
+    db.session.execute(db.text('VACUUM'))
+
+def timed(function, pages, repeat):
+    samples = []
+    for index in range(repeat):
+        start = time.perf_counter()
+        function(pages[index % len(pages)])
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--long-ratio', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='message-storage-')
+    before_path = os.path.join(directory, 'before.sqlite3')
+    after_path = os.path.join(directory, 'after.sqlite3')
+
+    start = time.perf_counter()
+    seed_before(before_path, args.messages, args.long_ratio)
+    print(f'prima: {args.messages} messaggi generati in {time.perf_counter() - start:.1f} s')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{after_path}'
+    db.init_app(app)
+    with app.app_context():
+        start = time.perf_counter()
+        seed_after(args.messages, args.long_ratio)
+        print(f'dopo: {args.messages} messaggi generati in {time.perf_counter() - start:.1f} s '
+              f'(soglia di compressione {COMPRESSION_THRESHOLD} byte)')
+
+        before_size = os.path.getsize(before_path)
+        after_size = os.path.getsize(after_path)
+        print(f'\ndimensione tabella (file dopo VACUUM)\n  prima {before_size / 1024 / 1024:9.1f} MiB\n'
+              f'  dopo  {after_size / 1024 / 1024:9.1f} MiB  x{before_size / after_size:.2f}')
+
+        conversations = max(args.messages // MESSAGES_PER_CONVERSATION, 1)
+        rng = random.Random(7)
+        pages = [rng.sample(range(1, conversations + 1), min(INBOX_PAGE, conversations)) for _ in range(50)]
+        placeholders = ', '.join('?' * INBOX_PAGE)
+        # Stesso percorso di lettura (sqlite3 senza ORM) per i due file: si misura solo l'effetto
+        # dello schema; dopo, la decompressione è quella del tipo CompressedText
+        before = sqlite3.connect(before_path)
+        after = sqlite3.connect(after_path)
+
+        # Casella: anteprima dell'ultimo messaggio di ogni conversazione della pagina
+        def inbox_before(page):
+            rows = before.execute(
+                f'SELECT conversation_id, content FROM message WHERE id IN (SELECT MAX(id) FROM message '
+                f'WHERE conversation_id IN ({placeholders}) GROUP BY conversation_id)', page
+            ).fetchall()
+            return {conversation_id: make_preview(content) for conversation_id, content in rows}
+
+        def inbox_after(page):
+            rows = after.execute(
+                f'SELECT conversation_id, preview FROM message WHERE id IN (SELECT MAX(id) FROM message '
+                f'WHERE conversation_id IN ({placeholders}) GROUP BY conversation_id)', page
+            ).fetchall()
+            return dict(rows)
+
+        # Pagina di una conversazione con i testi completi
+        def conversation_before(page):
+            rows = before.execute('SELECT id, content FROM message WHERE conversation_id = ? ORDER BY id', (page[0],)).fetchall()
+            return [content for id, content in rows]
+
+        def conversation_after(page):
+            rows = after.execute('SELECT id, content FROM message WHERE conversation_id = ? ORDER BY id', (page[0],)).fetchall()
+            return [decompress_text(content) for id, content in rows]
+
+        for label, cases in (
+            (f'casella ({INBOX_PAGE} conversazioni, solo anteprime)', (inbox_before, inbox_after)),
+            (f'conversazione ({MESSAGES_PER_CONVERSATION} messaggi completi)', (conversation_before, conversation_after)),
+        ):
+            print(f'\n{label}')
+            results = {}
+            for name, function in zip(('prima', 'dopo'), cases):
+                median, p95 = timed(function, pages, args.repeat)
+                results[name] = median
+                print(f'  {name:<6} mediana {median * 1000:8.3f} ms  p95 {p95 * 1000:8.3f} ms')
+            print(f'  x{results["prima"] / results["dopo"]:.2f}')
+        before.close()
+        after.close()
+
+    shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
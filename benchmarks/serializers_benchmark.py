@@ -0,0 +1,126 @@
+# Micro-benchmark della serializzazione: to_dict scritti a mano + json della libreria standard
+# (com'era prima) contro serializzatori compilati + FastJSONProvider, su pagine da 1.000 righe
+# di JobPosting e Application. Non serve un database: le istanze sono create in memoria con
+# tutte le colonne valorizzate, come quelle caricate da una query.
+#
+#   python benchmarks/serializers_benchmark.py [--rows 1000] [--repeat 20]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from src.models.company.job_posting import Application, JobPosting
+from src.utils.json_provider import FastJSONProvider, orjson
+from src.utils.serializers import serialize_many
+from datetime import datetime, timedelta
+import argparse
+import time
+
+def legacy_job_posting_to_dict(self):
+    return {
+        'id': self.id,
+        'company_id': self.company_id,
+        'title': self.title,
+        'slug': self.slug,
+        'description': self.description,
+        'requirements': self.requirements,
+        'responsibilities': self.responsibilities,
+        'location': self.location,
+        'is_remote': self.is_remote,
+        'is_hybrid': self.is_hybrid,
+        'job_type': self.job_type,
+        'experience_level': self.experience_level,
+        'salary_min': self.salary_min,
+        'salary_max': self.salary_max,
+        'salary_currency': self.salary_currency,
+        'salary_period': self.salary_period,
+        'benefits': self.benefits,
+        'skills': self.skills,
+        'application_url': self.application_url,
+        'application_email': self.application_email,
+        'application_instructions': self.application_instructions,
+        'is_published': self.is_published,
+        'is_featured': self.is_featured,
+        'views_count': self.views_count,
+        'applications_count': self.applications_count,
+        'publish_date': self.publish_date.isoformat() if self.publish_date else None,
+        'expiry_date': self.expiry_date.isoformat() if self.expiry_date else None,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+def legacy_application_to_dict(self):
+    return {
+        'id': self.id,
+        'job_posting_id': self.job_posting_id,
+        'user_id': self.user_id,
+        'cover_letter': self.cover_letter,
+        'resume_url': self.resume_url,
+        'status': self.status,
+        'company_notes': self.company_notes,
+        'rating': self.rating,
+        'is_archived': self.is_archived,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+def make_job_postings(rows):
+    now = datetime(2026, 1, 1, 9, 30)
+    return [JobPosting(
+        id=i, company_id=i % 50, title=f'Sviluppatore Python {i}', slug=f'sviluppatore-python-{i}',
+        description='Sviluppo di API REST con Flask e SQLAlchemy. ' * 8, requirements='Python, SQL, Git',
+        responsibilities='Progettare, sviluppare e mantenere servizi', location='Milano', is_remote=i % 2 == 0,
+        is_hybrid=False, job_type='full-time', experience_level='mid', salary_min=35000, salary_max=50000,
+        salary_currency='EUR', salary_period='yearly', benefits='Buoni pasto', skills='["python", "flask", "sql"]',
+        application_url=None, application_email=f'jobs{i}@example.com', application_instructions=None,
+        is_published=True, is_featured=False, views_count=i * 3, applications_count=i,
+        publish_date=now, expiry_date=now + timedelta(days=30), created_at=now
+    ) for i in range(rows)]
+
+def make_applications(rows):
+    now = datetime(2026, 1, 1, 9, 30)
+    return [Application(
+        id=i, job_posting_id=i % 100, user_id=i, cover_letter='Gentile azienda, ' * 20, resume_url=f'/cv/{i}.pdf',
+        status='pending', company_notes=None, rating=None, is_archived=False, created_at=now
+    ) for i in range(rows)]
+
+def measure(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    legacy_json = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+    print(f'orjson: {"sì" if orjson else "no (fallback json)"} - righe per pagina: {args.rows}')
+
+    for name, objects, legacy_to_dict in (
+        ('JobPosting', make_job_postings(args.rows), legacy_job_posting_to_dict),
+        ('Application', make_applications(args.rows), legacy_application_to_dict)
+    ):
+        # Il risultato deve essere identico prima di confrontare i tempi
+        assert [legacy_to_dict(obj) for obj in objects] == serialize_many(objects)
+        cases = (
+            ('to_dict scritto a mano', lambda: [legacy_to_dict(obj) for obj in objects]),
+            ('serializzatore compilato', lambda: serialize_many(objects)),
+            ('a mano + json', lambda: legacy_json.dumps({'items': [legacy_to_dict(obj) for obj in objects]})),
+            ('compilato + FastJSONProvider', lambda: fast_json.dumps({'items': serialize_many(objects)}))
+        )
+        print(f'\n{name}')
+        baseline = None
+        for label, function in cases:
+            seconds = measure(function, args.repeat)
+            if baseline is None or label == 'a mano + json':
+                baseline = seconds
+            print(f'  {label:<30} {seconds * 1000:8.2f} ms/pagina  {args.rows / seconds:12,.0f} righe/s  x{baseline / seconds:.2f}')
+
+if __name__ == '__main__':
+    main()
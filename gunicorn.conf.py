@@ -0,0 +1,22 @@
+# Configurazione di gunicorn per la produzione:
+#
+#   gunicorn -c gunicorn.conf.py src.main:app
+#
+# Worker gevent: ogni richiesta è una greenlet e non un thread del sistema operativo, quindi le
+# connessioni agli stream di eventi (SSE) in attesa del prossimo evento costano solo un socket
+# e qualche KB di memoria. Il worker applica il monkey patching di gevent (socket, threading,
+# time) prima di importare l'applicazione: PyMySQL, le Condition dell'EventBroker e i thread
+# in background (broadcaster, contatore delle visualizzazioni, event bus) diventano cooperativi.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gevent'
+# Connessioni contemporanee per worker, stream di eventi compresi
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+# Con gevent il timeout controlla solo che il worker risponda, non la durata delle richieste:
+# gli stream di eventi restano aperti
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+# Niente preload: l'applicazione deve essere importata dopo il monkey patching del worker
+preload_app = False
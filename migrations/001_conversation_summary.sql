@@ -0,0 +1,12 @@
+-- Riepilogo denormalizzato delle conversazioni (ultimo messaggio e non letti per lato)
+-- Dopo l'esecuzione popolare i valori con: flask --app src.main rebuild-conversation-summaries
+
+ALTER TABLE conversation
+    ADD COLUMN last_message_id INT NULL,
+    ADD COLUMN last_message_preview VARCHAR(120) NULL,
+    ADD COLUMN last_message_sender_type VARCHAR(20) NULL,
+    ADD COLUMN last_message_sender_id INT NULL,
+    ADD COLUMN last_message_is_read TINYINT(1) NULL DEFAULT 0,
+    ADD COLUMN user_unread_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN company_unread_count INT NOT NULL DEFAULT 0,
+    ALGORITHM=INPLACE, LOCK=NONE;
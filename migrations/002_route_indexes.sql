@@ -0,0 +1,26 @@
+-- Indici secondari e compositi per i filtri e gli ORDER BY delle route
+-- ALGORITHM=INPLACE, LOCK=NONE: costruzione online, senza bloccare letture e scritture
+
+ALTER TABLE job_posting
+    ADD INDEX ix_job_posting_is_published_company_id (is_published, company_id),
+    ADD INDEX ix_job_posting_company_id_is_published (company_id, is_published),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE application
+    ADD INDEX ix_application_job_posting_id_created_at (job_posting_id, created_at),
+    ADD INDEX ix_application_user_id_created_at (user_id, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE application_activity
+    ADD INDEX ix_application_activity_application_id_created_at (application_id, created_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE message
+    ADD INDEX ix_message_conversation_id_created_at (conversation_id, created_at),
+    ADD INDEX ix_message_conversation_id_sender_type_is_read (conversation_id, sender_type, is_read),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE conversation
+    ADD INDEX ix_conversation_company_id_last_message_at (company_id, last_message_at),
+    ADD INDEX ix_conversation_user_id_last_message_at (user_id, last_message_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
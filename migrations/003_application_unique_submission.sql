@@ -0,0 +1,7 @@
+-- Vincolo di unicità sulle candidature: una sola candidatura per utente e annuncio.
+-- Prima di applicarlo verificare l'assenza di duplicati:
+--   SELECT job_posting_id, user_id, COUNT(*) FROM application GROUP BY job_posting_id, user_id HAVING COUNT(*) > 1;
+
+ALTER TABLE application
+    ADD CONSTRAINT uq_application_job_posting_id_user_id UNIQUE (job_posting_id, user_id),
+    ALGORITHM=INPLACE, LOCK=NONE;
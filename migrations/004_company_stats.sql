@@ -0,0 +1,14 @@
+-- Tabella aggregata delle statistiche aziendali (usata con COMPANY_STATS_ROLLUP = True).
+-- Le righe vengono calcolate alla prima lettura, non serve popolarla in anticipo.
+
+CREATE TABLE company_stats (
+    company_id INT NOT NULL,
+    job_postings_count INT NOT NULL DEFAULT 0,
+    active_job_postings_count INT NOT NULL DEFAULT 0,
+    total_applications_count INT NOT NULL DEFAULT 0,
+    total_views_count INT NOT NULL DEFAULT 0,
+    next_expiry_at DATETIME NULL,
+    updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (company_id),
+    CONSTRAINT company_stats_ibfk_1 FOREIGN KEY (company_id) REFERENCES company (id)
+);
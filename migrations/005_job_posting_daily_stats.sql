@@ -0,0 +1,10 @@
+-- Serie storiche giornaliere per annuncio (visualizzazioni e candidature)
+
+CREATE TABLE job_posting_daily_stats (
+    job_posting_id INT NOT NULL,
+    day DATE NOT NULL,
+    views_count INT NOT NULL DEFAULT 0,
+    applications_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_posting_id, day),
+    CONSTRAINT job_posting_daily_stats_ibfk_1 FOREIGN KEY (job_posting_id) REFERENCES job_posting (id)
+);
@@ -0,0 +1,10 @@
+-- Indici per le esportazioni in streaming: filtro per updated_since e ordinamento per updated_at
+-- ALGORITHM=INPLACE, LOCK=NONE: costruzione online, senza bloccare letture e scritture
+
+ALTER TABLE job_posting
+    ADD INDEX ix_job_posting_company_id_updated_at (company_id, updated_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE application
+    ADD INDEX ix_application_job_posting_id_updated_at (job_posting_id, updated_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
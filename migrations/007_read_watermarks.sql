@@ -0,0 +1,52 @@
+-- Watermark di lettura per partecipante al posto del flag is_read di ogni messaggio.
+-- Message.is_read diventa derivato: un messaggio è letto se il suo id non supera il
+-- watermark dell'altro partecipante.
+
+ALTER TABLE conversation
+    ADD COLUMN user_last_read_message_id INT NULL,
+    ADD COLUMN user_last_read_at DATETIME NULL,
+    ADD COLUMN company_last_read_message_id INT NULL,
+    ADD COLUMN company_last_read_at DATETIME NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE message
+    ADD INDEX ix_message_conversation_id_sender_type_id (conversation_id, sender_type, id),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Back-fill dai flag esistenti. Il watermark di un lato è il messaggio precedente al primo non
+-- letto dell'altro lato oppure, se sono tutti letti, l'ultimo. I messaggi letti fuori ordine
+-- dopo il primo non letto tornano quindi non letti.
+
+UPDATE conversation c
+LEFT JOIN (
+    SELECT conversation_id, MIN(id) AS first_unread_id
+    FROM message WHERE sender_type = 'company' AND COALESCE(is_read, 0) = 0
+    GROUP BY conversation_id
+) unread ON unread.conversation_id = c.id
+LEFT JOIN (
+    SELECT conversation_id, MAX(id) AS last_id
+    FROM message WHERE sender_type = 'company'
+    GROUP BY conversation_id
+) received ON received.conversation_id = c.id
+SET c.user_last_read_message_id = COALESCE(unread.first_unread_id - 1, received.last_id);
+
+UPDATE conversation c
+LEFT JOIN (
+    SELECT conversation_id, MIN(id) AS first_unread_id
+    FROM message WHERE sender_type = 'user' AND COALESCE(is_read, 0) = 0
+    GROUP BY conversation_id
+) unread ON unread.conversation_id = c.id
+LEFT JOIN (
+    SELECT conversation_id, MAX(id) AS last_id
+    FROM message WHERE sender_type = 'user'
+    GROUP BY conversation_id
+) received ON received.conversation_id = c.id
+SET c.company_last_read_message_id = COALESCE(unread.first_unread_id - 1, received.last_id);
+
+-- L'indice sul flag non serve più. La colonna is_read resta finché sono in esecuzione
+-- versioni precedenti dell'applicazione e potrà essere rimossa con una migrazione successiva.
+ALTER TABLE message
+    DROP INDEX ix_message_conversation_id_sender_type_is_read,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Dopo l'esecuzione riallineare i non letti con: flask --app src.main rebuild-conversation-summaries
@@ -0,0 +1,10 @@
+-- Delta dei messaggi per id (after_id/before_id) e sincronizzazione delle conversazioni
+
+ALTER TABLE message
+    ADD INDEX ix_message_conversation_id_id (conversation_id, id),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE conversation
+    ADD COLUMN updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD INDEX ix_conversation_user_id_updated_at (user_id, updated_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
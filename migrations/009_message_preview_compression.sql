@@ -0,0 +1,19 @@
+-- Anteprima dei messaggi scritta all'invio e testo compresso oltre la soglia
+
+ALTER TABLE message
+    ADD COLUMN preview VARCHAR(120) NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Anteprima dei messaggi esistenti (stessa regola di make_preview: 100 caratteri più '...')
+UPDATE message
+SET preview = IF(CHAR_LENGTH(content) > 100, CONCAT(LEFT(content, 100), '...'), content)
+WHERE preview IS NULL;
+
+-- Il testo diventa binario: i valori esistenti restano in chiaro (UTF-8) e vengono letti così
+-- come sono. La conversione ricostruisce la tabella (ALGORITHM=COPY): da eseguire in una
+-- finestra di manutenzione o con uno strumento di modifica online dello schema.
+ALTER TABLE message
+    MODIFY content MEDIUMBLOB NOT NULL;
+
+-- Infine comprimere i testi lunghi già presenti con: flask compress-messages
+-- e recuperare lo spazio con: OPTIMIZE TABLE message;
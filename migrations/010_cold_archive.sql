@@ -0,0 +1,41 @@
+-- Archiviazione a freddo di messaggi e attività delle candidature (flask archive-cold-data)
+
+-- Limite dell'archivio per conversazione e per candidatura: le righe con id fino a questo
+-- valore sono nelle tabelle *_archive
+ALTER TABLE conversation
+    ADD COLUMN archived_through_message_id INT NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE application
+    ADD COLUMN archived_through_activity_id INT NULL,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Tabelle fredde con gli stessi id delle tabelle principali e righe compresse
+CREATE TABLE message_archive (
+    id INT NOT NULL,
+    conversation_id INT NOT NULL,
+    sender_type VARCHAR(20) NOT NULL,
+    sender_id INT NOT NULL,
+    content MEDIUMBLOB NOT NULL,
+    preview VARCHAR(120) NULL,
+    created_at DATETIME NULL,
+    archived_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    KEY ix_message_archive_conversation_id_id (conversation_id, id),
+    FOREIGN KEY (conversation_id) REFERENCES conversation (id)
+) ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE application_activity_archive (
+    id INT NOT NULL,
+    application_id INT NOT NULL,
+    company_user_id INT NULL,
+    activity_type VARCHAR(50) NOT NULL,
+    description TEXT NOT NULL,
+    metadata TEXT NULL,
+    created_at DATETIME NULL,
+    archived_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    KEY ix_application_activity_archive_application_id_created_at (application_id, created_at),
+    FOREIGN KEY (application_id) REFERENCES application (id),
+    FOREIGN KEY (company_user_id) REFERENCES company_user (id)
+) ROW_FORMAT=COMPRESSED;
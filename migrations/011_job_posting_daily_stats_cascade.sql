@@ -0,0 +1,6 @@
+-- Le righe giornaliere seguono l'annuncio: senza ON DELETE CASCADE un annuncio con almeno una
+-- visualizzazione non si poteva più eliminare
+
+ALTER TABLE job_posting_daily_stats
+    DROP FOREIGN KEY job_posting_daily_stats_ibfk_1,
+    ADD CONSTRAINT job_posting_daily_stats_ibfk_1 FOREIGN KEY (job_posting_id) REFERENCES job_posting (id) ON DELETE CASCADE;
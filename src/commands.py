@@ -0,0 +1,76 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from src.models.user import db
+from src.models.company.communication import compress_message_contents, rebuild_conversation_summaries
+from src.utils.archive import archive_application_activities, archive_messages
+from src.utils.query_plans import check_query_plans
+from src.utils.search import job_posting_search
+
+# Comando per ricalcolare il riepilogo delle conversazioni (ultimo messaggio e non letti)
+@click.command('rebuild-conversation-summaries')
+@click.option('--conversation-id', 'conversation_ids', type=int, multiple=True, help='Limita il ricalcolo alle conversazioni indicate')
+@click.option('--batch-size', default=500, show_default=True, help='Conversazioni elaborate per transazione')
+@with_appcontext
+def rebuild_conversation_summaries_command(conversation_ids, batch_size):
+    count = rebuild_conversation_summaries(conversation_ids=list(conversation_ids), batch_size=batch_size)
+    click.echo(f'{count} conversazioni aggiornate')
+
+# Comando per comprimere i testi dei messaggi esistenti dopo la migrazione 009
+@click.command('compress-messages')
+@click.option('--batch-size', default=1000, show_default=True, help='Messaggi letti per transazione')
+@with_appcontext
+def compress_messages_command(batch_size):
+    count = compress_message_contents(batch_size=batch_size)
+    click.echo(f'{count} messaggi compressi')
+
+# Comando per spostare nelle tabelle di archivio i messaggi letti e vecchi e le attività delle
+# candidature chiuse (da eseguire periodicamente, ad esempio ogni notte)
+@click.command('archive-cold-data')
+@click.option('--messages-older-than', default=365, show_default=True, help='Giorni dopo i quali i messaggi letti vengono archiviati')
+@click.option('--archived-conversations-older-than', default=30, show_default=True, help='Stessa soglia per le conversazioni archiviate da entrambi')
+@click.option('--activities-older-than', default=180, show_default=True, help='Giorni dalla chiusura della candidatura')
+@click.option('--batch-size', default=100, show_default=True, help='Conversazioni o candidature elaborate per transazione')
+@click.option('--pause', default=0.0, show_default=True, help='Secondi di pausa tra una transazione e la successiva')
+@with_appcontext
+def archive_cold_data_command(messages_older_than, archived_conversations_older_than, activities_older_than, batch_size, pause):
+    messages = archive_messages(messages_older_than, archived_conversations_older_than, batch_size, pause)
+    activities = archive_application_activities(activities_older_than, batch_size, pause)
+    click.echo(f'{messages} messaggi e {activities} attività archiviati')
+
+# Comando per ricostruire da zero l'indice di ricerca degli annunci e salvarne lo snapshot
+@click.command('rebuild-search-index')
+@click.option('--path', default=None, help='File dello snapshot (predefinito: SEARCH_INDEX_PATH)')
+@with_appcontext
+def rebuild_search_index_command(path):
+    count = job_posting_search.rebuild()
+    path = path or current_app.config.get('SEARCH_INDEX_PATH')
+    if path:
+        job_posting_search.save_snapshot(path)
+        click.echo(f'{count} annunci indicizzati, snapshot salvato in {path}')
+    else:
+        click.echo(f'{count} annunci indicizzati (nessuno snapshot configurato)')
+
+# Comando di regressione sui piani di esecuzione: chiama tutti gli endpoint GET, esegue EXPLAIN
+# su ogni SELECT generata (MySQL) e fallisce se trova full scan o filesort
+@click.command('check-query-plans')
+@click.option('--ignore-table', 'ignored_tables', multiple=True, help='Tabelle da non segnalare (es. tabelle di dimensione fissa)')
+@with_appcontext
+def check_query_plans_command(ignored_tables):
+    if db.engine.dialect.name != 'mysql':
+        raise click.ClickException('Il controllo dei piani di esecuzione richiede un database MySQL')
+    failures = check_query_plans(current_app._get_current_object(), ignored_tables)
+    for endpoint, url, statement, problems in failures:
+        click.echo(f'{endpoint} {url}: {", ".join(problems)}')
+        click.echo(f'    {" ".join(statement.split())}')
+    if failures:
+        raise click.ClickException(f'{len(failures)} query con piani di esecuzione non indicizzati')
+    click.echo('Nessun full scan o filesort trovato')
+
+# Registra tutti i comandi CLI dell'applicazione
+def register_commands(app):
+    app.cli.add_command(rebuild_conversation_summaries_command)
+    app.cli.add_command(compress_messages_command)
+    app.cli.add_command(archive_cold_data_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(check_query_plans_command)
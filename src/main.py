@@ -7,18 +7,43 @@ from flask import Flask, send_from_directory
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.company import company_section_bp
+from src.routes.system import system_bp
+from src.commands import register_commands
+from src.utils.cache_backends import broadcaster
+from src.utils.entity_cache import entity_cache
+from src.utils.event_stream import event_broker
+from src.utils.events import event_bus
+from src.utils.json_provider import FastJSONProvider
+from src.utils.view_counter import view_counter
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+app.json = FastJSONProvider(app)
 
 # Registrazione dei blueprint
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(company_section_bp)  # Il prefisso '/api' è già incluso nel blueprint
+app.register_blueprint(system_bp, url_prefix='/api')
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{os.getenv('DB_USERNAME', 'root')}:{os.getenv('DB_PASSWORD', 'password')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '3306')}/{os.getenv('DB_NAME', 'mydb')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connessioni in UTC: NOW() e i default delle colonne usano lo stesso orologio (UTC) dei
+# watermark di esportazione e sincronizzazione e delle date ricevute dai client
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'init_command': "SET time_zone = '+00:00'"}}
+
+# Cache condivise tra i worker: 'memory' (default), 'sqlite' o 'redis'
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+app.config['CACHE_SQLITE_PATH'] = os.getenv('CACHE_SQLITE_PATH')
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
 db.init_app(app)
+view_counter.init_app(app)
+entity_cache.init_app(app)
+broadcaster.init_app(app)
+event_broker.init_app(app)
+event_bus.init_app(app)
+register_commands(app)
 with app.app_context():
     db.create_all()
 
@@ -1,30 +1,53 @@
+from sqlalchemy.orm import validates
 from src.models.user import db
+from src.utils.compression import COMPRESSED_PREFIX, COMPRESSION_THRESHOLD, CompressedText, decompress_text
+from src.utils.serializers import serialize
 from datetime import datetime
 
 class Message(db.Model):
+    __table_args__ = (
+        db.Index('ix_message_conversation_id_created_at', 'conversation_id', 'created_at'),
+        # Delta per id (after_id/before_id) e sincronizzazione
+        db.Index('ix_message_conversation_id_id', 'conversation_id', 'id'),
+        # Non letti: messaggi di un mittente con id oltre il watermark di lettura dell'altro lato
+        db.Index('ix_message_conversation_id_sender_type_id', 'conversation_id', 'sender_type', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
     sender_type = db.Column(db.String(20), nullable=False)  # "user" o "company"
     sender_id = db.Column(db.Integer, nullable=False)  # user_id o company_user_id
-    content = db.Column(db.Text, nullable=False)
-    is_read = db.Column(db.Boolean, default=False)
+    # Testo completo, compresso oltre la soglia e caricato solo quando serve (gruppo body):
+    # riepiloghi e verifiche usano l'anteprima
+    content = db.deferred(db.Column(CompressedText, nullable=False), group='body')
+    # Anteprima scritta all'invio insieme al testo
+    preview = db.Column(db.String(120), nullable=True)
+    # is_read non è più una colonna: deriva dal watermark di lettura della conversazione
+    # (definito dopo Conversation)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     
     def __repr__(self):
         return f'<Message {self.id}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'conversation_id': self.conversation_id,
-            'sender_type': self.sender_type,
-            'sender_id': self.sender_id,
-            'content': self.content,
-            'is_read': self.is_read,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    @validates('content')
+    def validate_content(self, key, content):
+        self.preview = make_preview(content) if content is not None else None
+        return content
+    
+    serialize_fields = (
+        'id', 'conversation_id', 'sender_type', 'sender_id', 'content', 'is_read', 'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
 
 class Conversation(db.Model):
+    __table_args__ = (
+        db.Index('ix_conversation_company_id_last_message_at', 'company_id', 'last_message_at'),
+        db.Index('ix_conversation_user_id_last_message_at', 'user_id', 'last_message_at'),
+        db.Index('ix_conversation_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
@@ -33,7 +56,25 @@ class Conversation(db.Model):
     is_archived_by_user = db.Column(db.Boolean, default=False)
     is_archived_by_company = db.Column(db.Boolean, default=False)
     last_message_at = db.Column(db.DateTime, nullable=True)
+    # Riepilogo denormalizzato dell'ultimo messaggio e dei non letti, aggiornato ad ogni invio/lettura
+    last_message_id = db.Column(db.Integer, nullable=True)
+    last_message_preview = db.Column(db.String(120), nullable=True)
+    last_message_sender_type = db.Column(db.String(20), nullable=True)
+    last_message_sender_id = db.Column(db.Integer, nullable=True)
+    last_message_is_read = db.Column(db.Boolean, default=False)
+    # Watermark di lettura per partecipante: ultimo messaggio letto (tutti i precedenti
+    # dell'altro lato risultano letti) e quando
+    user_last_read_message_id = db.Column(db.Integer, nullable=True)
+    user_last_read_at = db.Column(db.DateTime, nullable=True)
+    company_last_read_message_id = db.Column(db.Integer, nullable=True)
+    company_last_read_at = db.Column(db.DateTime, nullable=True)
+    user_unread_count = db.Column(db.Integer, nullable=False, default=0)  # messaggi dell'azienda non letti dall'utente
+    company_unread_count = db.Column(db.Integer, nullable=False, default=0)  # messaggi dell'utente non letti dall'azienda
+    # I messaggi con id fino a questo sono stati spostati in message_archive
+    archived_through_message_id = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # Cambia con ogni modifica della conversazione (nuovi messaggi, letture, archiviazioni)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     
     # Relazioni
     messages = db.relationship('Message', backref='conversation', lazy=True)
@@ -41,18 +82,215 @@ class Conversation(db.Model):
     def __repr__(self):
         return f'<Conversation {self.id}>'
     
-    def to_dict(self):
+    def record_message(self, message):
+        # Aggiorna il riepilogo con un nuovo messaggio (già inserito con flush)
+        self.last_message_id = message.id
+        self.last_message_preview = message.preview
+        self.last_message_sender_type = message.sender_type
+        self.last_message_sender_id = message.sender_id
+        self.last_message_is_read = False
+        self.last_message_at = datetime.utcnow()
+        # Incremento lato SQL per non perdere aggiornamenti concorrenti
+        if message.sender_type == 'user':
+            self.company_unread_count = Conversation.company_unread_count + 1
+        else:
+            self.user_unread_count = Conversation.user_unread_count + 1
+    
+    def record_message_read(self, message):
+        # Avanza il watermark del destinatario fino al messaggio (mai all'indietro): anche i
+        # precedenti risultano letti. I non letti rimasti si contano sull'indice
+        # (conversation_id, sender_type, id). Da chiamare con la riga della conversazione bloccata.
+        if message.sender_type == 'user':
+            watermark = max(self.company_last_read_message_id or 0, message.id)
+        else:
+            watermark = max(self.user_last_read_message_id or 0, message.id)
+        unread_count = db.session.query(db.func.count(Message.id)).filter(
+            Message.conversation_id == self.id,
+            Message.sender_type == message.sender_type,
+            Message.id > watermark
+        ).scalar()
+        now = datetime.utcnow()
+        if message.sender_type == 'user':
+            self.company_last_read_message_id = watermark
+            self.company_last_read_at = now
+            self.company_unread_count = unread_count
+        else:
+            self.user_last_read_message_id = watermark
+            self.user_last_read_at = now
+            self.user_unread_count = unread_count
+        if self.last_message_id and self.last_message_sender_type == message.sender_type and self.last_message_id <= watermark:
+            self.last_message_is_read = True
+    
+    def record_conversation_read(self, reader_type):
+        # Porta il watermark del lettore all'ultimo messaggio e azzera i suoi non letti.
+        # Il valore è letto lato SQL, nello stesso UPDATE, per non perdere messaggi concorrenti.
+        now = datetime.utcnow()
+        if reader_type == 'user':
+            self.user_last_read_message_id = Conversation.last_message_id
+            self.user_last_read_at = now
+            self.user_unread_count = 0
+        else:
+            self.company_last_read_message_id = Conversation.last_message_id
+            self.company_last_read_at = now
+            self.company_unread_count = 0
+        if self.last_message_sender_type and self.last_message_sender_type != reader_type:
+            self.last_message_is_read = True
+    
+    def last_message_summary(self):
+        if not self.last_message_id:
+            return None
         return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'company_id': self.company_id,
-            'job_posting_id': self.job_posting_id,
-            'subject': self.subject,
-            'is_archived_by_user': self.is_archived_by_user,
-            'is_archived_by_company': self.is_archived_by_company,
-            'last_message_at': self.last_message_at.isoformat() if self.last_message_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'id': self.last_message_id,
+            'content': self.last_message_preview,
+            'sender_type': self.last_message_sender_type,
+            'is_read': self.last_message_is_read,
+            'created_at': self.last_message_at.isoformat() if self.last_message_at else None
         }
+    
+    serialize_fields = (
+        'id', 'user_id', 'company_id', 'job_posting_id', 'subject', 'is_archived_by_user',
+        'is_archived_by_company', 'last_message_at', 'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
+
+# Message.is_read per compatibilità con le API: un messaggio è letto se il suo id non supera
+# il watermark di lettura dell'altro partecipante. Calcolato nella stessa SELECT dei messaggi
+# (ricerca per chiave primaria della conversazione).
+Message.is_read = db.column_property(
+    db.type_coerce(
+        db.select(db.case(
+            (Message.sender_type == 'user', Message.id <= db.func.coalesce(Conversation.company_last_read_message_id, 0)),
+            else_=Message.id <= db.func.coalesce(Conversation.user_last_read_message_id, 0)
+        )).where(Conversation.id == Message.conversation_id).correlate_except(Conversation).scalar_subquery(),
+        db.Boolean
+    )
+)
+
+# Messaggi già letti da entrambi i partecipanti, spostati dall'archiviazione
+# (src/utils/archive.py): stesse colonne e stessi id di Message, righe compresse su MySQL.
+# Per ogni conversazione sono sempre i messaggi con id fino a archived_through_message_id.
+class ArchivedMessage(db.Model):
+    __tablename__ = 'message_archive'
+    __table_args__ = (
+        db.Index('ix_message_archive_conversation_id_id', 'conversation_id', 'id'),
+        {'mysql_row_format': 'COMPRESSED'},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
+    sender_type = db.Column(db.String(20), nullable=False)
+    sender_id = db.Column(db.Integer, nullable=False)
+    content = db.deferred(db.Column(CompressedText, nullable=False), group='body')
+    preview = db.Column(db.String(120), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+    # Si archiviano solo messaggi letti e i watermark di lettura non tornano mai indietro
+    is_read = db.column_property(db.literal(True, db.Boolean))
+    
+    def __repr__(self):
+        return f'<ArchivedMessage {self.id}>'
+    
+    serialize_fields = Message.serialize_fields
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
+
+# Messaggi di una conversazione, compresi quelli archiviati (UNION ALL delle due tabelle,
+# filtrate ciascuna sul proprio indice). Gli elementi sono istanze di Message in sola lettura.
+def conversation_messages_query(conversation):
+    if conversation.archived_through_message_id is None:
+        return Message.query.filter_by(conversation_id=conversation.id)
+    columns = ('id', 'conversation_id', 'sender_type', 'sender_id', 'content', 'preview', 'created_at')
+    messages = db.union_all(
+        db.select(*[Message.__table__.c[name] for name in columns]).where(Message.conversation_id == conversation.id),
+        db.select(*[ArchivedMessage.__table__.c[name] for name in columns]).where(ArchivedMessage.conversation_id == conversation.id)
+    ).subquery('conversation_messages')
+    entity = db.aliased(Message, messages)
+    # Filtro ripetuto all'esterno: la query risulta filtrata anche per le stime del totale
+    return db.session.query(entity).filter(entity.conversation_id == conversation.id)
+
+# Funzione di utilità per generare l'anteprima di un messaggio
+def make_preview(content):
+    return content[:100] + '...' if len(content) > 100 else content
+
+# Ricalcola il riepilogo delle conversazioni a partire dalla tabella Message (e dall'archivio
+# per le conversazioni senza messaggi recenti)
+def rebuild_conversation_summaries(conversation_ids=None, batch_size=500):
+    query = db.session.query(Conversation.id).order_by(Conversation.id)
+    if conversation_ids:
+        query = query.filter(Conversation.id.in_(conversation_ids))
+    ids = [row[0] for row in query.all()]
+    
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        
+        # Ultimo messaggio di ogni conversazione del blocco
+        last_ids = db.session.query(db.func.max(Message.id)).filter(
+            Message.conversation_id.in_(chunk)
+        ).group_by(Message.conversation_id)
+        last_messages = {message.conversation_id: message for message in Message.query.filter(Message.id.in_(last_ids))}
+        
+        # Conversazioni con tutti i messaggi archiviati: l'ultimo è nella tabella fredda
+        archived_chunk = [conversation_id for conversation_id in chunk if conversation_id not in last_messages]
+        if archived_chunk:
+            archived_last_ids = db.session.query(db.func.max(ArchivedMessage.id)).filter(
+                ArchivedMessage.conversation_id.in_(archived_chunk)
+            ).group_by(ArchivedMessage.conversation_id)
+            last_messages.update(
+                (message.conversation_id, message) for message in ArchivedMessage.query.filter(ArchivedMessage.id.in_(archived_last_ids))
+            )
+        
+        # Non letti per conversazione e tipo di mittente
+        unread_counts = dict(((conversation_id, sender_type), count) for conversation_id, sender_type, count in db.session.query(
+            Message.conversation_id, Message.sender_type, db.func.count(Message.id)
+        ).filter(
+            Message.conversation_id.in_(chunk),
+            Message.is_read == False
+        ).group_by(Message.conversation_id, Message.sender_type))
+        
+        for conversation in Conversation.query.filter(Conversation.id.in_(chunk)):
+            last_message = last_messages.get(conversation.id)
+            conversation.last_message_id = last_message.id if last_message else None
+            conversation.last_message_preview = last_message.preview if last_message else None
+            conversation.last_message_sender_type = last_message.sender_type if last_message else None
+            conversation.last_message_sender_id = last_message.sender_id if last_message else None
+            conversation.last_message_is_read = bool(last_message and last_message.is_read)
+            if last_message and not conversation.last_message_at:
+                conversation.last_message_at = last_message.created_at
+            conversation.user_unread_count = unread_counts.get((conversation.id, 'company'), 0)
+            conversation.company_unread_count = unread_counts.get((conversation.id, 'user'), 0)
+        
+        db.session.commit()
+    
+    return len(ids)
+
+# Comprime i testi dei messaggi scritti prima della colonna compressa (oltre la soglia),
+# a blocchi di id con una transazione per blocco
+def compress_message_contents(batch_size=1000):
+    # Valore salvato così com'è, senza decompressione
+    raw_content = db.type_coerce(Message.content, db.LargeBinary)
+    update = Message.__table__.update().where(Message.__table__.c.id == db.bindparam('message_id')).values(content=db.bindparam('content'))
+    last_id = 0
+    compressed = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Message.id, raw_content)
+            .where(Message.id > last_id, db.func.length(raw_content) >= COMPRESSION_THRESHOLD)
+            .order_by(Message.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = [{'message_id': id, 'content': decompress_text(raw)} for id, raw in rows if raw[:1] != COMPRESSED_PREFIX]
+        if values:
+            db.session.execute(update, values)
+            compressed += len(values)
+        db.session.commit()
+    
+    return compressed
 
 class RecruitingEvent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -77,23 +315,13 @@ class RecruitingEvent(db.Model):
     def __repr__(self):
         return f'<RecruitingEvent {self.title}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'company_id': self.company_id,
-            'title': self.title,
-            'description': self.description,
-            'event_type': self.event_type,
-            'location': self.location,
-            'is_virtual': self.is_virtual,
-            'virtual_link': self.virtual_link,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
-            'max_participants': self.max_participants,
-            'registration_deadline': self.registration_deadline.isoformat() if self.registration_deadline else None,
-            'is_published': self.is_published,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'company_id', 'title', 'description', 'event_type', 'location', 'is_virtual', 'virtual_link',
+        'start_date', 'end_date', 'max_participants', 'registration_deadline', 'is_published', 'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
 
 class EventRegistration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -106,15 +334,12 @@ class EventRegistration(db.Model):
     def __repr__(self):
         return f'<EventRegistration {self.id}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'event_id': self.event_id,
-            'user_id': self.user_id,
-            'status': self.status,
-            'registration_date': self.registration_date.isoformat() if self.registration_date else None,
-            'notes': self.notes
-        }
+    serialize_fields = (
+        'id', 'event_id', 'user_id', 'status', 'registration_date', 'notes'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
 
 class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -136,20 +361,10 @@ class Invoice(db.Model):
     def __repr__(self):
         return f'<Invoice {self.invoice_number}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'company_id': self.company_id,
-            'invoice_number': self.invoice_number,
-            'amount': float(self.amount),
-            'currency': self.currency,
-            'status': self.status,
-            'payment_method': self.payment_method,
-            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'description': self.description,
-            'billing_address': self.billing_address,
-            'tax_id': self.tax_id,
-            'vat_rate': float(self.vat_rate) if self.vat_rate else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'company_id', 'invoice_number', 'amount', 'currency', 'status', 'payment_method',
+        'payment_date', 'due_date', 'description', 'billing_address', 'tax_id', 'vat_rate', 'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
@@ -1,4 +1,5 @@
 from src.models.user import db
+from src.utils.serializers import serialize
 from datetime import datetime
 
 class Company(db.Model):
@@ -12,12 +13,13 @@ class Company(db.Model):
     industry = db.Column(db.String(100), nullable=True)
     size = db.Column(db.String(50), nullable=True)  # es. "1-10", "11-50", "51-200", "201-500", "501+"
     founded_year = db.Column(db.Integer, nullable=True)
-    description = db.Column(db.Text, nullable=True)
-    mission = db.Column(db.Text, nullable=True)
-    culture = db.Column(db.Text, nullable=True)
-    benefits = db.Column(db.Text, nullable=True)
+    # Testi lunghi del profilo: caricati solo al primo accesso o con undefer_group('profile')
+    description = db.deferred(db.Column(db.Text, nullable=True), group='profile')
+    mission = db.deferred(db.Column(db.Text, nullable=True), group='profile')
+    culture = db.deferred(db.Column(db.Text, nullable=True), group='profile')
+    benefits = db.deferred(db.Column(db.Text, nullable=True), group='profile')
     headquarters = db.Column(db.String(100), nullable=True)
-    locations = db.Column(db.Text, nullable=True)  # JSON array di locations
+    locations = db.deferred(db.Column(db.Text, nullable=True), group='profile')  # JSON array di locations
     social_linkedin = db.Column(db.String(255), nullable=True)
     social_twitter = db.Column(db.String(255), nullable=True)
     social_facebook = db.Column(db.String(255), nullable=True)
@@ -39,31 +41,21 @@ class Company(db.Model):
     def __repr__(self):
         return f'<Company {self.name}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'slug': self.slug,
-            'email': self.email,
-            'logo': self.logo,
-            'website': self.website,
-            'industry': self.industry,
-            'size': self.size,
-            'founded_year': self.founded_year,
-            'description': self.description,
-            'mission': self.mission,
-            'culture': self.culture,
-            'benefits': self.benefits,
-            'headquarters': self.headquarters,
-            'locations': self.locations,
-            'social_linkedin': self.social_linkedin,
-            'social_twitter': self.social_twitter,
-            'social_facebook': self.social_facebook,
-            'social_instagram': self.social_instagram,
-            'is_verified': self.is_verified,
-            'is_featured': self.is_featured,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'name', 'slug', 'email', 'logo', 'website', 'industry', 'size', 'founded_year', 'description',
+        'mission', 'culture', 'benefits', 'headquarters', 'locations', 'social_linkedin', 'social_twitter',
+        'social_facebook', 'social_instagram', 'is_verified', 'is_featured', 'created_at'
+    )
+    
+    serialize_presets = {
+        'summary': (
+            'id', 'name', 'slug', 'logo', 'industry', 'size', 'headquarters', 'is_verified', 'is_featured'
+        ),
+        'brief': ('id', 'name', 'logo')
+    }
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
 
 class CompanyUser(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,19 +75,40 @@ class CompanyUser(db.Model):
     def __repr__(self):
         return f'<CompanyUser {self.email}>'
     
+    serialize_fields = (
+        'id', 'company_id', 'email', 'first_name', 'last_name', 'role', 'phone', 'profile_picture',
+        'is_active', 'last_login', 'created_at'
+    )
+    
+    serialize_presets = {
+        'summary': ('id', 'company_id', 'email', 'first_name', 'last_name', 'role', 'is_active')
+    }
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
+
+class CompanyStats(db.Model):
+    # Statistiche aggregate di un'azienda, mantenute in modo incrementale (COMPANY_STATS_ROLLUP)
+    __tablename__ = 'company_stats'
+    
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), primary_key=True)
+    job_postings_count = db.Column(db.Integer, nullable=False, default=0)
+    active_job_postings_count = db.Column(db.Integer, nullable=False, default=0)
+    total_applications_count = db.Column(db.Integer, nullable=False, default=0)
+    total_views_count = db.Column(db.Integer, nullable=False, default=0)
+    next_expiry_at = db.Column(db.DateTime, nullable=True)  # prima scadenza tra gli annunci attivi
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+    
+    def __repr__(self):
+        return f'<CompanyStats {self.company_id}>'
+    
     def to_dict(self):
         return {
-            'id': self.id,
-            'company_id': self.company_id,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'role': self.role,
-            'phone': self.phone,
-            'profile_picture': self.profile_picture,
-            'is_active': self.is_active,
-            'last_login': self.last_login.isoformat() if self.last_login else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'job_postings_count': self.job_postings_count,
+            'active_job_postings_count': self.active_job_postings_count,
+            'total_applications_count': self.total_applications_count,
+            'total_views_count': self.total_views_count,
+            'average_applications_per_posting': self.total_applications_count / self.job_postings_count if self.job_postings_count else 0
         }
 
 class CompanyMedia(db.Model):
@@ -113,18 +126,13 @@ class CompanyMedia(db.Model):
     def __repr__(self):
         return f'<CompanyMedia {self.title}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'company_id': self.company_id,
-            'media_type': self.media_type,
-            'title': self.title,
-            'description': self.description,
-            'url': self.url,
-            'is_featured': self.is_featured,
-            'order': self.order,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'company_id', 'media_type', 'title', 'description', 'url', 'is_featured', 'order',
+        'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
 
 class CompanyReview(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -146,20 +154,10 @@ class CompanyReview(db.Model):
     def __repr__(self):
         return f'<CompanyReview {self.title}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'company_id': self.company_id,
-            'user_id': self.user_id,
-            'title': self.title,
-            'content': self.content,
-            'rating': self.rating,
-            'pros': self.pros,
-            'cons': self.cons,
-            'employment_status': self.employment_status,
-            'job_title': self.job_title,
-            'is_verified': self.is_verified,
-            'is_anonymous': self.is_anonymous,
-            'is_approved': self.is_approved,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'company_id', 'user_id', 'title', 'content', 'rating', 'pros', 'cons', 'employment_status',
+        'job_title', 'is_verified', 'is_anonymous', 'is_approved', 'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
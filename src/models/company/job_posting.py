@@ -1,14 +1,22 @@
 from src.models.user import db
+from src.utils.serializers import serialize
 from datetime import datetime
 
 class JobPosting(db.Model):
+    __table_args__ = (
+        db.Index('ix_job_posting_is_published_company_id', 'is_published', 'company_id'),
+        db.Index('ix_job_posting_company_id_is_published', 'company_id', 'is_published'),
+        db.Index('ix_job_posting_company_id_updated_at', 'company_id', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
     slug = db.Column(db.String(150), unique=True, nullable=False)
-    description = db.Column(db.Text, nullable=False)
-    requirements = db.Column(db.Text, nullable=False)
-    responsibilities = db.Column(db.Text, nullable=False)
+    # Testi lunghi dell'annuncio: caricati solo al primo accesso o con undefer_group('details')
+    description = db.deferred(db.Column(db.Text, nullable=False), group='details')
+    requirements = db.deferred(db.Column(db.Text, nullable=False), group='details')
+    responsibilities = db.deferred(db.Column(db.Text, nullable=False), group='details')
     location = db.Column(db.String(100), nullable=False)
     is_remote = db.Column(db.Boolean, default=False)
     is_hybrid = db.Column(db.Boolean, default=False)
@@ -18,11 +26,11 @@ class JobPosting(db.Model):
     salary_max = db.Column(db.Integer, nullable=True)
     salary_currency = db.Column(db.String(3), nullable=True)  # "EUR", "USD", ecc.
     salary_period = db.Column(db.String(10), nullable=True)  # "year", "month", "hour"
-    benefits = db.Column(db.Text, nullable=True)
+    benefits = db.deferred(db.Column(db.Text, nullable=True), group='details')
     skills = db.Column(db.Text, nullable=True)  # JSON array di skills
     application_url = db.Column(db.String(255), nullable=True)
     application_email = db.Column(db.String(120), nullable=True)
-    application_instructions = db.Column(db.Text, nullable=True)
+    application_instructions = db.deferred(db.Column(db.Text, nullable=True), group='details')
     is_published = db.Column(db.Boolean, default=False)
     is_featured = db.Column(db.Boolean, default=False)
     views_count = db.Column(db.Integer, default=0)
@@ -38,48 +46,66 @@ class JobPosting(db.Model):
     def __repr__(self):
         return f'<JobPosting {self.title}>'
     
+    serialize_fields = (
+        'id', 'company_id', 'title', 'slug', 'description', 'requirements', 'responsibilities', 'location',
+        'is_remote', 'is_hybrid', 'job_type', 'experience_level', 'salary_min', 'salary_max',
+        'salary_currency', 'salary_period', 'benefits', 'skills', 'application_url', 'application_email',
+        'application_instructions', 'is_published', 'is_featured', 'views_count', 'applications_count',
+        'publish_date', 'expiry_date', 'created_at'
+    )
+    
+    serialize_presets = {
+        'summary': (
+            'id', 'company_id', 'title', 'slug', 'location', 'is_remote', 'is_hybrid', 'job_type', 'experience_level',
+            'salary_min', 'salary_max', 'salary_currency', 'salary_period', 'is_published', 'is_featured',
+            'publish_date', 'expiry_date', 'created_at'
+        ),
+        'brief': ('id', 'title', 'company_id', 'location', 'is_remote', 'job_type')
+    }
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
+
+class JobPostingDailyStats(db.Model):
+    # Visualizzazioni e candidature giornaliere di un annuncio (una riga per annuncio e giorno UTC)
+    __tablename__ = 'job_posting_daily_stats'
+    
+    job_posting_id = db.Column(db.Integer, db.ForeignKey('job_posting.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views_count = db.Column(db.Integer, nullable=False, default=0)
+    applications_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<JobPostingDailyStats {self.job_posting_id} {self.day}>'
+    
     def to_dict(self):
         return {
-            'id': self.id,
-            'company_id': self.company_id,
-            'title': self.title,
-            'slug': self.slug,
-            'description': self.description,
-            'requirements': self.requirements,
-            'responsibilities': self.responsibilities,
-            'location': self.location,
-            'is_remote': self.is_remote,
-            'is_hybrid': self.is_hybrid,
-            'job_type': self.job_type,
-            'experience_level': self.experience_level,
-            'salary_min': self.salary_min,
-            'salary_max': self.salary_max,
-            'salary_currency': self.salary_currency,
-            'salary_period': self.salary_period,
-            'benefits': self.benefits,
-            'skills': self.skills,
-            'application_url': self.application_url,
-            'application_email': self.application_email,
-            'application_instructions': self.application_instructions,
-            'is_published': self.is_published,
-            'is_featured': self.is_featured,
-            'views_count': self.views_count,
-            'applications_count': self.applications_count,
-            'publish_date': self.publish_date.isoformat() if self.publish_date else None,
-            'expiry_date': self.expiry_date.isoformat() if self.expiry_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'date': self.day.isoformat(),
+            'views': self.views_count,
+            'applications': self.applications_count
         }
 
 class Application(db.Model):
+    __table_args__ = (
+        db.Index('ix_application_job_posting_id_created_at', 'job_posting_id', 'created_at'),
+        db.Index('ix_application_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_application_job_posting_id_updated_at', 'job_posting_id', 'updated_at'),
+        # Un utente può candidarsi una sola volta allo stesso annuncio
+        db.UniqueConstraint('job_posting_id', 'user_id', name='uq_application_job_posting_id_user_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     job_posting_id = db.Column(db.Integer, db.ForeignKey('job_posting.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    cover_letter = db.Column(db.Text, nullable=True)
+    # Testi lunghi: caricati solo al primo accesso o con undefer_group('notes')
+    cover_letter = db.deferred(db.Column(db.Text, nullable=True), group='notes')
     resume_url = db.Column(db.String(255), nullable=True)
     status = db.Column(db.String(50), nullable=False, default="pending")  # "pending", "reviewed", "interview", "rejected", "offered", "hired"
-    company_notes = db.Column(db.Text, nullable=True)
+    company_notes = db.deferred(db.Column(db.Text, nullable=True), group='notes')
     rating = db.Column(db.Integer, nullable=True)  # 1-5
     is_archived = db.Column(db.Boolean, default=False)
+    # Le attività con id fino a questo sono state spostate in application_activity_archive
+    archived_through_activity_id = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     
@@ -89,39 +115,64 @@ class Application(db.Model):
     def __repr__(self):
         return f'<Application {self.id}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'job_posting_id': self.job_posting_id,
-            'user_id': self.user_id,
-            'cover_letter': self.cover_letter,
-            'resume_url': self.resume_url,
-            'status': self.status,
-            'company_notes': self.company_notes,
-            'rating': self.rating,
-            'is_archived': self.is_archived,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'job_posting_id', 'user_id', 'cover_letter', 'resume_url', 'status', 'company_notes',
+        'rating', 'is_archived', 'created_at'
+    )
+    
+    serialize_presets = {
+        'summary': ('id', 'job_posting_id', 'user_id', 'status', 'rating', 'is_archived', 'created_at')
+    }
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
 
 class ApplicationActivity(db.Model):
+    __table_args__ = (
+        db.Index('ix_application_activity_application_id_created_at', 'application_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     application_id = db.Column(db.Integer, db.ForeignKey('application.id'), nullable=False)
     company_user_id = db.Column(db.Integer, db.ForeignKey('company_user.id'), nullable=True)
     activity_type = db.Column(db.String(50), nullable=False)  # "status_change", "note", "interview_scheduled", "feedback"
     description = db.Column(db.Text, nullable=False)
-    metadata = db.Column(db.Text, nullable=True)  # JSON con dati aggiuntivi
+    # "metadata" è un nome riservato da SQLAlchemy: l'attributo è rinominato, la colonna no
+    activity_metadata = db.Column('metadata', db.Text, nullable=True)  # JSON con dati aggiuntivi
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     
     def __repr__(self):
         return f'<ApplicationActivity {self.id}>'
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'application_id': self.application_id,
-            'company_user_id': self.company_user_id,
-            'activity_type': self.activity_type,
-            'description': self.description,
-            'metadata': self.metadata,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serialize_fields = (
+        'id', 'application_id', 'company_user_id', 'activity_type', 'description', 'metadata', 'created_at'
+    )
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
+
+# Attività delle candidature chiuse, spostate dall'archiviazione (src/utils/archive.py).
+# Stesse colonne e stessi id di ApplicationActivity, righe compresse su MySQL.
+class ArchivedApplicationActivity(db.Model):
+    __tablename__ = 'application_activity_archive'
+    __table_args__ = (
+        db.Index('ix_application_activity_archive_application_id_created_at', 'application_id', 'created_at'),
+        {'mysql_row_format': 'COMPRESSED'},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    application_id = db.Column(db.Integer, db.ForeignKey('application.id'), nullable=False)
+    company_user_id = db.Column(db.Integer, db.ForeignKey('company_user.id'), nullable=True)
+    activity_type = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    activity_metadata = db.Column('metadata', db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+    
+    def __repr__(self):
+        return f'<ArchivedApplicationActivity {self.id}>'
+    
+    serialize_fields = ApplicationActivity.serialize_fields
+    
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
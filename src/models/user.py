@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from src.utils.serializers import serialize
 
 db = SQLAlchemy()
 
@@ -14,5 +15,14 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
 
+    serialize_fields = ('id', 'username', 'email', 'first_name', 'last_name', 'bio', 'profile_picture')
+    serialize_presets = {
+        'list': ('id', 'username', 'email', 'first_name', 'last_name'),
+        'contact': ('id', 'first_name', 'last_name', 'email', 'profile_picture')
+    }
+
     def __repr__(self):
         return f'<User {self.username}>'
+
+    def to_dict(self, fields=None):
+        return serialize(self, fields)
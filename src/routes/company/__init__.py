@@ -4,6 +4,8 @@ from src.routes.company.company_user_routes import company_user_bp
 from src.routes.company.job_posting_routes import job_posting_bp
 from src.routes.company.application_routes import application_bp
 from src.routes.company.messaging_routes import messaging_bp
+from src.routes.company.export_routes import export_bp
+from src.routes.company.event_routes import event_bp
 
 # Blueprint principale per la sezione aziende
 company_section_bp = Blueprint('company_section', __name__, url_prefix='/api')
@@ -14,3 +16,5 @@ company_section_bp.register_blueprint(company_user_bp)
 company_section_bp.register_blueprint(job_posting_bp)
 company_section_bp.register_blueprint(application_bp)
 company_section_bp.register_blueprint(messaging_bp)
+company_section_bp.register_blueprint(export_bp)
+company_section_bp.register_blueprint(event_bp)
@@ -1,27 +1,49 @@
-from flask import Blueprint, jsonify, request
-from src.models.company.job_posting import Application, ApplicationActivity, JobPosting, db
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from src.models.company.job_posting import Application, ApplicationActivity, ArchivedApplicationActivity, JobPosting, db
 from src.models.company.company import CompanyUser
 from src.models.user import User
-from datetime import datetime
+from src.utils.loaders import get_loader
+from src.utils import company_stats
+from src.utils.db_errors import is_foreign_key_violation, is_unique_violation
+from src.utils.job_posting_stats import record_daily_application
+from src.utils.entity_cache import entity_cache
+from src.utils.events import ApplicationCreated, ApplicationStatusChanged, event_bus
+from src.utils.fieldsets import load_fields, requested_fields
+from src.utils.http_cache import not_modified, page_etag, related_version, with_etag
+from src.utils.pagination import paginate_query
+from src.utils.serializers import serialization_options, serialize_many
 import json
 
 application_bp = Blueprint('application', __name__)
 
+# Passaggi di stato ammessi nelle modifiche in blocco: in avanti nel processo di selezione,
+# oppure verso "rejected" (una candidatura rifiutata può essere riconsiderata)
+STATUS_TRANSITIONS = {
+    'pending': {'reviewed', 'interview', 'rejected'},
+    'reviewed': {'interview', 'offered', 'rejected'},
+    'interview': {'offered', 'rejected'},
+    'offered': {'hired', 'rejected'},
+    'rejected': {'reviewed'},
+    'hired': set()
+}
+
+# Dimensione massima di ogni clausola IN (...) delle modifiche in blocco
+BULK_CHUNK_SIZE = 500
+
 # Endpoint per ottenere tutte le candidature
 @application_bp.route('/applications', methods=['GET'])
 def get_applications():
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     job_posting_id = request.args.get('job_posting_id', type=int)
     user_id = request.args.get('user_id', type=int)
     status = request.args.get('status')
     is_archived = request.args.get('is_archived', type=bool)
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(Application)
     
     # Costruisci la query base
-    query = Application.query
+    query = load_fields(Application.query, Application, fields)
     
     # Applica i filtri se presenti
     if job_posting_id:
@@ -33,18 +55,22 @@ def get_applications():
     if is_archived is not None:
         query = query.filter(Application.is_archived == is_archived)
     
-    # Esegui la query paginata
-    applications_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Esegui la query paginata (offset o cursore)
+    applications_paginated = paginate_query(query, Application.id)
+    
+    # ETag debole calcolato dagli elementi della pagina: risponde 304 senza serializzare
+    etag, _ = page_etag(applications_paginated.items, applications_paginated.meta)
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta
     result = {
-        'applications': [application.to_dict() for application in applications_paginated.items],
-        'total': applications_paginated.total,
-        'pages': applications_paginated.pages,
-        'current_page': page
+        'applications': serialize_many(applications_paginated.items, fields),
+        **applications_paginated.meta
     }
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, weak=True)
 
 # Endpoint per ottenere le candidature di un annuncio specifico
 @application_bp.route('/job-postings/<int:job_posting_id>/applications', methods=['GET'])
@@ -52,16 +78,14 @@ def get_job_posting_applications(job_posting_id):
     # Verifica che l'annuncio esista
     job_posting = JobPosting.query.get_or_404(job_posting_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     status = request.args.get('status')
     is_archived = request.args.get('is_archived', type=bool)
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(Application)
     
     # Costruisci la query base
-    query = Application.query.filter_by(job_posting_id=job_posting_id)
+    query = load_fields(Application.query.filter_by(job_posting_id=job_posting_id), Application, fields, extra=('created_at', 'user_id'))
     
     # Applica i filtri se presenti
     if status:
@@ -69,35 +93,36 @@ def get_job_posting_applications(job_posting_id):
     if is_archived is not None:
         query = query.filter(Application.is_archived == is_archived)
     
-    # Ordina per data di creazione (più recenti prima)
-    query = query.order_by(Application.created_at.desc())
+    # Esegui la query paginata (offset o cursore), più recenti prima
+    applications_paginated = paginate_query(query, Application.created_at, descending=True)
     
-    # Esegui la query paginata
-    applications_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Carica tutti i candidati della pagina con una sola query
+    user_loader = get_loader(User).prime(application.user_id for application in applications_paginated.items)
+    
+    # ETag debole calcolato dagli elementi della pagina e dai candidati inclusi nella risposta:
+    # risponde 304 senza serializzare
+    etag, _ = page_etag(applications_paginated.items, applications_paginated.meta, version=lambda application: (
+        application.id, application.updated_at, related_version(user_loader.load(application.user_id))
+    ))
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta con informazioni aggiuntive sui candidati
     applications_with_users = []
     for application in applications_paginated.items:
-        app_dict = application.to_dict()
-        user = User.query.get(application.user_id)
+        app_dict = application.to_dict(fields)
+        user = user_loader.load(application.user_id)
         if user:
-            app_dict['user'] = {
-                'id': user.id,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email,
-                'profile_picture': user.profile_picture
-            }
+            app_dict['user'] = user.to_dict(fields='contact')
         applications_with_users.append(app_dict)
     
     result = {
         'applications': applications_with_users,
-        'total': applications_paginated.total,
-        'pages': applications_paginated.pages,
-        'current_page': page
+        **applications_paginated.meta
     }
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, weak=True)
 
 # Endpoint per ottenere le candidature di un utente specifico
 @application_bp.route('/users/<int:user_id>/applications', methods=['GET'])
@@ -105,16 +130,14 @@ def get_user_applications(user_id):
     # Verifica che l'utente esista
     user = User.query.get_or_404(user_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     status = request.args.get('status')
     is_archived = request.args.get('is_archived', type=bool)
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(Application)
     
     # Costruisci la query base
-    query = Application.query.filter_by(user_id=user_id)
+    query = load_fields(Application.query.filter_by(user_id=user_id), Application, fields, extra=('created_at', 'job_posting_id'))
     
     # Applica i filtri se presenti
     if status:
@@ -122,41 +145,42 @@ def get_user_applications(user_id):
     if is_archived is not None:
         query = query.filter(Application.is_archived == is_archived)
     
-    # Ordina per data di creazione (più recenti prima)
-    query = query.order_by(Application.created_at.desc())
+    # Esegui la query paginata (offset o cursore), più recenti prima
+    applications_paginated = paginate_query(query, Application.created_at, descending=True)
     
-    # Esegui la query paginata
-    applications_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Carica tutti gli annunci della pagina con una sola query
+    job_posting_loader = get_loader(JobPosting).prime(application.job_posting_id for application in applications_paginated.items)
+    
+    # ETag debole calcolato dagli elementi della pagina e dagli annunci inclusi nella risposta:
+    # risponde 304 senza serializzare
+    etag, _ = page_etag(applications_paginated.items, applications_paginated.meta, version=lambda application: (
+        application.id, application.updated_at, related_version(job_posting_loader.load(application.job_posting_id))
+    ))
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta con informazioni aggiuntive sugli annunci
     applications_with_jobs = []
     for application in applications_paginated.items:
-        app_dict = application.to_dict()
-        job_posting = JobPosting.query.get(application.job_posting_id)
+        app_dict = application.to_dict(fields)
+        job_posting = job_posting_loader.load(application.job_posting_id)
         if job_posting:
-            app_dict['job_posting'] = {
-                'id': job_posting.id,
-                'title': job_posting.title,
-                'company_id': job_posting.company_id,
-                'location': job_posting.location,
-                'is_remote': job_posting.is_remote,
-                'job_type': job_posting.job_type
-            }
+            app_dict['job_posting'] = job_posting.to_dict(fields='brief')
         applications_with_jobs.append(app_dict)
     
     result = {
         'applications': applications_with_jobs,
-        'total': applications_paginated.total,
-        'pages': applications_paginated.pages,
-        'current_page': page
+        **applications_paginated.meta
     }
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, weak=True)
 
 # Endpoint per ottenere una singola candidatura
 @application_bp.route('/applications/<int:application_id>', methods=['GET'])
 def get_application(application_id):
-    application = Application.query.get_or_404(application_id)
+    # Risposta completa: le note (colonne differite) arrivano con la stessa SELECT
+    application = Application.query.options(*serialization_options(Application)).get_or_404(application_id)
     
     # Ottieni informazioni aggiuntive
     user = User.query.get(application.user_id)
@@ -166,34 +190,22 @@ def get_application(application_id):
     
     # Aggiungi informazioni sull'utente
     if user:
-        result['user'] = {
-            'id': user.id,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email,
-            'profile_picture': user.profile_picture
-        }
+        result['user'] = user.to_dict(fields='contact')
     
     # Aggiungi informazioni sull'annuncio
     if job_posting:
-        result['job_posting'] = {
-            'id': job_posting.id,
-            'title': job_posting.title,
-            'company_id': job_posting.company_id,
-            'location': job_posting.location,
-            'is_remote': job_posting.is_remote,
-            'job_type': job_posting.job_type
-        }
+        result['job_posting'] = job_posting.to_dict(fields='brief')
     
     return jsonify(result)
 
 # Endpoint per creare una nuova candidatura
 @application_bp.route('/job-postings/<int:job_posting_id>/applications', methods=['POST'])
 def create_application(job_posting_id):
-    # Verifica che l'annuncio esista
-    job_posting = JobPosting.query.get_or_404(job_posting_id)
+    # Verifica che l'annuncio esista e sia pubblicato (solo le colonne necessarie)
+    job_posting = db.session.query(JobPosting.id, JobPosting.company_id, JobPosting.is_published).filter(JobPosting.id == job_posting_id).first()
+    if job_posting is None:
+        abort(404)
     
-    # Verifica che l'annuncio sia pubblicato
     if not job_posting.is_published:
         return jsonify({'error': 'Non è possibile candidarsi a un annuncio non pubblicato'}), 400
     
@@ -203,19 +215,8 @@ def create_application(job_posting_id):
     if not data or not data.get('user_id'):
         return jsonify({'error': 'Dati mancanti'}), 400
     
-    # Verifica che l'utente esista
-    user = User.query.get_or_404(data['user_id'])
-    
-    # Verifica che l'utente non si sia già candidato per questo annuncio
-    existing_application = Application.query.filter_by(
-        job_posting_id=job_posting_id,
-        user_id=data['user_id']
-    ).first()
-    
-    if existing_application:
-        return jsonify({'error': 'Hai già inviato una candidatura per questo annuncio'}), 400
-    
-    # Creazione nuova candidatura
+    # Creazione nuova candidatura e della relativa attività, inserite nello stesso flush.
+    # L'esistenza dell'utente e l'unicità della candidatura sono garantite dai vincoli del database.
     new_application = Application(
         job_posting_id=job_posting_id,
         user_id=data['user_id'],
@@ -223,23 +224,36 @@ def create_application(job_posting_id):
         resume_url=data.get('resume_url'),
         status='pending'
     )
-    
-    db.session.add(new_application)
-    
-    # Incrementa il contatore delle candidature nell'annuncio
-    job_posting.applications_count += 1
-    
-    db.session.commit()
-    
-    # Crea un'attività per la nuova candidatura
-    activity = ApplicationActivity(
-        application_id=new_application.id,
+    new_application.application_activities.append(ApplicationActivity(
         activity_type='status_change',
         description='Candidatura ricevuta'
-    )
+    ))
     
-    db.session.add(activity)
-    db.session.commit()
+    db.session.add(new_application)
+    
+    try:
+        # Incrementa il contatore delle candidature lato SQL (nessuna perdita con richieste concorrenti);
+        # l'autoflush inserisce prima candidatura e attività
+        db.session.execute(
+            db.update(JobPosting)
+            .where(JobPosting.id == job_posting_id)
+            .values(applications_count=db.func.coalesce(JobPosting.applications_count, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+        company_stats.record_application(job_posting.company_id)
+        record_daily_application(job_posting_id)
+        event_bus.emit(ApplicationCreated(new_application.id, job_posting_id, job_posting.company_id, new_application.user_id))
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if is_unique_violation(error):
+            return jsonify({'error': 'Hai già inviato una candidatura per questo annuncio'}), 400
+        if is_foreign_key_violation(error):
+            abort(404)
+        raise
+    
+    # L'UPDATE in blocco non passa dagli eventi ORM: il contatore in cache va invalidato qui
+    entity_cache.invalidate(JobPosting, [job_posting_id])
     
     return jsonify(new_application.to_dict()), 201
 
@@ -259,12 +273,15 @@ def update_application_status(application_id):
     
     old_status = application.status
     application.status = data['status']
-    application.updated_at = datetime.utcnow()
+    application.updated_at = db.func.now()
     
     # Aggiungi note se presenti
     if 'company_notes' in data:
         application.company_notes = data['company_notes']
     
+    if old_status != data['status']:
+        event_bus.emit(ApplicationStatusChanged(application_id, old_status, data['status']))
+    
     db.session.commit()
     
     # Crea un'attività per il cambio di stato
@@ -282,6 +299,81 @@ def update_application_status(application_id):
     
     return jsonify({'message': 'Stato aggiornato con successo', 'application': application.to_dict()})
 
+# Endpoint per cambiare lo stato di più candidature insieme. Esito per ogni id:
+# updated, unchanged (già nello stato richiesto), invalid_transition o not_found
+@application_bp.route('/applications/status/bulk', methods=['PUT'])
+def bulk_update_application_status():
+    data = request.get_json(silent=True)
+    
+    if not data or 'status' not in data or not isinstance(data.get('application_ids'), list):
+        return jsonify({'error': 'Dati mancanti: servono application_ids (lista) e status'}), 400
+    
+    # Verifica che lo stato sia valido
+    status = data['status']
+    if status not in STATUS_TRANSITIONS:
+        return jsonify({'error': f'Stato non valido. Gli stati validi sono: {", ".join(STATUS_TRANSITIONS)}'}), 400
+    
+    # Id distinti, nell'ordine ricevuto
+    if not all(isinstance(application_id, int) and not isinstance(application_id, bool) for application_id in data['application_ids']):
+        return jsonify({'error': 'application_ids deve contenere solo id numerici'}), 400
+    application_ids = list(dict.fromkeys(data['application_ids']))
+    max_ids = current_app.config.get('APPLICATION_BULK_MAX_IDS', 5000)
+    if len(application_ids) > max_ids:
+        return jsonify({'error': f'Troppe candidature: il massimo per richiesta è {max_ids}'}), 413
+    
+    company_user_id = data.get('company_user_id')
+    if company_user_id is not None and db.session.query(CompanyUser.id).filter(CompanyUser.id == company_user_id).first() is None:
+        return jsonify({'error': 'Utente aziendale non trovato'}), 400
+    
+    # Stato attuale delle candidature, con le righe bloccate fino al commit
+    current = {}
+    for start in range(0, len(application_ids), BULK_CHUNK_SIZE):
+        chunk = application_ids[start:start + BULK_CHUNK_SIZE]
+        current.update(db.session.query(Application.id, Application.status).filter(Application.id.in_(chunk)).with_for_update())
+    
+    results = []
+    updated_ids = []
+    activities = []
+    for application_id in application_ids:
+        old_status = current.get(application_id)
+        if application_id not in current:
+            outcome = 'not_found'
+        elif old_status == status:
+            outcome = 'unchanged'
+        elif status not in STATUS_TRANSITIONS.get(old_status, ()):
+            outcome = 'invalid_transition'
+        else:
+            outcome = 'updated'
+            updated_ids.append(application_id)
+            activities.append({
+                'application_id': application_id,
+                'company_user_id': company_user_id,
+                'activity_type': 'status_change',
+                'description': f'Stato cambiato da {old_status} a {status}',
+                'activity_metadata': None
+            })
+        results.append({'id': application_id, 'outcome': outcome, 'previous_status': old_status})
+    
+    # Un UPDATE per blocco di id e un INSERT multiplo per le attività, in un'unica transazione
+    if updated_ids:
+        for start in range(0, len(updated_ids), BULK_CHUNK_SIZE):
+            db.session.execute(
+                db.update(Application)
+                .where(Application.id.in_(updated_ids[start:start + BULK_CHUNK_SIZE]))
+                .values(status=status, updated_at=db.func.now())
+                .execution_options(synchronize_session=False)
+            )
+        db.session.execute(db.insert(ApplicationActivity).execution_options(render_nulls=True), activities)
+        for application_id in updated_ids:
+            event_bus.emit(ApplicationStatusChanged(application_id, current[application_id], status))
+    db.session.commit()
+    
+    return jsonify({
+        'status': status,
+        'updated': len(updated_ids),
+        'results': results
+    })
+
 # Endpoint per aggiungere un'attività a una candidatura
 @application_bp.route('/applications/<int:application_id>/activities', methods=['POST'])
 def add_application_activity(application_id):
@@ -302,7 +394,7 @@ def add_application_activity(application_id):
         company_user_id=data.get('company_user_id'),
         activity_type=data['activity_type'],
         description=data['description'],
-        metadata=json.dumps(data.get('metadata', {})) if data.get('metadata') else None
+        activity_metadata=json.dumps(data.get('metadata', {})) if data.get('metadata') else None
     )
     
     db.session.add(new_activity)
@@ -315,15 +407,23 @@ def add_application_activity(application_id):
 def get_application_activities(application_id):
     application = Application.query.get_or_404(application_id)
     
-    # Ottieni tutte le attività ordinate per data (più recenti prima)
+    # Ottieni tutte le attività ordinate per data (più recenti prima). Quelle archiviate sono
+    # sempre precedenti alle altre e si leggono dalla tabella fredda solo se esistono.
     activities = ApplicationActivity.query.filter_by(application_id=application_id).order_by(ApplicationActivity.created_at.desc()).all()
+    if application.archived_through_activity_id is not None:
+        activities += ArchivedApplicationActivity.query.filter_by(application_id=application_id).order_by(
+            ArchivedApplicationActivity.created_at.desc()
+        ).all()
+    
+    # Carica tutti gli utenti aziendali coinvolti con una sola query
+    company_user_loader = get_loader(CompanyUser).prime(activity.company_user_id for activity in activities)
     
     # Prepara la risposta con informazioni aggiuntive sugli utenti aziendali
     activities_with_users = []
     for activity in activities:
         activity_dict = activity.to_dict()
         if activity.company_user_id:
-            company_user = CompanyUser.query.get(activity.company_user_id)
+            company_user = company_user_loader.load(activity.company_user_id)
             if company_user:
                 activity_dict['company_user'] = {
                     'id': company_user.id,
@@ -341,7 +441,7 @@ def archive_application(application_id):
     application = Application.query.get_or_404(application_id)
     
     application.is_archived = True
-    application.updated_at = datetime.utcnow()
+    application.updated_at = db.func.now()
     
     db.session.commit()
     
@@ -353,7 +453,7 @@ def unarchive_application(application_id):
     application = Application.query.get_or_404(application_id)
     
     application.is_archived = False
-    application.updated_at = datetime.utcnow()
+    application.updated_at = db.func.now()
     
     db.session.commit()
     
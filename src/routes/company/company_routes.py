@@ -1,5 +1,12 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 from src.models.company.company import Company, CompanyUser, db
+from src.utils import company_stats
+from src.utils.entity_cache import entity_cache
+from src.utils.events import CompanyUpdated, event_bus
+from src.utils.fieldsets import load_fields, requested_fields
+from src.utils.http_cache import make_etag, not_modified, page_etag, with_etag
+from src.utils.pagination import paginate_query
+from src.utils.serializers import serialize_many
 import json
 from datetime import datetime
 import re
@@ -21,18 +28,16 @@ def generate_slug(name):
 # Endpoint per ottenere tutte le aziende
 @company_bp.route('/companies', methods=['GET'])
 def get_companies():
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     industry = request.args.get('industry')
     size = request.args.get('size')
     is_verified = request.args.get('is_verified', type=bool)
     is_featured = request.args.get('is_featured', type=bool)
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(Company)
     
     # Costruisci la query base
-    query = Company.query
+    query = load_fields(Company.query, Company, fields)
     
     # Applica i filtri se presenti
     if industry:
@@ -44,30 +49,48 @@ def get_companies():
     if is_featured is not None:
         query = query.filter(Company.is_featured == is_featured)
     
-    # Esegui la query paginata
-    companies_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Esegui la query paginata (offset o cursore)
+    companies_paginated = paginate_query(query, Company.id)
+    
+    # ETag debole calcolato dagli elementi della pagina: risponde 304 senza serializzare
+    etag, _ = page_etag(companies_paginated.items, companies_paginated.meta)
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta
     result = {
-        'companies': [company.to_dict() for company in companies_paginated.items],
-        'total': companies_paginated.total,
-        'pages': companies_paginated.pages,
-        'current_page': page
+        'companies': serialize_many(companies_paginated.items, fields),
+        **companies_paginated.meta
     }
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, weak=True)
 
 # Endpoint per ottenere una singola azienda
 @company_bp.route('/companies/<int:company_id>', methods=['GET'])
 def get_company(company_id):
-    company = Company.query.get_or_404(company_id)
-    return jsonify(company.to_dict())
+    # Dizionario serializzato dalla cache delle entità (una query solo se manca)
+    company = entity_cache.load(Company, company_id)
+    if company is None:
+        abort(404)
+    etag = make_etag('company', company_id, company.updated_at)
+    cached = not_modified(etag, company.updated_at)
+    if cached:
+        return cached
+    return with_etag(jsonify(company.data), etag, company.updated_at)
 
 # Endpoint per ottenere un'azienda tramite slug
 @company_bp.route('/companies/slug/<string:slug>', methods=['GET'])
 def get_company_by_slug(slug):
-    company = Company.query.filter_by(slug=slug).first_or_404()
-    return jsonify(company.to_dict())
+    # Dizionario serializzato dalla cache delle entità (una query solo se manca)
+    company = entity_cache.load_by_slug(Company, slug)
+    if company is None:
+        abort(404)
+    etag = make_etag('company', company.data['id'], company.updated_at)
+    cached = not_modified(etag, company.updated_at)
+    if cached:
+        return cached
+    return with_etag(jsonify(company.data), etag, company.updated_at)
 
 # Endpoint per creare una nuova azienda
 @company_bp.route('/companies', methods=['POST'])
@@ -160,6 +183,7 @@ def update_company(company_id):
         company.is_featured = data['is_featured']
     
     company.updated_at = datetime.utcnow()
+    event_bus.emit(CompanyUpdated(company_id))
     
     db.session.commit()
     
@@ -183,6 +207,7 @@ def verify_company(company_id):
     
     company.is_verified = True
     company.updated_at = datetime.utcnow()
+    event_bus.emit(CompanyUpdated(company_id))
     
     db.session.commit()
     
@@ -202,6 +227,7 @@ def update_company_logo(company_id):
     
     company.logo = data['logo']
     company.updated_at = datetime.utcnow()
+    event_bus.emit(CompanyUpdated(company_id))
     
     db.session.commit()
     
@@ -210,16 +236,9 @@ def update_company_logo(company_id):
 # Endpoint per ottenere le statistiche di un'azienda
 @company_bp.route('/companies/<int:company_id>/stats', methods=['GET'])
 def get_company_stats(company_id):
-    company = Company.query.get_or_404(company_id)
-    
-    # In un'applicazione reale, qui calcoleremo le statistiche effettive
-    # Per ora, restituiamo dati di esempio
-    stats = {
-        'job_postings_count': len(company.job_postings),
-        'active_job_postings_count': sum(1 for jp in company.job_postings if jp.is_published and (jp.expiry_date is None or jp.expiry_date > datetime.utcnow())),
-        'total_applications_count': sum(len(jp.applications) for jp in company.job_postings),
-        'total_views_count': sum(jp.views_count for jp in company.job_postings),
-        'average_applications_per_posting': sum(len(jp.applications) for jp in company.job_postings) / len(company.job_postings) if company.job_postings else 0
-    }
+    # Verifica che l'azienda esista senza caricarne l'intera riga
+    if db.session.query(Company.id).filter(Company.id == company_id).first() is None:
+        abort(404)
     
-    return jsonify(stats)
+    # Statistiche calcolate con query aggregate o lette dalla tabella company_stats
+    return jsonify(company_stats.get_company_stats(company_id))
@@ -1,5 +1,10 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 from src.models.company.company import CompanyUser, Company, db
+from src.utils.entity_cache import entity_cache
+from src.utils.fieldsets import load_fields, requested_fields
+from src.utils.http_cache import not_modified, page_etag, with_etag
+from src.utils.pagination import paginate_query
+from src.utils.serializers import serialize_many
 from datetime import datetime
 
 company_user_bp = Blueprint('company_user', __name__)
@@ -10,16 +15,14 @@ def get_company_users(company_id):
     # Verifica che l'azienda esista
     company = Company.query.get_or_404(company_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     role = request.args.get('role')
     is_active = request.args.get('is_active', type=bool)
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(CompanyUser)
     
     # Costruisci la query base
-    query = CompanyUser.query.filter_by(company_id=company_id)
+    query = load_fields(CompanyUser.query.filter_by(company_id=company_id), CompanyUser, fields)
     
     # Applica i filtri se presenti
     if role:
@@ -27,24 +30,31 @@ def get_company_users(company_id):
     if is_active is not None:
         query = query.filter(CompanyUser.is_active == is_active)
     
-    # Esegui la query paginata
-    users_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Esegui la query paginata (offset o cursore)
+    users_paginated = paginate_query(query, CompanyUser.id)
+    
+    # ETag debole calcolato dagli elementi della pagina: risponde 304 senza serializzare
+    etag, _ = page_etag(users_paginated.items, users_paginated.meta)
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta
     result = {
-        'users': [user.to_dict() for user in users_paginated.items],
-        'total': users_paginated.total,
-        'pages': users_paginated.pages,
-        'current_page': page
+        'users': serialize_many(users_paginated.items, fields),
+        **users_paginated.meta
     }
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, weak=True)
 
 # Endpoint per ottenere un singolo utente aziendale
 @company_user_bp.route('/company-users/<int:user_id>', methods=['GET'])
 def get_company_user(user_id):
-    user = CompanyUser.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    # Dizionario serializzato dalla cache delle entità (una query solo se manca)
+    user = entity_cache.load(CompanyUser, user_id)
+    if user is None:
+        abort(404)
+    return jsonify(user.data)
 
 # Endpoint per creare un nuovo utente aziendale
 @company_user_bp.route('/companies/<int:company_id>/users', methods=['POST'])
@@ -0,0 +1,39 @@
+from flask import Blueprint, Response, abort, request
+from src.models.company.company import Company, db
+from src.models.user import User
+from src.utils.event_stream import company_channel, event_broker, user_channel
+
+event_bp = Blueprint('event', __name__)
+
+# Risposta text/event-stream per un canale. La connessione al database viene rilasciata
+# prima dello streaming: le connessioni aperte non occupano il pool.
+def event_stream_response(channel):
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0) or None
+    except ValueError:
+        last_event_id = None
+    db.session.close()
+    
+    response = Response(event_broker.stream(channel, last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Disattiva il buffering dei proxy (nginx), altrimenti gli eventi arrivano in ritardo
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Endpoint per ricevere gli eventi di un utente (nuovi messaggi, letture, archiviazioni)
+@event_bp.route('/users/<int:user_id>/events', methods=['GET'])
+def get_user_events(user_id):
+    # Verifica che l'utente esista
+    if db.session.query(User.id).filter(User.id == user_id).first() is None:
+        abort(404)
+    
+    return event_stream_response(user_channel(user_id))
+
+# Endpoint per ricevere gli eventi di un'azienda (nuovi messaggi, letture, archiviazioni)
+@event_bp.route('/companies/<int:company_id>/events', methods=['GET'])
+def get_company_events(company_id):
+    # Verifica che l'azienda esista
+    if db.session.query(Company.id).filter(Company.id == company_id).first() is None:
+        abort(404)
+    
+    return event_stream_response(company_channel(company_id))
@@ -0,0 +1,45 @@
+from flask import Blueprint, abort
+from src.models.company.job_posting import Application, JobPosting, db
+from src.models.company.company import Company
+from src.utils.export import stream_export, updated_since
+from src.utils.fieldsets import load_fields, requested_fields
+
+export_bp = Blueprint('export', __name__)
+
+# Endpoint per esportare tutte le candidature di un annuncio (NDJSON o CSV, in streaming)
+@export_bp.route('/job-postings/<int:job_posting_id>/applications/export', methods=['GET'])
+def export_job_posting_applications(job_posting_id):
+    # Verifica che l'annuncio esista
+    if db.session.query(JobPosting.id).filter(JobPosting.id == job_posting_id).first() is None:
+        abort(404)
+    
+    fields = requested_fields(Application)
+    since = updated_since()
+    
+    query = load_fields(Application.query.filter_by(job_posting_id=job_posting_id), Application, fields)
+    if since:
+        query = query.filter(Application.updated_at >= since)
+    
+    # Ordinamento stabile sull'indice (job_posting_id, updated_at)
+    query = query.order_by(Application.updated_at, Application.id)
+    
+    return stream_export(query, Application, fields, f'job-posting-{job_posting_id}-applications')
+
+# Endpoint per esportare tutti gli annunci di un'azienda (NDJSON o CSV, in streaming)
+@export_bp.route('/companies/<int:company_id>/job-postings/export', methods=['GET'])
+def export_company_job_postings(company_id):
+    # Verifica che l'azienda esista
+    if db.session.query(Company.id).filter(Company.id == company_id).first() is None:
+        abort(404)
+    
+    fields = requested_fields(JobPosting)
+    since = updated_since()
+    
+    query = load_fields(JobPosting.query.filter_by(company_id=company_id), JobPosting, fields)
+    if since:
+        query = query.filter(JobPosting.updated_at >= since)
+    
+    # Ordinamento stabile sull'indice (company_id, updated_at)
+    query = query.order_by(JobPosting.updated_at, JobPosting.id)
+    
+    return stream_export(query, JobPosting, fields, f'company-{company_id}-job-postings')
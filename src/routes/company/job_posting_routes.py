@@ -1,8 +1,22 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, current_app, jsonify, make_response, request
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
 from src.models.company.job_posting import JobPosting, db
 from src.models.company.company import Company
-from datetime import datetime
+from src.utils import company_stats
+from src.utils.db_errors import is_unique_violation
+from src.utils.entity_cache import entity_cache
+from src.utils.fieldsets import load_fields, requested_fields
+from src.utils.http_cache import make_etag, not_modified, page_etag, with_etag
+from src.utils.job_posting_stats import get_timeseries
+from src.utils.loaders import get_loader
+from src.utils.pagination import MAX_LIMIT, paginate_query
+from src.utils.events import JobPostingDeleted, JobPostingPublished, JobPostingsChanged, event_bus
+from src.utils.search import job_posting_search
+from src.utils.serializers import serialization_options, serialize_many
+from src.utils.view_counter import view_counter
+from datetime import datetime, timedelta
 import json
+import math
 import re
 import secrets
 import string
@@ -19,13 +33,43 @@ def generate_slug(title):
     random_suffix = ''.join(secrets.choice(string.ascii_lowercase + string.digits) for _ in range(6))
     return f"{slug}-{random_suffix}"
 
-# Endpoint per ottenere tutti gli annunci di lavoro
-@job_posting_bp.route('/job-postings', methods=['GET'])
-def get_job_postings():
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
+# Slug per un blocco di titoli, distinti tra loro e da quelli già salvati: una query per
+# verificare tutti i candidati, ripetuta solo per quelli in collisione
+def generate_unique_slugs(titles):
+    slugs = [None] * len(titles)
+    pending = list(range(len(titles)))
+    taken = set()
+    while pending:
+        candidates = {index: generate_slug(titles[index]) for index in pending}
+        existing = {row[0] for row in db.session.query(JobPosting.slug).filter(JobPosting.slug.in_(set(candidates.values())))}
+        pending = []
+        for index, slug in candidates.items():
+            if slug in existing or slug in taken:
+                pending.append(index)
+            else:
+                slugs[index] = slug
+                taken.add(slug)
+    return slugs
+
+# Versione di un annuncio per gli ETag. I contatori cambiano senza aggiornare updated_at,
+# quindi ne fanno parte, ma solo come sono salvati nel database: le visualizzazioni in coda
+# sono del singolo worker e cambiano a ogni richiesta, e renderebbero inutili le rivalidazioni.
+def job_posting_version(job_posting):
+    return (job_posting.id, job_posting.updated_at, job_posting.views_count, job_posting.applications_count)
+
+# Colonne lette da job_posting_version, da caricare anche con ?fields=
+JOB_POSTING_VERSION_FIELDS = ('updated_at', 'views_count', 'applications_count')
+
+# Candidati della ricerca verificati con i filtri per ogni query IN
+SEARCH_FILTER_CHUNK_SIZE = 1000
+
+# ETag di un annuncio della cache delle entità (stessi contatori salvati di job_posting_version)
+def job_posting_etag(job_posting):
+    data = job_posting.data
+    return make_etag('job_posting', data['id'], job_posting.updated_at, data['views_count'], data['applications_count'])
+
+# Condizioni corrispondenti ai filtri della query string (lista vuota se non ce ne sono)
+def job_posting_filter_conditions():
     # Parametri di filtro
     company_id = request.args.get('company_id', type=int)
     location = request.args.get('location')
@@ -35,35 +79,113 @@ def get_job_postings():
     is_published = request.args.get('is_published', type=bool)
     is_featured = request.args.get('is_featured', type=bool)
     
-    # Costruisci la query base
-    query = JobPosting.query
-    
-    # Applica i filtri se presenti
+    conditions = []
     if company_id:
-        query = query.filter(JobPosting.company_id == company_id)
+        conditions.append(JobPosting.company_id == company_id)
     if location:
-        query = query.filter(JobPosting.location.like(f'%{location}%'))
+        conditions.append(JobPosting.location.like(f'%{location}%'))
     if job_type:
-        query = query.filter(JobPosting.job_type == job_type)
+        conditions.append(JobPosting.job_type == job_type)
     if experience_level:
-        query = query.filter(JobPosting.experience_level == experience_level)
+        conditions.append(JobPosting.experience_level == experience_level)
     if is_remote is not None:
-        query = query.filter(JobPosting.is_remote == is_remote)
+        conditions.append(JobPosting.is_remote == is_remote)
     if is_published is not None:
-        query = query.filter(JobPosting.is_published == is_published)
+        conditions.append(JobPosting.is_published == is_published)
     if is_featured is not None:
-        query = query.filter(JobPosting.is_featured == is_featured)
+        conditions.append(JobPosting.is_featured == is_featured)
+    return conditions
+
+# Funzione di utilità per applicare i filtri della query string agli annunci
+def apply_job_posting_filters(query):
+    conditions = job_posting_filter_conditions()
+    return query.filter(*conditions) if conditions else query
+
+# Endpoint per ottenere tutti gli annunci di lavoro
+@job_posting_bp.route('/job-postings', methods=['GET'])
+def get_job_postings():
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(JobPosting)
+    
+    # Costruisci la query con i filtri presenti
+    query = load_fields(apply_job_posting_filters(JobPosting.query), JobPosting, fields, extra=JOB_POSTING_VERSION_FIELDS)
+    
+    # Esegui la query paginata (offset o cursore)
+    job_postings_paginated = paginate_query(query, JobPosting.id)
     
-    # Esegui la query paginata
-    job_postings_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # ETag debole calcolato dagli elementi della pagina: risponde 304 senza serializzare
+    etag, _ = page_etag(job_postings_paginated.items, job_postings_paginated.meta, version=job_posting_version)
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta
     result = {
-        'job_postings': [job_posting.to_dict() for job_posting in job_postings_paginated.items],
-        'total': job_postings_paginated.total,
-        'pages': job_postings_paginated.pages,
+        'job_postings': serialize_many(job_postings_paginated.items, fields),
+        **job_postings_paginated.meta
+    }
+    
+    return with_etag(jsonify(result), etag, weak=True)
+
+# Endpoint per la ricerca full-text degli annunci (titolo, descrizione, requisiti, responsabilità, skills)
+@job_posting_bp.route('/job-postings/search', methods=['GET'])
+def search_job_postings():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'Parametro di ricerca mancante'}), 400
+    fields = requested_fields(JobPosting)
+    
+    # Parametri di paginazione
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(1, min(request.args.get('per_page', 10, type=int), MAX_LIMIT))
+    
+    # Tutti i candidati ordinati per punteggio BM25: un taglio prima dei filtri perderebbe i
+    # risultati filtrati oltre il taglio
+    ranked = job_posting_search.search(q)
+    scores = dict(ranked)
+    candidate_ids = [job_posting_id for job_posting_id, score in ranked]
+    total_is_estimate = False
+    
+    conditions = job_posting_filter_conditions()
+    if not conditions:
+        # Nessun filtro: i candidati sono già i risultati (gli annunci eliminati escono
+        # dall'indice con l'evento di eliminazione e vengono comunque saltati dal loader)
+        matching_ids = candidate_ids
+    else:
+        # Filtri applicati ai candidati in ordine di punteggio, a blocchi, solo fino a
+        # riempire la pagina richiesta (più uno, per sapere se ce ne sono altri)
+        matching_ids = []
+        scanned = 0
+        while scanned < len(candidate_ids) and len(matching_ids) <= page * per_page:
+            chunk = candidate_ids[scanned:scanned + SEARCH_FILTER_CHUNK_SIZE]
+            allowed_ids = {row[0] for row in db.session.query(JobPosting.id).filter(JobPosting.id.in_(chunk), *conditions)}
+            matching_ids.extend(job_posting_id for job_posting_id in chunk if job_posting_id in allowed_ids)
+            scanned += len(chunk)
+        if scanned < len(candidate_ids):
+            # Totale stimato dalla proporzione di candidati ammessi nei blocchi letti
+            total_is_estimate = True
+            estimated_total = max(round(len(matching_ids) / scanned * len(candidate_ids)), len(matching_ids))
+    total = estimated_total if total_is_estimate else len(matching_ids)
+    
+    # Carica solo gli annunci della pagina richiesta
+    page_ids = matching_ids[(page - 1) * per_page:page * per_page]
+    job_postings = get_loader(JobPosting).with_options(*serialization_options(JobPosting, fields)).load_many(page_ids)
+    
+    results = []
+    for job_posting in job_postings:
+        if job_posting:
+            job_posting_dict = job_posting.to_dict(fields)
+            job_posting_dict['score'] = round(scores[job_posting.id], 4)
+            results.append(job_posting_dict)
+    
+    result = {
+        'job_postings': results,
+        'total': total,
+        'pages': math.ceil(total / per_page),
         'current_page': page
     }
+    if total_is_estimate:
+        result['total_is_estimate'] = True
     
     return jsonify(result)
 
@@ -73,54 +195,74 @@ def get_company_job_postings(company_id):
     # Verifica che l'azienda esista
     company = Company.query.get_or_404(company_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     is_published = request.args.get('is_published', type=bool)
+    # Campi richiesti con ?fields= (la SELECT carica solo le colonne necessarie)
+    fields = requested_fields(JobPosting)
     
     # Costruisci la query base
-    query = JobPosting.query.filter_by(company_id=company_id)
+    query = load_fields(JobPosting.query.filter_by(company_id=company_id), JobPosting, fields, extra=JOB_POSTING_VERSION_FIELDS)
     
     # Applica i filtri se presenti
     if is_published is not None:
         query = query.filter(JobPosting.is_published == is_published)
     
-    # Esegui la query paginata
-    job_postings_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Esegui la query paginata (offset o cursore)
+    job_postings_paginated = paginate_query(query, JobPosting.id)
+    
+    # ETag debole calcolato dagli elementi della pagina: risponde 304 senza serializzare
+    etag, _ = page_etag(job_postings_paginated.items, job_postings_paginated.meta, version=job_posting_version)
+    cached = not_modified(etag, weak=True)
+    if cached:
+        return cached
     
     # Prepara la risposta
     result = {
-        'job_postings': [job_posting.to_dict() for job_posting in job_postings_paginated.items],
-        'total': job_postings_paginated.total,
-        'pages': job_postings_paginated.pages,
-        'current_page': page
+        'job_postings': serialize_many(job_postings_paginated.items, fields),
+        **job_postings_paginated.meta
     }
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag, weak=True)
 
 # Endpoint per ottenere un singolo annuncio di lavoro
 @job_posting_bp.route('/job-postings/<int:job_posting_id>', methods=['GET'])
 def get_job_posting(job_posting_id):
-    job_posting = JobPosting.query.get_or_404(job_posting_id)
-    
-    # Incrementa il contatore delle visualizzazioni
-    job_posting.views_count += 1
-    db.session.commit()
-    
-    return jsonify(job_posting.to_dict())
+    # Dizionario serializzato dalla cache delle entità (una query solo se manca)
+    job_posting = entity_cache.load(JobPosting, job_posting_id)
+    if job_posting is None:
+        abort(404)
+    
+    # Una rivalidazione con esito 304 non conta come visualizzazione
+    cached = not_modified(job_posting_etag(job_posting))
+    if cached:
+        return cached
+    
+    # Incrementa il contatore delle visualizzazioni (in memoria, scritto in blocco periodicamente)
+    job_posting_id = job_posting.data['id']
+    view_counter.increment(job_posting_id)
+    
+    # views_count è quello salvato (aggiornato a ogni scaricamento), coerente con l'ETag
+    return with_etag(jsonify(job_posting.data), job_posting_etag(job_posting))
 
 # Endpoint per ottenere un annuncio di lavoro tramite slug
 @job_posting_bp.route('/job-postings/slug/<string:slug>', methods=['GET'])
 def get_job_posting_by_slug(slug):
-    job_posting = JobPosting.query.filter_by(slug=slug).first_or_404()
-    
-    # Incrementa il contatore delle visualizzazioni
-    job_posting.views_count += 1
-    db.session.commit()
-    
-    return jsonify(job_posting.to_dict())
+    # Dizionario serializzato dalla cache delle entità (una query solo se manca)
+    job_posting = entity_cache.load_by_slug(JobPosting, slug)
+    if job_posting is None:
+        abort(404)
+    
+    # Una rivalidazione con esito 304 non conta come visualizzazione
+    cached = not_modified(job_posting_etag(job_posting))
+    if cached:
+        return cached
+    
+    # Incrementa il contatore delle visualizzazioni (in memoria, scritto in blocco periodicamente)
+    job_posting_id = job_posting.data['id']
+    view_counter.increment(job_posting_id)
+    
+    # views_count è quello salvato (aggiornato a ogni scaricamento), coerente con l'ETag
+    return with_etag(jsonify(job_posting.data), job_posting_etag(job_posting))
 
 # Endpoint per creare un nuovo annuncio di lavoro
 @job_posting_bp.route('/companies/<int:company_id>/job-postings', methods=['POST'])
@@ -169,10 +311,217 @@ def create_job_posting(company_id):
         new_job_posting.publish_date = datetime.utcnow()
     
     db.session.add(new_job_posting)
+    db.session.flush()
+    company_stats.refresh_company_stats(company_id)
+    event_bus.emit(JobPostingsChanged([new_job_posting.id]))
     db.session.commit()
     
     return jsonify(new_job_posting.to_dict()), 201
 
+# Segnaposto per una riga NDJSON che non è JSON valido
+BULK_INVALID_LINE = object()
+
+# Legge gli annunci da importare: un array JSON (anche {"job_postings": [...]}) oppure NDJSON
+# (Content-Type application/x-ndjson, un annuncio per riga). Le righe NDJSON non valide
+# diventano errori del singolo elemento.
+def read_bulk_job_postings():
+    max_items = current_app.config.get('JOB_POSTING_BULK_MAX_ITEMS', 1000)
+    if request.mimetype == 'application/x-ndjson':
+        items = []
+        too_many = False
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            if len(items) >= max_items:
+                too_many = True
+                break
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(BULK_INVALID_LINE)
+    else:
+        items = request.get_json(silent=True)
+        if isinstance(items, dict):
+            items = items.get('job_postings')
+        if not isinstance(items, list):
+            abort(make_response(jsonify({'error': 'Atteso un array JSON di annunci o un body NDJSON'}), 400))
+        too_many = len(items) > max_items
+    if too_many:
+        abort(make_response(jsonify({'error': f'Troppi annunci: il massimo per richiesta è {max_items}'}), 413))
+    if not items:
+        abort(make_response(jsonify({'error': 'Nessun annuncio da importare'}), 400))
+    return items
+
+# Limiti delle colonne INT e TEXT di MySQL
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+TEXT_MAX_BYTES = 65535
+
+# Verifica un valore rispetto alla colonna del modello (NULL, tipo, lunghezza) prima di
+# inviarlo al database. Restituisce il messaggio di errore oppure None.
+def column_value_error(column, value):
+    if value is None:
+        return None if column.nullable else f'{column.name} obbligatorio'
+    python_type = column.type.python_type
+    if python_type is bool:
+        valid = isinstance(value, bool)
+    elif python_type is int:
+        valid = isinstance(value, int) and not isinstance(value, bool) and INT_MIN <= value <= INT_MAX
+    elif python_type is datetime:
+        valid = isinstance(value, datetime)
+    else:
+        valid = isinstance(value, str)
+    if not valid:
+        return f'{column.name} non valido: atteso {python_type.__name__}'
+    if python_type is str:
+        if column.type.length and len(value) > column.type.length:
+            return f'{column.name} troppo lungo (massimo {column.type.length} caratteri)'
+        if not column.type.length and len(value.encode('utf-8')) > TEXT_MAX_BYTES:
+            return f'{column.name} troppo lungo (massimo {TEXT_MAX_BYTES} byte)'
+    return None
+
+# Valida un annuncio da importare e ne prepara la riga (stessi valori predefiniti di
+# create_job_posting). Restituisce (riga, None) oppure (None, errore).
+def bulk_job_posting_row(company_id, data, now):
+    if data is BULK_INVALID_LINE:
+        return None, 'JSON non valido'
+    if not isinstance(data, dict):
+        return None, 'Ogni annuncio deve essere un oggetto JSON'
+    if not data.get('title') or not data.get('description') or not data.get('requirements') or not data.get('responsibilities'):
+        return None, 'Dati mancanti'
+    if not isinstance(data['title'], str) or len(data['title']) > 100:
+        return None, 'Titolo non valido (massimo 100 caratteri)'
+    expiry_date = data.get('expiry_date')
+    if expiry_date:
+        try:
+            expiry_date = datetime.fromisoformat(expiry_date)
+        except (TypeError, ValueError):
+            return None, 'expiry_date non valida: usare una data ISO 8601'
+    is_published = bool(data.get('is_published', False))
+    row = {
+        'company_id': company_id,
+        'title': data['title'],
+        'description': data['description'],
+        'requirements': data['requirements'],
+        'responsibilities': data['responsibilities'],
+        'location': data.get('location', ''),
+        'is_remote': data.get('is_remote', False),
+        'is_hybrid': data.get('is_hybrid', False),
+        'job_type': data.get('job_type', 'full-time'),
+        'experience_level': data.get('experience_level', 'mid'),
+        'salary_min': data.get('salary_min'),
+        'salary_max': data.get('salary_max'),
+        'salary_currency': data.get('salary_currency', 'EUR'),
+        'salary_period': data.get('salary_period', 'year'),
+        'benefits': data.get('benefits'),
+        'skills': json.dumps(data.get('skills', [])) if isinstance(data.get('skills'), list) else data.get('skills'),
+        'application_url': data.get('application_url'),
+        'application_email': data.get('application_email'),
+        'application_instructions': data.get('application_instructions'),
+        'is_published': is_published,
+        'is_featured': data.get('is_featured', False),
+        'expiry_date': expiry_date or None,
+        'publish_date': now if is_published else None
+    }
+    # Ogni colonna controllata sul modello: un valore rifiutato dal database farebbe fallire l'intero blocco
+    columns = JobPosting.__table__.columns
+    for name, value in row.items():
+        error = column_value_error(columns[name], value)
+        if error:
+            return None, error
+    return row, None
+
+# Inserisce un blocco di righe con un solo INSERT multiplo (executemany) e restituisce
+# (indice, id, slug, errore) per ogni riga. Se un'altra richiesta ha appena usato uno degli
+# slug il blocco viene ripetuto con slug nuovi; se il database rifiuta una riga il blocco
+# viene ripetuto riga per riga, così l'errore resta del singolo annuncio.
+def insert_job_posting_chunk(chunk, attempts=3):
+    for attempt in range(attempts):
+        slugs = generate_unique_slugs([row['title'] for _, row in chunk])
+        try:
+            with db.session.begin_nested():
+                # render_nulls: i None vengono inviati come NULL, così tutte le righe hanno le
+                # stesse colonne e finiscono in un unico executemany
+                db.session.execute(
+                    db.insert(JobPosting).execution_options(render_nulls=True),
+                    [dict(row, slug=slug) for (_, row), slug in zip(chunk, slugs)]
+                )
+        except IntegrityError as e:
+            if is_unique_violation(e) and attempt < attempts - 1:
+                continue
+            if is_unique_violation(e):
+                raise
+            return insert_job_posting_rows(chunk)
+        except (DataError, OperationalError):
+            return insert_job_posting_rows(chunk)
+        # Id letti tramite gli slug (unici): MySQL non supporta RETURNING
+        ids = dict(db.session.query(JobPosting.slug, JobPosting.id).filter(JobPosting.slug.in_(slugs)))
+        return [(index, ids[slug], slug, None) for (index, _), slug in zip(chunk, slugs)]
+
+# Inserisce le righe una alla volta, ognuna nel proprio savepoint: le righe rifiutate dal
+# database diventano errori del singolo annuncio e le altre vengono inserite
+def insert_job_posting_rows(chunk):
+    results = []
+    for index, row in chunk:
+        slug = generate_unique_slugs([row['title']])[0]
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(JobPosting).execution_options(render_nulls=True), [dict(row, slug=slug)])
+        except (DataError, IntegrityError, OperationalError) as e:
+            results.append((index, None, None, f'Annuncio rifiutato dal database: {e.orig}'))
+            continue
+        job_posting_id = db.session.query(JobPosting.id).filter(JobPosting.slug == slug).scalar()
+        results.append((index, job_posting_id, slug, None))
+    return results
+
+# Endpoint per importare in blocco gli annunci di un'azienda
+@job_posting_bp.route('/companies/<int:company_id>/job-postings/bulk', methods=['POST'])
+def bulk_create_job_postings(company_id):
+    # Verifica che l'azienda esista
+    if db.session.query(Company.id).filter(Company.id == company_id).first() is None:
+        abort(404)
+    
+    items = read_bulk_job_postings()
+    
+    # Validazione dell'intero lotto prima di scrivere: gli annunci non validi vengono
+    # segnalati singolarmente e gli altri importati
+    now = datetime.utcnow()
+    results = [None] * len(items)
+    rows = []
+    for index, item in enumerate(items):
+        row, error = bulk_job_posting_row(company_id, item, now)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            rows.append((index, row))
+    
+    # Inserimento a blocchi, in un'unica transazione
+    chunk_size = current_app.config.get('JOB_POSTING_BULK_CHUNK_SIZE', 500)
+    created_ids = []
+    for start in range(0, len(rows), chunk_size):
+        for index, job_posting_id, slug, error in insert_job_posting_chunk(rows[start:start + chunk_size]):
+            if error:
+                results[index] = {'index': index, 'status': 'error', 'error': error}
+                continue
+            results[index] = {'index': index, 'status': 'created', 'id': job_posting_id, 'slug': slug}
+            created_ids.append(job_posting_id)
+    
+    if created_ids:
+        company_stats.refresh_company_stats(company_id)
+        event_bus.emit(JobPostingsChanged(created_ids))
+        db.session.commit()
+    
+    failed = len(items) - len(created_ids)
+    result = {
+        'created': len(created_ids),
+        'failed': failed,
+        'results': results
+    }
+    
+    # 201 se tutti gli annunci sono stati creati, 207 se solo alcuni, 400 se nessuno
+    status = 201 if not failed else 207 if created_ids else 400
+    return jsonify(result), status
+
 # Endpoint per aggiornare un annuncio di lavoro
 @job_posting_bp.route('/job-postings/<int:job_posting_id>', methods=['PUT'])
 def update_job_posting(job_posting_id):
@@ -221,7 +570,9 @@ def update_job_posting(job_posting_id):
     if 'expiry_date' in data:
         job_posting.expiry_date = data['expiry_date']
     
-    job_posting.updated_at = datetime.utcnow()
+    job_posting.updated_at = db.func.now()
+    company_stats.refresh_company_stats(job_posting.company_id)
+    event_bus.emit(JobPostingsChanged([job_posting_id]))
     
     db.session.commit()
     
@@ -242,7 +593,9 @@ def publish_job_posting(job_posting_id):
     
     job_posting.is_published = True
     job_posting.publish_date = datetime.utcnow()
-    job_posting.updated_at = datetime.utcnow()
+    job_posting.updated_at = db.func.now()
+    company_stats.refresh_company_stats(job_posting.company_id)
+    event_bus.emit(JobPostingPublished(job_posting_id, job_posting.company_id, True))
     
     db.session.commit()
     
@@ -254,7 +607,9 @@ def unpublish_job_posting(job_posting_id):
     job_posting = JobPosting.query.get_or_404(job_posting_id)
     
     job_posting.is_published = False
-    job_posting.updated_at = datetime.utcnow()
+    job_posting.updated_at = db.func.now()
+    company_stats.refresh_company_stats(job_posting.company_id)
+    event_bus.emit(JobPostingPublished(job_posting_id, job_posting.company_id, False))
     
     db.session.commit()
     
@@ -266,6 +621,8 @@ def delete_job_posting(job_posting_id):
     job_posting = JobPosting.query.get_or_404(job_posting_id)
     
     db.session.delete(job_posting)
+    company_stats.refresh_company_stats(job_posting.company_id)
+    event_bus.emit(JobPostingDeleted(job_posting_id))
     db.session.commit()
     
     return jsonify({'message': 'Annuncio eliminato con successo'})
@@ -285,3 +642,28 @@ def get_job_posting_stats(job_posting_id):
     }
     
     return jsonify(stats)
+
+# Endpoint per la serie storica di visualizzazioni e candidature di un annuncio
+@job_posting_bp.route('/job-postings/<int:job_posting_id>/stats/timeseries', methods=['GET'])
+def get_job_posting_timeseries(job_posting_id):
+    # Verifica che l'annuncio esista senza caricarne l'intera riga
+    if db.session.query(JobPosting.id).filter(JobPosting.id == job_posting_id).first() is None:
+        abort(404)
+    
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ('day', 'week'):
+        return jsonify({'error': 'Raggruppamento non valido. I valori validi sono: day, week'}), 400
+    
+    # Intervallo di date (predefinito: ultimi 30 giorni)
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else datetime.utcnow().date()
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Date non valide. Usa il formato YYYY-MM-DD'}), 400
+    
+    if start > end:
+        return jsonify({'error': 'La data iniziale deve precedere quella finale'}), 400
+    if (end - start).days >= 366:
+        return jsonify({'error': 'L\'intervallo massimo è di 366 giorni'}), 400
+    
+    return jsonify(get_timeseries(job_posting_id, start, end, bucket))
@@ -1,21 +1,29 @@
-from flask import Blueprint, jsonify, request
-from src.models.company.communication import Conversation, Message, db
+from flask import Blueprint, abort, current_app, jsonify, make_response, request
+from src.models.company.communication import ArchivedMessage, Conversation, Message, conversation_messages_query, db
 from src.models.company.company import Company, CompanyUser
 from src.models.user import User
-from datetime import datetime
+from src.utils.events import ConversationArchived, ConversationRead, MessageSent, event_bus
+from src.utils.http_cache import make_etag, not_modified, with_etag
+from src.utils.loaders import get_loader
+from src.utils.pagination import paginate_by_id, paginate_query
+from src.utils.serializers import serialization_options
+from datetime import datetime, timedelta
+import base64
+import json
 
 messaging_bp = Blueprint('messaging', __name__)
 
+# Evento di lettura della conversazione (conferme di lettura), da emettere prima del commit
+def emit_read_event(conversation, reader_type):
+    last_read_message_id = conversation.user_last_read_message_id if reader_type == 'user' else conversation.company_last_read_message_id
+    event_bus.emit(ConversationRead(conversation.id, conversation.user_id, conversation.company_id, reader_type, last_read_message_id))
+
 # Endpoint per ottenere tutte le conversazioni di un'azienda
 @messaging_bp.route('/companies/<int:company_id>/conversations', methods=['GET'])
 def get_company_conversations(company_id):
     # Verifica che l'azienda esista
     company = Company.query.get_or_404(company_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     is_archived = request.args.get('is_archived', type=bool)
     
@@ -26,54 +34,36 @@ def get_company_conversations(company_id):
     if is_archived is not None:
         query = query.filter(Conversation.is_archived_by_company == is_archived)
     
-    # Ordina per data dell'ultimo messaggio (più recenti prima)
-    query = query.order_by(Conversation.last_message_at.desc())
+    # Esegui la query paginata (offset o cursore), ultimo messaggio più recente prima
+    conversations_paginated = paginate_query(query, Conversation.last_message_at, descending=True)
     
-    # Esegui la query paginata
-    conversations_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Carica gli utenti della pagina in blocco
+    conversations = conversations_paginated.items
+    user_loader = get_loader(User).prime(conversation.user_id for conversation in conversations)
     
     # Prepara la risposta con informazioni aggiuntive sugli utenti
     conversations_with_users = []
-    for conversation in conversations_paginated.items:
+    for conversation in conversations:
         conv_dict = conversation.to_dict()
         
         # Aggiungi informazioni sull'utente
-        user = User.query.get(conversation.user_id)
+        user = user_loader.load(conversation.user_id)
         if user:
-            conv_dict['user'] = {
-                'id': user.id,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email,
-                'profile_picture': user.profile_picture
-            }
+            conv_dict['user'] = user.to_dict(fields='contact')
         
-        # Aggiungi l'ultimo messaggio
-        last_message = Message.query.filter_by(conversation_id=conversation.id).order_by(Message.created_at.desc()).first()
+        # Aggiungi l'ultimo messaggio (dal riepilogo denormalizzato)
+        last_message = conversation.last_message_summary()
         if last_message:
-            conv_dict['last_message'] = {
-                'id': last_message.id,
-                'content': last_message.content[:100] + '...' if len(last_message.content) > 100 else last_message.content,
-                'sender_type': last_message.sender_type,
-                'is_read': last_message.is_read,
-                'created_at': last_message.created_at.isoformat() if last_message.created_at else None
-            }
+            conv_dict['last_message'] = last_message
         
         # Aggiungi il conteggio dei messaggi non letti
-        unread_count = Message.query.filter_by(
-            conversation_id=conversation.id,
-            sender_type='user',
-            is_read=False
-        ).count()
-        conv_dict['unread_count'] = unread_count
+        conv_dict['unread_count'] = conversation.company_unread_count
         
         conversations_with_users.append(conv_dict)
     
     result = {
         'conversations': conversations_with_users,
-        'total': conversations_paginated.total,
-        'pages': conversations_paginated.pages,
-        'current_page': page
+        **conversations_paginated.meta
     }
     
     return jsonify(result)
@@ -84,10 +74,6 @@ def get_user_conversations(user_id):
     # Verifica che l'utente esista
     user = User.query.get_or_404(user_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
     # Parametri di filtro
     is_archived = request.args.get('is_archived', type=bool)
     
@@ -98,52 +84,128 @@ def get_user_conversations(user_id):
     if is_archived is not None:
         query = query.filter(Conversation.is_archived_by_user == is_archived)
     
-    # Ordina per data dell'ultimo messaggio (più recenti prima)
-    query = query.order_by(Conversation.last_message_at.desc())
+    # Esegui la query paginata (offset o cursore), ultimo messaggio più recente prima
+    conversations_paginated = paginate_query(query, Conversation.last_message_at, descending=True)
     
-    # Esegui la query paginata
-    conversations_paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Carica le aziende della pagina in blocco
+    conversations = conversations_paginated.items
+    company_loader = get_loader(Company).prime(conversation.company_id for conversation in conversations)
     
     # Prepara la risposta con informazioni aggiuntive sulle aziende
     conversations_with_companies = []
-    for conversation in conversations_paginated.items:
+    for conversation in conversations:
         conv_dict = conversation.to_dict()
         
         # Aggiungi informazioni sull'azienda
-        company = Company.query.get(conversation.company_id)
+        company = company_loader.load(conversation.company_id)
         if company:
-            conv_dict['company'] = {
-                'id': company.id,
-                'name': company.name,
-                'logo': company.logo
-            }
+            conv_dict['company'] = company.to_dict(fields='brief')
         
-        # Aggiungi l'ultimo messaggio
-        last_message = Message.query.filter_by(conversation_id=conversation.id).order_by(Message.created_at.desc()).first()
+        # Aggiungi l'ultimo messaggio (dal riepilogo denormalizzato)
+        last_message = conversation.last_message_summary()
         if last_message:
-            conv_dict['last_message'] = {
-                'id': last_message.id,
-                'content': last_message.content[:100] + '...' if len(last_message.content) > 100 else last_message.content,
-                'sender_type': last_message.sender_type,
-                'is_read': last_message.is_read,
-                'created_at': last_message.created_at.isoformat() if last_message.created_at else None
-            }
+            conv_dict['last_message'] = last_message
         
         # Aggiungi il conteggio dei messaggi non letti
-        unread_count = Message.query.filter_by(
-            conversation_id=conversation.id,
-            sender_type='company',
-            is_read=False
-        ).count()
-        conv_dict['unread_count'] = unread_count
+        conv_dict['unread_count'] = conversation.user_unread_count
         
         conversations_with_companies.append(conv_dict)
     
     result = {
         'conversations': conversations_with_companies,
-        'total': conversations_paginated.total,
-        'pages': conversations_paginated.pages,
-        'current_page': page
+        **conversations_paginated.meta
+    }
+    
+    return jsonify(result)
+
+# Numero massimo di messaggi restituiti da una sincronizzazione (gli altri con has_more)
+SYNC_MAX_MESSAGES = 500
+
+# Finestra di sicurezza (secondi) riletta a ogni sincronizzazione dietro ai due watermark. Id e
+# updated_at vengono assegnati prima del commit, quindi una transazione può diventare visibile
+# dopo una sincronizzazione che ha già superato il suo id (in un'altra conversazione) o il suo
+# updated_at. Basta che ogni transazione duri meno della finestra: le righe rilette vengono
+# restituite di nuovo e il client le deduplica per id.
+SYNC_SAFETY_WINDOW = 60
+
+# Token opaco della sincronizzazione: ultimo messaggio ricevuto dal client e ora del database
+# da cui cercare le conversazioni modificate
+def encode_sync_token(last_message_id, changed_since):
+    payload = json.dumps({'m': last_message_id, 't': changed_since.isoformat()}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_sync_token(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return int(payload['m']), datetime.fromisoformat(payload['t'])
+    except (ValueError, KeyError, TypeError):
+        abort(make_response(jsonify({'error': 'Token di sincronizzazione non valido'}), 400))
+
+# Endpoint per sincronizzare in una sola richiesta le conversazioni di un utente: nuovi
+# messaggi e conversazioni modificate (letture, archiviazioni, ultimo messaggio) dal token.
+# Messaggi e conversazioni possono ripetersi tra due sincronizzazioni (finestra di sicurezza):
+# il client li sostituisce per id.
+@messaging_bp.route('/users/<int:user_id>/sync', methods=['GET'])
+def sync_user_conversations(user_id):
+    # Verifica che l'utente esista
+    if db.session.query(User.id).filter(User.id == user_id).first() is None:
+        abort(404)
+    
+    limit = max(1, min(request.args.get('limit', SYNC_MAX_MESSAGES, type=int), SYNC_MAX_MESSAGES))
+    # Ora del database all'inizio: le modifiche successive arriveranno con il prossimo token
+    now = db.session.query(db.func.now()).scalar()
+    conversation_ids = db.select(Conversation.id).where(Conversation.user_id == user_id)
+    
+    token = request.args.get('since')
+    if token:
+        last_message_id, changed_since = decode_sync_token(token)
+        window_start = changed_since - timedelta(seconds=current_app.config.get('SYNC_SAFETY_WINDOW', SYNC_SAFETY_WINDOW))
+        conversations = Conversation.query.filter(
+            Conversation.user_id == user_id,
+            Conversation.updated_at >= window_start
+        ).order_by(Conversation.id).all()
+        # Nuovi messaggi in ordine di id, sull'indice (conversation_id, id)
+        messages = Message.query.options(*serialization_options(Message)).filter(
+            Message.conversation_id.in_(conversation_ids),
+            Message.id > last_message_id
+        ).order_by(Message.id).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        # Messaggi della finestra con id già superato (commit arrivati fuori ordine). Ogni nuovo
+        # messaggio aggiorna la conversazione, quindi si cercano solo in quelle modificate nella
+        # finestra; sono pochi e non contano per limit.
+        recent_conversation_ids = [conversation.id for conversation in conversations]
+        if recent_conversation_ids and last_message_id:
+            messages = Message.query.options(*serialization_options(Message)).filter(
+                Message.conversation_id.in_(recent_conversation_ids),
+                Message.id <= last_message_id,
+                Message.created_at >= window_start
+            ).order_by(Message.id).all() + messages
+        if messages:
+            last_message_id = max(last_message_id, messages[-1].id)
+    else:
+        # Prima sincronizzazione: stato di tutte le conversazioni; lo storico dei messaggi si
+        # legge per conversazione con before_id
+        conversations = Conversation.query.filter_by(user_id=user_id).order_by(Conversation.id).all()
+        messages = []
+        has_more = False
+        last_message_id = db.session.query(db.func.max(Message.id)).filter(Message.conversation_id.in_(conversation_ids)).scalar() or 0
+    
+    # Prepara la risposta con lo stato di lettura delle conversazioni
+    conversations_state = []
+    for conversation in conversations:
+        conv_dict = conversation.to_dict()
+        conv_dict['last_message'] = conversation.last_message_summary()
+        conv_dict['unread_count'] = conversation.user_unread_count
+        conv_dict['user_last_read_message_id'] = conversation.user_last_read_message_id
+        conv_dict['company_last_read_message_id'] = conversation.company_last_read_message_id
+        conversations_state.append(conv_dict)
+    
+    result = {
+        'conversations': conversations_state,
+        'messages': [message.to_dict() for message in messages],
+        'has_more': has_more,
+        'next_token': encode_sync_token(last_message_id, now)
     }
     
     return jsonify(result)
@@ -152,30 +214,30 @@ def get_user_conversations(user_id):
 @messaging_bp.route('/conversations/<int:conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     conversation = Conversation.query.get_or_404(conversation_id)
+    user = User.query.get(conversation.user_id)
+    company = Company.query.get(conversation.company_id)
+    
+    # La conversazione non ha updated_at: la versione comprende i campi modificabili e le righe collegate
+    etag = make_etag(
+        'conversation', conversation.id, conversation.last_message_at,
+        conversation.is_archived_by_user, conversation.is_archived_by_company,
+        user.updated_at if user else None, company.updated_at if company else None
+    )
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
     result = conversation.to_dict()
     
     # Aggiungi informazioni sull'utente
-    user = User.query.get(conversation.user_id)
     if user:
-        result['user'] = {
-            'id': user.id,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email,
-            'profile_picture': user.profile_picture
-        }
+        result['user'] = user.to_dict(fields='contact')
     
     # Aggiungi informazioni sull'azienda
-    company = Company.query.get(conversation.company_id)
     if company:
-        result['company'] = {
-            'id': company.id,
-            'name': company.name,
-            'logo': company.logo
-        }
+        result['company'] = company.to_dict(fields='brief')
     
-    return jsonify(result)
+    return with_etag(jsonify(result), etag)
 
 # Endpoint per creare una nuova conversazione
 @messaging_bp.route('/conversations', methods=['POST'])
@@ -217,11 +279,13 @@ def create_conversation():
             conversation_id=new_conversation.id,
             sender_type=data.get('sender_type', 'user'),
             sender_id=data['user_id'] if data.get('sender_type', 'user') == 'user' else data.get('company_user_id'),
-            content=data['initial_message'],
-            is_read=False
+            content=data['initial_message']
         )
         
         db.session.add(new_message)
+        db.session.flush()
+        new_conversation.record_message(new_message)
+        event_bus.emit(MessageSent(new_conversation.id, new_conversation.user_id, new_conversation.company_id, new_message.to_dict()))
         db.session.commit()
     
     return jsonify(new_conversation.to_dict()), 201
@@ -231,19 +295,30 @@ def create_conversation():
 def get_conversation_messages(conversation_id):
     conversation = Conversation.query.get_or_404(conversation_id)
     
-    # Parametri di paginazione
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    # Ottieni i messaggi ordinati per data (più vecchi prima)
-    messages_paginated = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).paginate(page=page, per_page=per_page, error_out=False)
+    # Ottieni i messaggi ordinati per data (più vecchi prima): delta da un messaggio già
+    # ricevuto (?after_id= / ?before_id=), per offset o per cursore. I messaggi archiviati
+    # si leggono dalla tabella fredda solo se la pagina va oltre quelli recenti (delta) o
+    # insieme a quelli recenti (offset e cursore).
+    options = serialization_options(Message)
+    if 'after_id' in request.args or 'before_id' in request.args:
+        query = Message.query.options(*options).filter_by(conversation_id=conversation_id)
+        archive = None
+        if conversation.archived_through_message_id is not None:
+            archive = (
+                ArchivedMessage.query.options(*options).filter_by(conversation_id=conversation_id),
+                ArchivedMessage.id,
+                conversation.archived_through_message_id
+            )
+        messages_paginated = paginate_by_id(query, Message.id, archive=archive)
+    else:
+        query = conversation_messages_query(conversation).options(*options)
+        sort_column = query.column_descriptions[0]['entity'].created_at
+        messages_paginated = paginate_query(query, sort_column, per_page=20)
     
     # Prepara la risposta
     result = {
         'messages': [message.to_dict() for message in messages_paginated.items],
-        'total': messages_paginated.total,
-        'pages': messages_paginated.pages,
-        'current_page': page
+        **messages_paginated.meta
     }
     
     return jsonify(result)
@@ -251,7 +326,8 @@ def get_conversation_messages(conversation_id):
 # Endpoint per inviare un nuovo messaggio
 @messaging_bp.route('/conversations/<int:conversation_id>/messages', methods=['POST'])
 def send_message(conversation_id):
-    conversation = Conversation.query.get_or_404(conversation_id)
+    # Blocca la riga della conversazione: gli invii concorrenti aggiornano il riepilogo in ordine
+    conversation = Conversation.query.filter_by(id=conversation_id).with_for_update().first_or_404()
     data = request.get_json()
     
     # Validazione base
@@ -279,14 +355,14 @@ def send_message(conversation_id):
         conversation_id=conversation_id,
         sender_type=data['sender_type'],
         sender_id=data['sender_id'],
-        content=data['content'],
-        is_read=False
+        content=data['content']
     )
     
     db.session.add(new_message)
+    db.session.flush()
     
-    # Aggiorna la data dell'ultimo messaggio nella conversazione
-    conversation.last_message_at = datetime.utcnow()
+    # Aggiorna il riepilogo della conversazione (ultimo messaggio e non letti) nella stessa transazione
+    conversation.record_message(new_message)
     
     # Se la conversazione era archiviata, ripristinala
     if data['sender_type'] == 'user' and conversation.is_archived_by_user:
@@ -294,17 +370,32 @@ def send_message(conversation_id):
     elif data['sender_type'] == 'company' and conversation.is_archived_by_company:
         conversation.is_archived_by_company = False
     
+    # Notifica i client connessi di entrambi i partecipanti dopo il commit
+    result = new_message.to_dict()
+    event_bus.emit(MessageSent(conversation_id, conversation.user_id, conversation.company_id, result))
+    
     db.session.commit()
     
-    return jsonify(new_message.to_dict()), 201
+    return jsonify(result), 201
 
 # Endpoint per segnare un messaggio come letto
 @messaging_bp.route('/messages/<int:message_id>/read', methods=['PUT'])
 def mark_message_as_read(message_id):
-    message = Message.query.get_or_404(message_id)
-    
-    message.is_read = True
-    db.session.commit()
+    message = db.session.get(Message, message_id)
+    if message is None:
+        # Un messaggio archiviato è già letto: stessa risposta di quelli ancora nella tabella attiva
+        if db.session.query(ArchivedMessage.id).filter(ArchivedMessage.id == message_id).first() is None:
+            abort(404)
+        return jsonify({'message': 'Messaggio segnato come letto', 'message_id': message_id})
+    
+    # Avanza il watermark di lettura (riga della conversazione bloccata fino al commit)
+    if not message.is_read:
+        conversation = Conversation.query.filter_by(id=message.conversation_id).with_for_update().first()
+        conversation.record_message_read(message)
+        emit_read_event(conversation, 'company' if message.sender_type == 'user' else 'user')
+        db.session.commit()
+    else:
+        db.session.commit()
     
     return jsonify({'message': 'Messaggio segnato come letto', 'message_id': message_id})
 
@@ -322,20 +413,16 @@ def mark_conversation_as_read(conversation_id):
     if data['reader_type'] not in ['user', 'company']:
         return jsonify({'error': 'Tipo di lettore non valido. I tipi validi sono: user, company'}), 400
     
-    # Segna come letti tutti i messaggi inviati dal tipo opposto
-    sender_type = 'company' if data['reader_type'] == 'user' else 'user'
-    unread_messages = Message.query.filter_by(
-        conversation_id=conversation_id,
-        sender_type=sender_type,
-        is_read=False
-    ).all()
-    
-    for message in unread_messages:
-        message.is_read = True
-    
+    # Tutti i messaggi inviati dal tipo opposto risultano letti spostando il watermark del
+    # lettore all'ultimo messaggio: un solo UPDATE della conversazione
+    unread_count = conversation.user_unread_count if data['reader_type'] == 'user' else conversation.company_unread_count
+    conversation.record_conversation_read(data['reader_type'])
+    # Il nuovo watermark è calcolato dall'UPDATE: va riletto prima di emettere l'evento
+    db.session.flush()
+    emit_read_event(conversation, data['reader_type'])
     db.session.commit()
     
-    return jsonify({'message': f'{len(unread_messages)} messaggi segnati come letti'})
+    return jsonify({'message': f'{unread_count} messaggi segnati come letti'})
 
 # Endpoint per archiviare una conversazione
 @messaging_bp.route('/conversations/<int:conversation_id>/archive', methods=['PUT'])
@@ -357,6 +444,7 @@ def archive_conversation(conversation_id):
     else:  # company
         conversation.is_archived_by_company = True
     
+    event_bus.emit(ConversationArchived(conversation_id, conversation.user_id, conversation.company_id, data['archiver_type'], True))
     db.session.commit()
     
     return jsonify({'message': 'Conversazione archiviata con successo'})
@@ -381,6 +469,7 @@ def unarchive_conversation(conversation_id):
     else:  # company
         conversation.is_archived_by_company = False
     
+    event_bus.emit(ConversationArchived(conversation_id, conversation.user_id, conversation.company_id, data['archiver_type'], False))
     db.session.commit()
     
     return jsonify({'message': 'Conversazione ripristinata con successo'})
@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from src.utils.entity_cache import entity_cache
+from src.utils.event_stream import event_broker
+from src.utils.events import event_bus
+from src.utils.pagination import count_backend
+
+system_bp = Blueprint('system', __name__)
+
+# Endpoint per le statistiche delle cache in memoria (per dimensionarle)
+@system_bp.route('/system/cache-stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'entity_cache': entity_cache.stats(),
+        'count_cache': count_backend().stats()
+    })
+
+# Endpoint per lo stato degli eventi in tempo reale (connessioni in attesa ed eventi nel buffer)
+@system_bp.route('/system/event-stream-stats', methods=['GET'])
+def get_event_stream_stats():
+    return jsonify(event_broker.stats())
+
+# Endpoint per le metriche degli eventi di dominio (latenza di ogni subscriber)
+@system_bp.route('/system/event-bus-stats', methods=['GET'])
+def get_event_bus_stats():
+    return jsonify(event_bus.stats())
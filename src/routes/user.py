@@ -1,36 +1,29 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 from src.models.user import User, db
+from src.utils.http_cache import make_etag, not_modified, with_etag
+from src.utils.serializers import serialize_many
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
     users = User.query.all()
-    result = []
-    for user in users:
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name
-        }
-        result.append(user_data)
+    result = serialize_many(users, fields='list')
     return jsonify(result)
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
+    # Controlla la versione con una query leggera prima di caricare la riga completa
+    version = db.session.query(User.updated_at).filter(User.id == user_id).first()
+    if version is None:
+        abort(404)
+    cached = not_modified(make_etag('user', user_id, version.updated_at), version.updated_at)
+    if cached:
+        return cached
+    
     user = User.query.get_or_404(user_id)
-    user_data = {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-        'bio': user.bio,
-        'profile_picture': user.profile_picture
-    }
-    return jsonify(user_data)
+    user_data = user.to_dict()
+    return with_etag(jsonify(user_data), make_etag('user', user.id, user.updated_at), user.updated_at)
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -60,8 +53,4 @@ def create_user():
     db.session.add(new_user)
     db.session.commit()
     
-    return jsonify({
-        'id': new_user.id,
-        'username': new_user.username,
-        'email': new_user.email
-    }), 201
+    return jsonify(new_user.to_dict(fields=('id', 'username', 'email'))), 201
@@ -0,0 +1,142 @@
+from src.models.user import db
+from src.models.company.communication import ArchivedMessage, Conversation, Message
+from src.models.company.job_posting import Application, ApplicationActivity, ArchivedApplicationActivity
+from datetime import datetime, timedelta
+import time
+
+# Archiviazione a freddo: le righe vecchie di message e application_activity vengono copiate
+# nelle tabelle *_archive (stessi id, righe compresse) e cancellate, a blocchi di conversazioni
+# o candidature con una transazione per blocco. Per ogni conversazione (candidatura) si archivia
+# sempre un prefisso di id e il limite viene salvato nella riga padre: le letture sanno senza
+# query aggiuntive se e dove leggere la tabella fredda.
+
+MESSAGE_COLUMNS = ('id', 'conversation_id', 'sender_type', 'sender_id', 'content', 'preview', 'created_at')
+ACTIVITY_COLUMNS = ('id', 'application_id', 'company_user_id', 'activity_type', 'description', 'metadata', 'created_at')
+
+# Candidature chiuse, le cui attività non cambiano più
+CLOSED_APPLICATION_STATUSES = ('rejected', 'hired')
+
+# Righe copiate e cancellate da ogni istruzione
+MOVE_CHUNK_SIZE = 1000
+
+def _move_rows(source, target, columns, ids):
+    source, target = source.__table__, target.__table__
+    for start in range(0, len(ids), MOVE_CHUNK_SIZE):
+        chunk = ids[start:start + MOVE_CHUNK_SIZE]
+        # INSERT ... SELECT: i testi (anche compressi) passano così come sono
+        db.session.execute(target.insert().from_select(
+            list(columns), db.select(*[source.c[name] for name in columns]).where(source.c.id.in_(chunk))
+        ))
+        db.session.execute(source.delete().where(source.c.id.in_(chunk)))
+
+def _least(first, second):
+    return db.case((first < second, first), else_=second)
+
+def _archive_conversation_messages(conversation_ids, cutoff, archived_cutoff):
+    # Righe delle conversazioni bloccate: invii e letture concorrenti attendono il commit
+    db.session.query(Conversation.id).filter(Conversation.id.in_(conversation_ids)).with_for_update().all()
+
+    # Ultimo messaggio archiviabile: letto da entrambi (id non oltre i due watermark) e più
+    # vecchio della soglia, più breve per le conversazioni archiviate da entrambi
+    read_by_both = _least(
+        db.func.coalesce(Conversation.user_last_read_message_id, 0),
+        db.func.coalesce(Conversation.company_last_read_message_id, 0)
+    )
+    message_cutoff = db.case(
+        (db.and_(Conversation.is_archived_by_user == True, Conversation.is_archived_by_company == True), archived_cutoff),
+        else_=cutoff
+    )
+    boundaries = db.session.query(Message.conversation_id, db.func.max(Message.id)).join(
+        Conversation, Conversation.id == Message.conversation_id
+    ).filter(
+        Conversation.id.in_(conversation_ids),
+        Message.id <= read_by_both,
+        Message.created_at < message_cutoff
+    ).group_by(Message.conversation_id).all()
+    if not boundaries:
+        return 0
+
+    # Nuovo limite nella conversazione (senza cambiare updated_at: non è una modifica per i client)
+    conversation_table = Conversation.__table__
+    db.session.execute(
+        conversation_table.update()
+        .where(conversation_table.c.id == db.bindparam('conversation_id'))
+        .values(archived_through_message_id=db.bindparam('boundary'), updated_at=conversation_table.c.updated_at),
+        [{'conversation_id': conversation_id, 'boundary': boundary} for conversation_id, boundary in boundaries]
+    )
+    message_ids = [id for (id,) in db.session.query(Message.id).join(
+        Conversation, Conversation.id == Message.conversation_id
+    ).filter(
+        Conversation.id.in_([conversation_id for conversation_id, boundary in boundaries]),
+        Message.id <= Conversation.archived_through_message_id
+    )]
+    _move_rows(Message, ArchivedMessage, MESSAGE_COLUMNS, message_ids)
+    return len(message_ids)
+
+# Archivia i messaggi letti da entrambi i partecipanti più vecchi di older_than giorni
+# (archived_older_than per le conversazioni archiviate da entrambi). Restituisce il numero
+# di messaggi spostati.
+def archive_messages(older_than=365, archived_older_than=30, batch_size=100, pause=0):
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=older_than)
+    archived_cutoff = now - timedelta(days=archived_older_than)
+    last_id = 0
+    moved = 0
+    while True:
+        conversation_ids = [id for (id,) in db.session.query(Conversation.id).filter(
+            Conversation.id > last_id
+        ).order_by(Conversation.id).limit(batch_size)]
+        if not conversation_ids:
+            break
+        last_id = conversation_ids[-1]
+        moved += _archive_conversation_messages(conversation_ids, cutoff, archived_cutoff)
+        db.session.commit()
+        # Pausa tra i blocchi per non saturare il database (e le repliche)
+        if pause:
+            time.sleep(pause)
+
+    return moved
+
+def _archive_application_activities(application_ids):
+    db.session.query(Application.id).filter(Application.id.in_(application_ids)).with_for_update().all()
+
+    boundaries = db.session.query(ApplicationActivity.application_id, db.func.max(ApplicationActivity.id)).filter(
+        ApplicationActivity.application_id.in_(application_ids)
+    ).group_by(ApplicationActivity.application_id).all()
+    if not boundaries:
+        return 0
+
+    application_table = Application.__table__
+    db.session.execute(
+        application_table.update()
+        .where(application_table.c.id == db.bindparam('application_id'))
+        .values(archived_through_activity_id=db.bindparam('boundary'), updated_at=application_table.c.updated_at),
+        [{'application_id': application_id, 'boundary': boundary} for application_id, boundary in boundaries]
+    )
+    activity_ids = [id for (id,) in db.session.query(ApplicationActivity.id).filter(
+        ApplicationActivity.application_id.in_([application_id for application_id, boundary in boundaries])
+    )]
+    _move_rows(ApplicationActivity, ArchivedApplicationActivity, ACTIVITY_COLUMNS, activity_ids)
+    return len(activity_ids)
+
+# Archivia le attività delle candidature chiuse (o archiviate) da più di older_than giorni.
+# Restituisce il numero di attività spostate.
+def archive_application_activities(older_than=180, batch_size=100, pause=0):
+    cutoff = datetime.utcnow() - timedelta(days=older_than)
+    last_id = 0
+    moved = 0
+    while True:
+        application_ids = [id for (id,) in db.session.query(Application.id).filter(
+            Application.id > last_id,
+            db.or_(Application.status.in_(CLOSED_APPLICATION_STATUSES), Application.is_archived == True),
+            Application.updated_at < cutoff
+        ).order_by(Application.id).limit(batch_size)]
+        if not application_ids:
+            break
+        last_id = application_ids[-1]
+        moved += _archive_application_activities(application_ids)
+        db.session.commit()
+        if pause:
+            time.sleep(pause)
+
+    return moved
@@ -0,0 +1,328 @@
+from collections import OrderedDict
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Backend intercambiabili per le cache dell'applicazione (CACHE_BACKEND):
+# - memory: dizionario del processo, nessuna condivisione tra worker
+# - sqlite: file SQLite condiviso dai worker della stessa macchina (CACHE_SQLITE_PATH)
+# - redis: server Redis condiviso (CACHE_REDIS_URL, richiede il pacchetto redis)
+# Ogni cache usa un proprio namespace; i valori devono essere serializzabili con pickle.
+# max_size=None disattiva l'evizione (per namespace con poche chiavi che non devono sparire).
+BACKENDS = ('memory', 'sqlite', 'redis')
+
+def default_sqlite_path():
+    return os.path.join(tempfile.gettempdir(), 'jobfolio-cache.sqlite3')
+
+class MemoryBackend:
+    # Cache del processo con evizione LRU e scadenza per chiave
+    shared = False
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # chiave -> (scadenza, valore)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            while self.max_size is not None and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            return sum(1 for key in keys if self._entries.pop(key, None) is not None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'size': len(self._entries), 'max_size': self.max_size,
+                    'evictions': self.evictions, 'expirations': self.expirations}
+
+class SQLiteBackend:
+    # Cache in un file SQLite condiviso tra i processi della stessa macchina.
+    # L'evizione quando si supera max_size rimuove le voci scritte meno di recente.
+    shared = True
+
+    def __init__(self, path, namespace, max_size=1000):
+        self.path = path
+        self.namespace = namespace
+        self.max_size = max_size
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries (namespace TEXT NOT NULL, key TEXT NOT NULL, '
+                'value BLOB NOT NULL, expires_at REAL, written_at REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_written_at ON cache_entries (namespace, written_at)')
+
+    def _connection(self):
+        return local_connection(self._local, self.path)
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?', (self.namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, written_at) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, pickle.dumps(value), now + ttl if ttl else None, now)
+            )
+            # Rimuove le voci scadute e quelle oltre il limite, più vecchie per prime
+            connection.execute('DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?', (self.namespace, now))
+            if self.max_size is None:
+                return
+            evicted = connection.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key IN (SELECT key FROM cache_entries WHERE namespace = ? '
+                'ORDER BY written_at DESC LIMIT -1 OFFSET ?)', (self.namespace, self.namespace, self.max_size)
+            ).rowcount
+            self.evictions += max(evicted, 0)
+
+    def delete(self, keys):
+        keys = list(keys)
+        if not keys:
+            return 0
+        with self._connection() as connection:
+            return connection.executemany(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key = ?', [(self.namespace, key) for key in keys]
+            ).rowcount
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+    def stats(self):
+        size = self._connection().execute('SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.namespace,)).fetchone()[0]
+        return {'backend': 'sqlite', 'size': size, 'max_size': self.max_size, 'evictions': self.evictions}
+
+class RedisBackend:
+    # Cache su Redis; dimensione ed evizione sono gestite dal server (maxmemory-policy)
+    shared = True
+
+    def __init__(self, url, namespace, key_prefix='jobfolio:'):
+        self.client = redis_client(url)
+        self.prefix = f'{key_prefix}{namespace}:'
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, keys):
+        keys = [self.prefix + key for key in keys]
+        return self.client.delete(*keys) if keys else 0
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=500))
+        for start in range(0, len(keys), 500):
+            self.client.delete(*keys[start:start + 500])
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+def open_sqlite(path):
+    # WAL: le letture dei worker non bloccano le scritture
+    connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+# Connessione SQLite del thread corrente. Una connessione aperta prima di un fork (server
+# pre-fork con --preload) non va usata nel processo figlio: ogni processo apre la propria.
+def local_connection(local, path):
+    connection = getattr(local, 'connection', None)
+    if connection is None or local.pid != os.getpid():
+        connection = open_sqlite(path)
+        local.connection = connection
+        local.pid = os.getpid()
+    return connection
+
+def redis_client(url):
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError('CACHE_BACKEND=redis richiede il pacchetto redis (pip install redis)')
+    return redis.Redis.from_url(url)
+
+# Crea il backend configurato per una cache (namespace) dell'applicazione
+def create_backend(config, namespace, max_size=1000):
+    name = config.get('CACHE_BACKEND', 'memory')
+    if name == 'memory':
+        return MemoryBackend(max_size)
+    if name == 'sqlite':
+        return SQLiteBackend(config.get('CACHE_SQLITE_PATH') or default_sqlite_path(), namespace, max_size)
+    if name == 'redis':
+        return RedisBackend(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), namespace, config.get('CACHE_KEY_PREFIX', 'jobfolio:'))
+    raise RuntimeError(f'CACHE_BACKEND non valido: {name}. I backend validi sono: {", ".join(BACKENDS)}')
+
+class Broadcaster:
+    # Trasmette le invalidazioni agli altri worker. Chi pubblica ha già aggiornato il proprio
+    # stato, quindi i messaggi vengono consegnati solo agli altri processi.
+    # Con il backend memory non c'è nessun altro processo da avvisare.
+    #
+    # origin e thread di ascolto sono del processo. Con un server pre-fork (--preload) init_app
+    # viene eseguito nel processo padre: il thread non sopravvive al fork e un thread attivo
+    # durante il fork può lasciare bloccati i lock di SQLite nel figlio. Il thread parte quindi
+    # con la prima richiesta di ogni processo, e dopo un fork l'origin viene rigenerato perché
+    # ogni worker riceva i messaggi degli altri.
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.transport = None
+        self.poll_interval = 0.5
+        self._subscribers = {}  # canale -> callback
+        self._lock = threading.Lock()
+        self._thread = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        name = app.config.get('CACHE_BACKEND', 'memory')
+        self.poll_interval = app.config.get('CACHE_BROADCAST_POLL_INTERVAL', 0.5)
+        if name == 'sqlite':
+            self.transport = SQLiteTransport(app.config.get('CACHE_SQLITE_PATH') or default_sqlite_path())
+        elif name == 'redis':
+            self.transport = RedisTransport(
+                app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), app.config.get('CACHE_KEY_PREFIX', 'jobfolio:')
+            )
+        else:
+            self.transport = None
+        app.before_request(self.start)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers[channel] = callback
+
+    def publish(self, channel, payload):
+        if self.transport is None:
+            return
+        try:
+            self.transport.publish(json.dumps({'origin': self.origin, 'channel': channel, 'payload': payload}))
+        except Exception:
+            # Gli altri worker recupereranno con la scadenza delle voci
+            logger.exception('Trasmissione dell\'invalidazione fallita')
+
+    # Avvia il thread di ascolto nel processo corrente (una volta per processo)
+    def start(self):
+        if self._thread is not None or self.transport is None or not self._subscribers:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='cache-broadcast', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for message in self.transport.listen(self.poll_interval):
+            try:
+                message = json.loads(message)
+                callback = self._subscribers.get(message['channel'])
+                if callback is not None and message['origin'] != self.origin:
+                    callback(message['payload'])
+            except Exception:
+                logger.exception('Gestione dell\'invalidazione ricevuta fallita')
+
+class SQLiteTransport:
+    # Registro delle invalidazioni nel file SQLite, letto periodicamente da ogni worker
+    RETENTION = 300
+
+    def __init__(self, path):
+        self.path = path
+        connection = open_sqlite(path)
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'message TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+        connection.close()
+        self._local = threading.local()
+
+    def _connection(self):
+        return local_connection(self._local, self.path)
+
+    def publish(self, message):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute('INSERT INTO cache_messages (message, created_at) VALUES (?, ?)', (message, now))
+            connection.execute('DELETE FROM cache_messages WHERE created_at < ?', (now - self.RETENTION,))
+
+    def listen(self, poll_interval):
+        connection = open_sqlite(self.path)
+        last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM cache_messages').fetchone()[0]
+        while True:
+            time.sleep(poll_interval)
+            try:
+                rows = connection.execute('SELECT id, message FROM cache_messages WHERE id > ? ORDER BY id', (last_id,)).fetchall()
+            except sqlite3.Error:
+                logger.exception('Lettura delle invalidazioni fallita')
+                continue
+            for id, message in rows:
+                last_id = id
+                yield message
+
+class RedisTransport:
+    # Pub/sub di Redis: consegna immediata a tutti i worker iscritti
+
+    def __init__(self, url, key_prefix='jobfolio:'):
+        self.client = redis_client(url)
+        self.channel = f'{key_prefix}invalidations'
+
+    def publish(self, message):
+        self.client.publish(self.channel, message)
+
+    def listen(self, poll_interval):
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    if item['type'] == 'message':
+                        yield item['data']
+            except Exception:
+                logger.exception('Connessione pub/sub persa, nuovo tentativo')
+                time.sleep(poll_interval)
+            finally:
+                pubsub.close()
+
+broadcaster = Broadcaster()
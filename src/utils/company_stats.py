@@ -0,0 +1,80 @@
+from flask import current_app
+from src.models.company.company import CompanyStats
+from src.models.company.job_posting import Application, JobPosting, db
+from src.utils.upsert import upsert
+from datetime import datetime
+
+def rollup_enabled():
+    return current_app.config.get('COMPANY_STATS_ROLLUP', False)
+
+# Calcola le statistiche di un'azienda con query aggregate (nessun oggetto ORM caricato)
+def compute_company_stats(company_id, now=None):
+    now = now or datetime.utcnow()
+    is_active = db.and_(
+        JobPosting.is_published == True,
+        db.or_(JobPosting.expiry_date == None, JobPosting.expiry_date > now)
+    )
+    postings = db.session.query(
+        db.func.count(JobPosting.id),
+        db.func.coalesce(db.func.sum(db.case((is_active, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(JobPosting.views_count), 0),
+        db.func.min(db.case((is_active, JobPosting.expiry_date), else_=None))
+    ).filter(JobPosting.company_id == company_id).one()
+    applications_count = db.session.query(db.func.count(Application.id)).join(
+        JobPosting, Application.job_posting_id == JobPosting.id
+    ).filter(JobPosting.company_id == company_id).scalar()
+    return {
+        'company_id': company_id,
+        'job_postings_count': postings[0],
+        'active_job_postings_count': int(postings[1]),
+        'total_applications_count': applications_count,
+        'total_views_count': int(postings[2]),
+        'next_expiry_at': postings[3]
+    }
+
+# Ricalcola e salva la riga aggregata di un'azienda (nella transazione corrente)
+def refresh_company_stats(company_id):
+    if not rollup_enabled():
+        return None
+    values = compute_company_stats(company_id)
+    upsert(CompanyStats, [values], replace=[column for column in values if column != 'company_id'])
+    return values
+
+# Restituisce le statistiche di un'azienda: dalla tabella aggregata se abilitata, altrimenti calcolate
+def get_company_stats(company_id):
+    if not rollup_enabled():
+        values = compute_company_stats(company_id)
+        return CompanyStats(**values).to_dict()
+
+    stats = db.session.get(CompanyStats, company_id)
+    # Riga assente o un annuncio attivo è scaduto nel frattempo: ricalcola
+    if stats is None or (stats.next_expiry_at and stats.next_expiry_at <= datetime.utcnow()):
+        refresh_company_stats(company_id)
+        db.session.commit()
+        stats = db.session.get(CompanyStats, company_id, populate_existing=True)
+    return stats.to_dict()
+
+# Incrementi lato SQL per gli eventi frequenti; se la riga non esiste ancora verrà calcolata alla prima lettura
+def record_application(company_id):
+    if not rollup_enabled():
+        return
+    db.session.execute(
+        db.update(CompanyStats)
+        .where(CompanyStats.company_id == company_id)
+        .values(total_applications_count=CompanyStats.total_applications_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def record_views(views_by_job_posting):
+    if not rollup_enabled() or not views_by_job_posting:
+        return
+    views_by_company = {}
+    rows = db.session.query(JobPosting.id, JobPosting.company_id).filter(JobPosting.id.in_(views_by_job_posting))
+    for job_posting_id, company_id in rows:
+        views_by_company[company_id] = views_by_company.get(company_id, 0) + views_by_job_posting[job_posting_id]
+    db.session.execute(
+        db.update(CompanyStats)
+        .where(CompanyStats.company_id.in_(views_by_company))
+        .values(total_views_count=CompanyStats.total_views_count + db.case(views_by_company, value=CompanyStats.company_id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
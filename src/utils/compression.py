@@ -0,0 +1,49 @@
+from sqlalchemy.types import LargeBinary, TypeDecorator
+import zlib
+
+# Prefisso dei valori compressi: il byte 0xff non compare mai in un testo UTF-8, quindi i
+# valori salvati senza compressione (e quelli scritti prima della migrazione) si leggono così
+# come sono
+COMPRESSED_PREFIX = b'\xff'
+
+# Testi più corti restano in chiaro: la compressione non farebbe risparmiare spazio
+COMPRESSION_THRESHOLD = 1024
+
+def compress_text(value, threshold=COMPRESSION_THRESHOLD, level=6):
+    data = value.encode('utf-8')
+    if len(data) < threshold:
+        return data
+    compressed = zlib.compress(data, level)
+    # Solo se conviene (testi già poco ridondanti restano in chiaro)
+    if len(compressed) + 1 >= len(data):
+        return data
+    return COMPRESSED_PREFIX + compressed
+
+def decompress_text(data):
+    if data[:1] == COMPRESSED_PREFIX:
+        data = zlib.decompress(data[1:])
+    return data.decode('utf-8')
+
+class CompressedText(TypeDecorator):
+    # Testo salvato in una colonna binaria (MEDIUMBLOB su MySQL) e compresso con zlib oltre
+    # threshold byte. La compressione e la decompressione sono trasparenti per il modello:
+    # l'attributo contiene sempre una stringa.
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, threshold=COMPRESSION_THRESHOLD, length=16777215):
+        super().__init__(length=length)
+        self.threshold = threshold
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value, self.threshold)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        # Colonna non ancora convertita (testo): valore in chiaro
+        if isinstance(value, str):
+            return value
+        return decompress_text(bytes(value))
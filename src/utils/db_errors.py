@@ -0,0 +1,14 @@
+# Funzioni di utilità per riconoscere le violazioni di vincolo dagli IntegrityError.
+# Codici MySQL: 1062 chiave duplicata, 1452 chiave esterna inesistente.
+
+def _error_code(error):
+    args = getattr(error.orig, 'args', ())
+    return args[0] if args and isinstance(args[0], int) else None
+
+def is_unique_violation(error):
+    message = str(error.orig)
+    return _error_code(error) == 1062 or 'Duplicate entry' in message or 'UNIQUE constraint failed' in message
+
+def is_foreign_key_violation(error):
+    message = str(error.orig)
+    return _error_code(error) == 1452 or 'FOREIGN KEY constraint failed' in message
@@ -0,0 +1,135 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from src.models.user import db
+from src.models.company.company import Company, CompanyUser
+from src.models.company.job_posting import JobPosting
+from src.utils.cache_backends import MemoryBackend, create_backend
+from src.utils.serializers import serialization_options
+from collections import namedtuple
+import threading
+
+# Modelli letti molto più spesso di quanto vengano modificati
+CACHED_MODELS = (Company, JobPosting, CompanyUser)
+
+# Dizionario serializzato (da non modificare) e updated_at della riga, per ETag e Last-Modified
+CachedEntity = namedtuple('CachedEntity', ['data', 'updated_at'])
+
+class EntityCache:
+    # Cache dei dizionari serializzati per (modello, id), su uno dei backend di cache_backends
+    # (LRU e scadenza in memoria, oppure condivisa tra i worker). Gli slug sono alias verso l'id
+    # e vengono verificati a ogni lettura.
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.backend = MemoryBackend(max_size)
+        self.ttl = ttl
+        self.enabled = True
+        self._generation = 0  # incrementato a ogni invalidazione
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config, 'entity', app.config.get('ENTITY_CACHE_MAX_SIZE', 1000))
+        self.ttl = app.config.get('ENTITY_CACHE_TTL', 300)
+        self.enabled = app.config.get('ENTITY_CACHE_ENABLED', True)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, model, id):
+        entity = self.backend.get(f'{model.__name__}:{id}')
+        self._count(entity is not None)
+        return entity
+
+    def get_by_slug(self, model, slug):
+        id = self.backend.get(f'{model.__name__}:slug:{slug}')
+        entity = self.backend.get(f'{model.__name__}:{id}') if id is not None else None
+        # L'alias può essere rimasto indietro se lo slug è cambiato
+        if entity is not None and entity.data.get('slug') != slug:
+            entity = None
+        self._count(entity is not None)
+        return entity
+
+    def put(self, instance, generation=None):
+        entity = CachedEntity(instance.to_dict(), getattr(instance, 'updated_at', None))
+        if not self.enabled:
+            return entity
+        # Se nel frattempo c'è stata un'invalidazione la riga letta potrebbe essere vecchia: non salvarla
+        if generation is not None and generation != self._generation:
+            return entity
+        name = type(instance).__name__
+        self.backend.set(f'{name}:{instance.id}', entity, self.ttl)
+        if entity.data.get('slug'):
+            self.backend.set(f'{name}:slug:{entity.data["slug"]}', instance.id, self.ttl)
+        return entity
+
+    # Carica un'entità per id: dalla cache o dal database (None se non esiste)
+    def load(self, model, id):
+        entity = self.get(model, id) if self.enabled else None
+        if entity is not None:
+            return entity
+        generation = self._generation
+        instance = db.session.get(model, id, options=serialization_options(model))
+        return self.put(instance, generation) if instance is not None else None
+
+    def load_by_slug(self, model, slug):
+        entity = self.get_by_slug(model, slug) if self.enabled else None
+        if entity is not None:
+            return entity
+        generation = self._generation
+        instance = model.query.options(*serialization_options(model)).filter_by(slug=slug).first()
+        return self.put(instance, generation) if instance is not None else None
+
+    # Con un backend condiviso la cancellazione vale per tutti i worker
+    def invalidate(self, model, ids):
+        with self._lock:
+            self._generation += 1
+        removed = self.backend.delete([f'{model.__name__}:{id}' for id in ids])
+        with self._lock:
+            self.invalidations += removed
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'invalidations': self.invalidations
+            }
+        stats.update(self.backend.stats())
+        return stats
+
+entity_cache = EntityCache()
+
+# Invalidazione dagli eventi ORM: subito al flush e di nuovo dopo il commit, perché una
+# richiesta concorrente potrebbe aver riletto la riga prima che la transazione fosse confermata
+def _invalidate_instance(mapper, connection, target):
+    entity_cache.invalidate(type(target), [target.id])
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('entity_cache_keys', set()).add((type(target), target.id))
+
+for model in CACHED_MODELS:
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, _invalidate_instance)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_instances(session):
+    for model, id in session.info.pop('entity_cache_keys', ()):
+        entity_cache.invalidate(model, [id])
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_instances(session):
+    session.info.pop('entity_cache_keys', None)
@@ -0,0 +1,159 @@
+from src.utils.cache_backends import broadcaster
+from src.utils.events import ConversationArchived, ConversationRead, MessageSent, event_bus
+from collections import deque
+import json
+import threading
+import time
+
+# Eventi in tempo reale per i client (Server-Sent Events). Ogni processo tiene gli eventi
+# recenti in un buffer circolare; quelli pubblicati dagli altri worker arrivano tramite il
+# broadcaster delle cache. Le connessioni in attesa non interrogano il database: dormono su
+# una Condition del proprio canale fino al prossimo evento o all'heartbeat.
+#
+# Ogni evento ha due identificativi:
+# - id: globale (nanosecondi del momento di pubblicazione), inviato al client e usato per
+#   riprendere lo stream con Last-Event-ID anche su un altro worker
+# - seq: progressivo del processo, usato dalle connessioni aperte per non perdere gli eventi
+#   ricevuti dagli altri worker dopo quelli locali più recenti
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+def company_channel(company_id):
+    return f'company:{company_id}'
+
+class EventBroker:
+
+    def __init__(self, buffer_size=1000):
+        self.heartbeat = 15
+        self.retry = 3000
+        self._events = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._conditions = {}  # canale -> (Condition, connessioni in attesa)
+        self._seq = 0
+        self._last_id = 0
+        # Eventi con id precedente non sono più nel buffer (o sono di prima dell'avvio)
+        self._covered_since = time.time_ns()
+
+    def init_app(self, app):
+        self.heartbeat = app.config.get('EVENT_STREAM_HEARTBEAT', 15)
+        self.retry = app.config.get('EVENT_STREAM_RETRY', 3000)
+        with self._lock:
+            self._events = deque(self._events, maxlen=app.config.get('EVENT_STREAM_BUFFER_SIZE', 1000))
+        broadcaster.subscribe('events', self._receive)
+
+    # Pubblica un evento sui canali indicati (dopo il commit dei dati a cui si riferisce).
+    # data viene serializzato una sola volta, non per ogni connessione.
+    def publish(self, channels, event_type, data):
+        with self._lock:
+            self._last_id = max(time.time_ns(), self._last_id + 1)
+            event_id = self._last_id
+        event = {'id': event_id, 'channels': list(channels), 'type': event_type, 'data': json.dumps(data)}
+        self._append(event)
+        broadcaster.publish('events', event)
+
+    def _receive(self, event):
+        self._append(event)
+
+    def _append(self, event):
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._covered_since = max(self._covered_since, self._events[0]['id'] + 1)
+            self._seq += 1
+            self._events.append(dict(event, seq=self._seq))
+            self._last_id = max(self._last_id, event['id'])
+            for channel in event['channels']:
+                waiting = self._conditions.get(channel)
+                if waiting:
+                    waiting[0].notify_all()
+
+    # Posizione da cui partire per una nuova connessione: (seq, eventi da reinviare, completo).
+    # Con Last-Event-ID si reinviano gli eventi successivi ancora nel buffer; completo è False
+    # se alcuni potrebbero essere andati persi e il client deve ricaricare i dati.
+    def resume(self, channel, last_event_id=None):
+        with self._lock:
+            if last_event_id is None:
+                return self._seq, [], True
+            events = [event for event in self._events if event['id'] > last_event_id and channel in event['channels']]
+            return self._seq, events, last_event_id >= self._covered_since
+
+    # Attende eventi del canale con seq successivo a after_seq, al massimo timeout secondi
+    def wait(self, channel, after_seq, timeout):
+        with self._lock:
+            events = self._after(channel, after_seq)
+            if events:
+                return events
+            waiting = self._conditions.get(channel)
+            if waiting is None:
+                waiting = self._conditions[channel] = [threading.Condition(self._lock), 0]
+            waiting[1] += 1
+            try:
+                waiting[0].wait(timeout)
+            finally:
+                waiting[1] -= 1
+                if not waiting[1]:
+                    del self._conditions[channel]
+            return self._after(channel, after_seq)
+
+    def _after(self, channel, after_seq):
+        if not self._events or self._events[-1]['seq'] <= after_seq:
+            return []
+        return [event for event in self._events if event['seq'] > after_seq and channel in event['channels']]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'buffered_events': len(self._events),
+                'buffer_size': self._events.maxlen,
+                'waiting_connections': sum(waiting[1] for waiting in self._conditions.values())
+            }
+
+    # Generatore del corpo della risposta text/event-stream
+    def stream(self, channel, last_event_id=None):
+        seq, replay, complete = self.resume(channel, last_event_id)
+        yield f'retry: {self.retry}\n\n'
+        if not complete:
+            # Il client deve ricaricare lo stato (conversazioni e messaggi) con le API REST
+            yield f'id: {self._last_id}\nevent: reset\ndata: {{}}\n\n'
+        for event in replay:
+            yield format_event(event)
+        while True:
+            events = self.wait(channel, seq, self.heartbeat)
+            if not events:
+                # Commento SSE: mantiene aperta la connessione e rileva i client disconnessi
+                yield ': heartbeat\n\n'
+                continue
+            for event in events:
+                seq = event['seq']
+                yield format_event(event)
+
+def format_event(event):
+    return f'id: {event["id"]}\nevent: {event["type"]}\ndata: {event["data"]}\n\n'
+
+event_broker = EventBroker()
+
+# Eventi di dominio inoltrati ai client connessi. I subscriber sono sincroni e locali:
+# publish non blocca e trasmette già da sé l'evento agli altri worker.
+def conversation_channels(event):
+    return [user_channel(event.user_id), company_channel(event.company_id)]
+
+@event_bus.subscribe(MessageSent)
+def _message_sent(event):
+    event_broker.publish(conversation_channels(event), 'message', event.message)
+
+@event_bus.subscribe(ConversationRead)
+def _conversation_read(event):
+    event_broker.publish(conversation_channels(event), 'read', {
+        'conversation_id': event.conversation_id,
+        'reader_type': event.reader_type,
+        'last_read_message_id': event.last_read_message_id
+    })
+
+# L'archiviazione riguarda solo la casella di chi archivia
+@event_bus.subscribe(ConversationArchived)
+def _conversation_archived(event):
+    channel = user_channel(event.user_id) if event.archiver_type == 'user' else company_channel(event.company_id)
+    event_broker.publish([channel], 'archive' if event.is_archived else 'unarchive', {
+        'conversation_id': event.conversation_id,
+        'archiver_type': event.archiver_type
+    })
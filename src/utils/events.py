@@ -0,0 +1,197 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.utils.cache_backends import broadcaster
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Eventi di dominio: le route li emettono durante la transazione e i subscriber li ricevono
+# solo dopo il commit (scartati con il rollback). Gli effetti collaterali che non fanno parte
+# della transazione (indice di ricerca, eventi in tempo reale, cache, contatori) si agganciano
+# alle scritture senza modificare le route.
+#
+# Ogni evento è una namedtuple di valori serializzabili in JSON, così può essere inoltrato
+# agli altri worker tramite il broadcaster delle cache.
+ApplicationCreated = namedtuple('ApplicationCreated', ['application_id', 'job_posting_id', 'company_id', 'user_id'])
+ApplicationStatusChanged = namedtuple('ApplicationStatusChanged', ['application_id', 'previous_status', 'status'])
+MessageSent = namedtuple('MessageSent', ['conversation_id', 'user_id', 'company_id', 'message'])
+ConversationRead = namedtuple('ConversationRead', ['conversation_id', 'user_id', 'company_id', 'reader_type', 'last_read_message_id'])
+ConversationArchived = namedtuple('ConversationArchived', ['conversation_id', 'user_id', 'company_id', 'archiver_type', 'is_archived'])
+JobPostingsChanged = namedtuple('JobPostingsChanged', ['job_posting_ids'])
+JobPostingPublished = namedtuple('JobPostingPublished', ['job_posting_id', 'company_id', 'is_published'])
+JobPostingDeleted = namedtuple('JobPostingDeleted', ['job_posting_id'])
+CompanyUpdated = namedtuple('CompanyUpdated', ['company_id'])
+
+EVENT_TYPES = {event_type.__name__: event_type for event_type in (
+    ApplicationCreated, ApplicationStatusChanged, MessageSent, ConversationRead, ConversationArchived,
+    JobPostingsChanged, JobPostingPublished, JobPostingDeleted, CompanyUpdated
+)}
+
+class Subscriber:
+    # Callback iscritta a uno o più tipi di evento, con le metriche di latenza della consegna
+    # - background: eseguita nel pool di thread invece che subito dopo il commit
+    # - remote: riceve anche gli eventi emessi dagli altri worker
+
+    def __init__(self, name, callback, background=False, remote=False):
+        self.name = name
+        self.callback = callback
+        self.background = background
+        self.remote = remote
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.total_wait = 0.0
+
+    def stats(self):
+        return {
+            'background': self.background,
+            'remote': self.remote,
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': round(self.total_time / self.calls * 1000, 3) if self.calls else 0,
+            'max_ms': round(self.max_time * 1000, 3),
+            # Attesa media nella coda del pool (solo per i subscriber in background)
+            'avg_wait_ms': round(self.total_wait / self.calls * 1000, 3) if self.calls else 0
+        }
+
+class EventBus:
+
+    def __init__(self, max_workers=4, max_pending=1000):
+        self.app = None
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.emitted = 0
+        self.received = 0
+        self.inline_fallbacks = 0
+        self._subscribers = {}  # nome del tipo di evento -> lista di Subscriber
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('EVENT_BUS_WORKERS', 4)
+        self.max_pending = app.config.get('EVENT_BUS_MAX_PENDING', 1000)
+        broadcaster.subscribe('domain_events', self._receive)
+
+    # Iscrive callback(event) ai tipi di evento indicati; utilizzabile anche come decoratore
+    def subscribe(self, event_types, callback=None, background=False, remote=False):
+        if not isinstance(event_types, (list, tuple)):
+            event_types = [event_types]
+
+        def register(callback):
+            subscriber = Subscriber(f'{callback.__module__}.{callback.__qualname__}', callback, background, remote)
+            with self._lock:
+                for event_type in event_types:
+                    self._subscribers.setdefault(event_type.__name__, []).append(subscriber)
+            return callback
+
+        return register(callback) if callback is not None else register
+
+    # Emette un evento: durante una transazione viene consegnato dopo il commit, altrimenti
+    # subito. Le route lo emettono prima di db.session.commit().
+    def emit(self, event, session=None):
+        session = session if session is not None else db.session()
+        self.emitted += 1
+        if session.in_transaction():
+            session.info.setdefault('pending_events', []).append(event)
+        else:
+            self.dispatch([event])
+
+    def dispatch(self, events, remote=False):
+        forwarded = []
+        for event in events:
+            subscribers = self._subscribers.get(type(event).__name__, ())
+            for subscriber in subscribers:
+                if remote and not subscriber.remote:
+                    continue
+                if subscriber.background:
+                    self._submit(subscriber, event)
+                else:
+                    self._call(subscriber, event)
+            if not remote and any(subscriber.remote for subscriber in subscribers):
+                forwarded.append({'type': type(event).__name__, 'data': event._asdict()})
+        # Un solo messaggio per commit verso gli altri worker (no-op con il backend memory)
+        if forwarded:
+            broadcaster.publish('domain_events', forwarded)
+
+    def _receive(self, events):
+        self.received += len(events)
+        self.dispatch([EVENT_TYPES[event['type']](**event['data']) for event in events if event['type'] in EVENT_TYPES], remote=True)
+
+    def _call(self, subscriber, event, queued_at=None):
+        started = time.perf_counter()
+        try:
+            subscriber.callback(event)
+        except Exception:
+            subscriber.errors += 1
+            # Il commit è già avvenuto: l'errore di un subscriber non arriva alla richiesta
+            logger.exception('Subscriber %s fallito per %s', subscriber.name, type(event).__name__)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            subscriber.calls += 1
+            subscriber.total_time += elapsed
+            subscriber.max_time = max(subscriber.max_time, elapsed)
+            if queued_at is not None:
+                subscriber.total_wait += started - queued_at
+
+    # Pool limitato: oltre max_pending eventi in coda il subscriber viene eseguito nel thread
+    # che emette (rallenta chi produce invece di perdere eventi o accumulare memoria)
+    def _submit(self, subscriber, event):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='event-bus')
+                self._pending = threading.BoundedSemaphore(self.max_pending)
+        if not self._pending.acquire(blocking=False):
+            self.inline_fallbacks += 1
+            self._call(subscriber, event)
+            return
+        self._executor.submit(self._run_background, subscriber, event, time.perf_counter())
+
+    def _run_background(self, subscriber, event, queued_at):
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    self._call(subscriber, event, queued_at)
+            else:
+                self._call(subscriber, event, queued_at)
+        finally:
+            self._pending.release()
+
+    def stats(self):
+        with self._lock:
+            subscribers = {}
+            for event_type, event_subscribers in self._subscribers.items():
+                for subscriber in event_subscribers:
+                    subscribers.setdefault(subscriber.name, dict(subscriber.stats(), events=[]))['events'].append(event_type)
+            return {
+                'emitted': self.emitted,
+                'received': self.received,
+                'inline_fallbacks': self.inline_fallbacks,
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'subscribers': subscribers
+            }
+
+event_bus = EventBus()
+
+# Consegna dopo il commit della transazione principale. I subscriber sincroni non possono
+# eseguire query su questa sessione (la transazione è chiusa): quelli che leggono il
+# database vanno iscritti con background=True.
+@event.listens_for(Session, 'after_commit')
+def _dispatch_committed_events(session):
+    events = session.info.pop('pending_events', None)
+    if events:
+        event_bus.dispatch(events)
+
+# Rollback o chiusura della sessione senza commit: gli eventi vengono scartati
+@event.listens_for(Session, 'after_transaction_end')
+def _discard_uncommitted_events(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('pending_events', None)
@@ -0,0 +1,96 @@
+from flask import Response, abort, current_app, jsonify, make_response, request, stream_with_context
+from src.models.user import db
+from src.utils.serializers import get_serializer, resolve_fields
+from datetime import datetime, timedelta, timezone
+import csv
+import io
+
+# Formati di esportazione e relativi content type
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+# Righe lette dal cursore lato server (yield_per) e inviate al client per ogni blocco
+EXPORT_CHUNK_ROWS = 500
+
+# Finestra di sicurezza (secondi) sottratta al watermark. updated_at viene assegnato prima del
+# commit, quindi una transazione può diventare visibile dopo un'esportazione iniziata più tardi
+# del suo updated_at. Basta che ogni transazione duri meno della finestra: le righe della
+# finestra vengono esportate di nuovo e il client le deduplica per id.
+EXPORT_SAFETY_WINDOW = 60
+
+def export_format():
+    name = request.args.get('format', 'ndjson')
+    if name not in EXPORT_FORMATS:
+        abort(make_response(jsonify({'error': f'Formato non valido. I formati validi sono: {", ".join(EXPORT_FORMATS)}'}), 400))
+    return name
+
+# Legge ?updated_since= (data ISO 8601). Con fuso orario viene convertita in UTC, come le
+# date salvate nel database.
+def updated_since():
+    value = request.args.get('updated_since')
+    if not value:
+        return None
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        abort(make_response(jsonify({'error': 'updated_since non valido: usare una data ISO 8601'}), 400))
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+def _ndjson_chunks(rows):
+    dumps = current_app.json.dumps
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def _csv_chunks(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    # L'intestazione parte subito, prima della prima riga letta
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    written = 0
+    for row in rows:
+        writer.writerow(row)
+        written += 1
+        if written % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# Risposta in streaming con le righe di query serializzate una alla volta: il cursore lato
+# server (yield_per) evita di caricare tutto il risultato in memoria e il client riceve i
+# primi dati senza aspettare la fine della query. L'header X-Export-Watermark contiene l'ora
+# del database (UTC, lo stesso orologio di updated_at) all'inizio dell'esportazione meno la
+# finestra di sicurezza, da usare come updated_since della successiva: le righe possono
+# ripetersi tra due esportazioni e il client le sostituisce per id.
+def stream_export(query, model, fields, filename):
+    format = export_format()
+    fields = resolve_fields(model, fields)
+    serializer = get_serializer(model, fields)
+    watermark = db.session.query(db.func.now()).scalar()
+    watermark -= timedelta(seconds=current_app.config.get('EXPORT_SAFETY_WINDOW', EXPORT_SAFETY_WINDOW))
+
+    def rows():
+        for obj in query.yield_per(EXPORT_CHUNK_ROWS):
+            yield serializer(obj)
+
+    chunks = _ndjson_chunks(rows()) if format == 'ndjson' else _csv_chunks(rows(), fields)
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{format}"'
+    response.headers['X-Export-Watermark'] = watermark.isoformat()
+    # Le esportazioni non passano dai proxy di cache
+    response.headers['Cache-Control'] = 'no-store'
+    return response
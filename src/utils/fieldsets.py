@@ -0,0 +1,36 @@
+from flask import abort, jsonify, make_response, request
+from sqlalchemy.orm import load_only
+from src.utils.serializers import field_columns, serialization_options
+
+# Legge ?fields= dalla richiesta: un elenco di campi separati da virgola oppure il nome di un
+# preset del modello (ad esempio "summary"). Restituisce None se il parametro manca: in quel
+# caso la risposta resta completa, come prima. L'id è sempre incluso.
+def requested_fields(model):
+    value = request.args.get('fields')
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    presets = getattr(model, 'serialize_presets', {})
+    if len(names) == 1 and names[0] in presets:
+        return presets[names[0]]
+    unknown = [name for name in names if name not in model.serialize_fields]
+    if unknown or not names:
+        abort(make_response(jsonify({
+            'error': f'Campi non validi: {", ".join(unknown) or value}. '
+                     f'I campi validi sono: {", ".join(model.serialize_fields)}; i preset: {", ".join(presets)}'
+        }), 400))
+    selected = set(names) | {'id'}
+    return tuple(field for field in model.serialize_fields if field in selected)
+
+# Limita la SELECT alle colonne dei campi richiesti, più quelle che servono alla route
+# (extra: ad esempio le chiavi usate dai loader o la colonna di ordinamento) e updated_at
+# se esiste, usato dagli ETag delle pagine. Senza ?fields= la risposta è completa: i gruppi
+# di colonne differite vengono caricati nella stessa SELECT invece che riga per riga
+def load_fields(query, model, fields, extra=()):
+    if fields is None:
+        return query.options(*serialization_options(model))
+    columns = field_columns(model)
+    names = set(fields) | set(extra) | {'id'}
+    if 'updated_at' in columns:
+        names.add('updated_at')
+    return query.options(load_only(*[getattr(model, columns[name][0]) for name in names]))
@@ -0,0 +1,43 @@
+from flask import current_app, request
+from datetime import timezone
+import hashlib
+
+# Funzioni di utilità per le GET condizionali (ETag / If-None-Match / If-Modified-Since)
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def _as_utc(value):
+    # Le date del database sono naive in UTC; gli header HTTP hanno la risoluzione del secondo
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+def with_etag(response, etag, last_modified=None, weak=False):
+    response.set_etag(etag, weak=weak)
+    if last_modified:
+        response.last_modified = _as_utc(last_modified)
+    return response
+
+# Restituisce una risposta 304 se il client ha già la versione indicata, altrimenti None
+def not_modified(etag, last_modified=None, weak=False):
+    if request.if_none_match:
+        matches = request.if_none_match.contains_weak(etag) if weak else request.if_none_match.contains(etag)
+    elif last_modified and request.if_modified_since:
+        matches = _as_utc(last_modified) <= request.if_modified_since
+    else:
+        matches = False
+    if not matches:
+        return None
+    response = current_app.response_class(status=304)
+    return with_etag(response, etag, last_modified, weak)
+
+# ETag debole di una pagina di risultati: versione degli elementi (di default l'id), updated_at massimo
+# e metadati di paginazione
+def page_etag(items, meta=None, version=None):
+    last_modified = max((item.updated_at for item in items if item.updated_at), default=None)
+    versions = [version(item) if version else item.id for item in items]
+    return make_etag(versions, last_modified, sorted((meta or {}).items())), last_modified
+
+# Versione di una riga annidata nella risposta (ad esempio l'utente di una candidatura), da
+# includere nella version= di page_etag: una modifica della riga cambia l'ETag della pagina
+def related_version(item):
+    return (item.id, item.updated_at) if item is not None else None
@@ -0,0 +1,68 @@
+from src.models.company.job_posting import JobPosting, JobPostingDailyStats
+from src.utils.upsert import upsert
+from datetime import datetime, timedelta
+
+# Numero massimo di righe per ogni INSERT ... ON DUPLICATE KEY UPDATE
+UPSERT_CHUNK_SIZE = 500
+
+# Somma le visualizzazioni giornaliere: views_by_day è {(job_posting_id, giorno): visualizzazioni}.
+# Gli annunci eliminati dopo la visualizzazione vengono scartati: una sola chiave esterna
+# violata farebbe fallire (e rimettere in coda) l'intero blocco a ogni scaricamento.
+def record_daily_views(views_by_day):
+    job_posting_ids = sorted({job_posting_id for job_posting_id, day in views_by_day})
+    existing_ids = set()
+    for start in range(0, len(job_posting_ids), UPSERT_CHUNK_SIZE):
+        # Lock condiviso: l'annuncio non può essere eliminato prima del commit
+        existing_ids.update(job_posting_id for (job_posting_id,) in JobPosting.query.with_entities(JobPosting.id).filter(
+            JobPosting.id.in_(job_posting_ids[start:start + UPSERT_CHUNK_SIZE])
+        ).with_for_update(read=True))
+    rows = [
+        {'job_posting_id': job_posting_id, 'day': day, 'views_count': count, 'applications_count': 0}
+        for (job_posting_id, day), count in sorted(views_by_day.items())
+        if job_posting_id in existing_ids
+    ]
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        upsert(JobPostingDailyStats, rows[start:start + UPSERT_CHUNK_SIZE], increment=['views_count'])
+
+# Registra una candidatura nella riga del giorno corrente (nella transazione della candidatura)
+def record_daily_application(job_posting_id):
+    upsert(JobPostingDailyStats, [{
+        'job_posting_id': job_posting_id,
+        'day': datetime.utcnow().date(),
+        'views_count': 0,
+        'applications_count': 1
+    }], increment=['applications_count'])
+
+# Legge la serie storica di un annuncio tra due date (incluse), raggruppata per giorno o settimana
+def get_timeseries(job_posting_id, start, end, bucket='day'):
+    rows = JobPostingDailyStats.query.filter(
+        JobPostingDailyStats.job_posting_id == job_posting_id,
+        JobPostingDailyStats.day >= start,
+        JobPostingDailyStats.day <= end
+    ).order_by(JobPostingDailyStats.day).all()
+    by_day = {row.day: row for row in rows}
+
+    series = []
+    day = start
+    while day <= end:
+        # Le settimane iniziano di lunedì; la prima e l'ultima possono essere parziali
+        key = day - timedelta(days=day.weekday()) if bucket == 'week' else day
+        if not series or series[-1]['date'] != key.isoformat():
+            series.append({'date': key.isoformat(), 'views': 0, 'applications': 0})
+        row = by_day.get(day)
+        if row:
+            series[-1]['views'] += row.views_count
+            series[-1]['applications'] += row.applications_count
+        day += timedelta(days=1)
+
+    return {
+        'job_posting_id': job_posting_id,
+        'bucket': bucket,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'series': series,
+        'totals': {
+            'views': sum(point['views'] for point in series),
+            'applications': sum(point['applications'] for point in series)
+        }
+    }
@@ -0,0 +1,49 @@
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime, time
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:
+    # Dipendenza opzionale: senza orjson si usa il modulo json della libreria standard
+    orjson = None
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Provider JSON di Flask: usa orjson se installato, altrimenti json. In entrambi i casi
+    # date e orari diventano stringhe ISO 8601 e i Decimal numeri (non date HTTP e stringhe).
+    ensure_ascii = False
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, (datetime, date, time)):
+            return obj.isoformat()
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return DefaultJSONProvider.default(obj)
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Byte pronti per la risposta, senza passare da una stringa intermedia
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
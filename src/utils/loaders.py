@@ -0,0 +1,64 @@
+from flask import g
+
+# Dimensione massima di ogni clausola IN (...) inviata al database
+BATCH_SIZE = 500
+
+class BatchLoader:
+    # Carica in batch le righe di un modello per chiave primaria e le tiene
+    # in cache per tutta la durata della richiesta (stile DataLoader)
+
+    def __init__(self, model):
+        self.model = model
+        self._cache = {}
+        self._pending = set()
+        self._options = []
+
+    def prime(self, ids):
+        # Accoda gli id non ancora caricati; la query parte al primo load()
+        for id in ids:
+            if id is not None and id not in self._cache:
+                self._pending.add(id)
+        return self
+
+    def with_options(self, *options):
+        # Nuovo loader con le opzioni aggiunte alle query (ad esempio undefer_group per le colonne
+        # differite). Il loader condiviso della richiesta non viene modificato: le opzioni non
+        # devono valere per gli altri get_loader() dello stesso modello.
+        loader = BatchLoader(self.model)
+        loader._options = self._options + list(options)
+        return loader
+
+    def dispatch(self):
+        if not self._pending:
+            return
+        pending = list(self._pending)
+        self._pending.clear()
+        primary_key = self.model.__mapper__.primary_key[0]
+        for start in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[start:start + BATCH_SIZE]
+            for obj in self.model.query.options(*self._options).filter(primary_key.in_(chunk)).all():
+                self._cache[getattr(obj, primary_key.key)] = obj
+            # Memorizza anche gli id mancanti per non interrogarli di nuovo
+            for id in chunk:
+                self._cache.setdefault(id, None)
+
+    def load(self, id):
+        if id is None:
+            return None
+        if id not in self._cache:
+            self._pending.add(id)
+            self.dispatch()
+        return self._cache.get(id)
+
+    def load_many(self, ids):
+        ids = list(ids)
+        self.prime(ids)
+        self.dispatch()
+        return [self._cache.get(id) for id in ids]
+
+def get_loader(model):
+    # Un loader per modello, condiviso all'interno della stessa richiesta
+    loaders = g.setdefault('_batch_loaders', {})
+    if model not in loaders:
+        loaders[model] = BatchLoader(model)
+    return loaders[model]
@@ -0,0 +1,259 @@
+from flask import abort, current_app, jsonify, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.utils.cache_backends import create_backend
+from datetime import datetime
+import base64
+import hashlib
+import json
+import math
+import secrets
+import threading
+
+# Limite massimo di elementi per pagina in modalità cursore
+MAX_LIMIT = 100
+
+# Modalità di calcolo del totale accettate da ?count=
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+# Cache dei conteggi per filtro, su uno dei backend di cache_backends. Ogni tabella ha un token
+# di versione che fa parte della chiave: invalidare significa cambiare il token, e con un
+# backend condiviso il nuovo token vale subito per tutti i worker. I token stanno in un
+# namespace separato senza limite di dimensione (uno per tabella): l'evizione di un token
+# renderebbe irraggiungibili tutti i conteggi della tabella.
+_backends = {}
+_backends_lock = threading.Lock()
+
+class Page:
+    # Risultato di una query paginata: elementi e metadati da unire alla risposta
+    def __init__(self, items, meta):
+        self.items = items
+        self.meta = meta
+
+# Funzioni di utilità per codificare/decodificare un cursore opaco
+def encode_cursor(value, id, direction):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'v': value, 'id': id, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort_column):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        value = payload['v']
+        if isinstance(sort_column.type, db.DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        if payload['d'] not in ('next', 'prev'):
+            raise ValueError(payload['d'])
+        return value, int(payload['id']), payload['d']
+    except (ValueError, KeyError, TypeError):
+        abort(make_response(jsonify({'error': 'Cursore non valido'}), 400))
+
+def _backend(namespace, max_size):
+    backend = _backends.get(namespace)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(namespace)
+            if backend is None:
+                backend = _backends[namespace] = create_backend(current_app.config, namespace, max_size)
+    return backend
+
+def count_backend():
+    return _backend('count', current_app.config.get('COUNT_CACHE_MAX_SIZE', 1000))
+
+def token_backend():
+    return _backend('count_tokens', None)
+
+def _table_token(table_name, renew=False):
+    backend = token_backend()
+    key = f'token:{table_name}'
+    token = None if renew else backend.get(key)
+    if token is None:
+        # Token mancante (mai creato, o perso con il riavvio di Redis): uno nuovo rende irraggiungibili le voci vecchie
+        token = secrets.token_hex(8)
+        backend.set(key, token)
+    return token
+
+# Invalida i conteggi in cache che riguardano le tabelle indicate
+def invalidate_counts(table_names):
+    for table_name in table_names:
+        _table_token(table_name, renew=True)
+
+# Raccoglie le tabelle modificate in ogni flush o istruzione DML e le invalida dopo il commit
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    tables = session.info.setdefault('count_cache_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tables.add(obj.__table__.name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_dml_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info.setdefault('count_cache_tables', set()).add(orm_execute_state.statement.table.name)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tables(session):
+    tables = session.info.pop('count_cache_tables', None)
+    if tables:
+        invalidate_counts(tables)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('count_cache_tables', None)
+
+# Stima il totale di una query: statistiche della tabella se non ci sono filtri (MySQL),
+# altrimenti un conteggio esatto tenuto in cache per COUNT_CACHE_TTL secondi
+def estimate_count(query):
+    table = query.column_descriptions[0]['entity'].__table__
+    if query.whereclause is None and db.engine.dialect.name == 'mysql':
+        rows = db.session.execute(db.text(
+            'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name'
+        ), {'table_name': table.name}).scalar()
+        if rows is not None:
+            return rows
+
+    compiled = query.statement.compile(db.engine)
+    digest = hashlib.sha1(repr((str(compiled), sorted((name, repr(value)) for name, value in compiled.params.items()))).encode()).hexdigest()
+    backend = count_backend()
+    key = f'{table.name}:{_table_token(table.name)}:{digest}'
+    total = backend.get(key)
+    if total is not None:
+        return total
+
+    total = query.order_by(None).count()
+    backend.set(key, total, current_app.config.get('COUNT_CACHE_TTL', 60))
+    return total
+
+# Condizione keyset per una colonna che può essere NULL (ad esempio last_message_at delle
+# conversazioni senza messaggi): un confronto con NULL non è mai vero, quindi quelle righe
+# sparirebbero dalle pagine. NULL viene trattato come il valore più piccolo, come nell'ORDER BY
+# di MySQL e SQLite: prima di tutti in ordine crescente, dopo tutti in ordine decrescente.
+def _nullable_keyset_condition(sort_column, id_column, value, last_id, after):
+    if value is None:
+        if after:
+            return db.and_(sort_column.is_(None), id_column < last_id)
+        return db.or_(sort_column.isnot(None), db.and_(sort_column.is_(None), id_column > last_id))
+    if after:
+        return db.or_(sort_column < value, sort_column.is_(None), db.and_(sort_column == value, id_column < last_id))
+    return db.or_(sort_column > value, db.and_(sort_column == value, id_column > last_id))
+
+# Pagina una query per offset (page/per_page) oppure per cursore (cursor/limit).
+# L'ordinamento è sempre sort_column + id, così il cursore identifica una posizione stabile.
+def paginate_query(query, sort_column, descending=False, per_page=10):
+    id_column = sort_column.class_.id
+    sort_columns = [sort_column] if sort_column is id_column else [sort_column, id_column]
+
+    if 'cursor' not in request.args:
+        # Modalità offset, mantenuta per compatibilità
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', per_page, type=int)
+        count_mode = request.args.get('count', 'exact')
+        if count_mode not in COUNT_MODES:
+            abort(make_response(jsonify({'error': f'Modalità di conteggio non valida. Le modalità valide sono: {", ".join(COUNT_MODES)}'}), 400))
+        ordered = query.order_by(*[column.desc() if descending else column for column in sort_columns])
+
+        if count_mode == 'exact':
+            paginated = ordered.paginate(page=page, per_page=per_page, error_out=False)
+            return Page(paginated.items, {
+                'total': paginated.total,
+                'pages': paginated.pages,
+                'current_page': page
+            })
+
+        # Senza COUNT esatto: si legge un elemento in più per sapere se esiste la pagina successiva
+        page = max(page, 1)
+        per_page = max(per_page, 1)
+        items = ordered.offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_more = len(items) > per_page
+        meta = {'current_page': page, 'has_more': has_more}
+        if count_mode == 'estimate':
+            total = max(estimate_count(query), (page - 1) * per_page + min(len(items), per_page))
+            meta.update({'total': total, 'pages': math.ceil(total / per_page), 'total_is_estimate': True})
+        return Page(items[:per_page], meta)
+
+    # Modalità cursore (keyset): nessun OFFSET e nessun COUNT
+    limit = max(1, min(request.args.get('limit', per_page, type=int), MAX_LIMIT))
+    cursor = request.args.get('cursor')
+    direction = 'next'
+
+    if cursor:
+        value, last_id, direction = decode_cursor(cursor, sort_column)
+        # Andando all'indietro il confronto e l'ordinamento si invertono
+        after = descending if direction == 'next' else not descending
+        if sort_column is id_column:
+            condition = id_column < last_id if after else id_column > last_id
+        elif not sort_column.expression.nullable:
+            if after:
+                condition = db.or_(sort_column < value, db.and_(sort_column == value, id_column < last_id))
+            else:
+                condition = db.or_(sort_column > value, db.and_(sort_column == value, id_column > last_id))
+        else:
+            condition = _nullable_keyset_condition(sort_column, id_column, value, last_id, after)
+        query = query.filter(condition)
+
+    reverse = (direction == 'prev')
+    scan_descending = descending != reverse
+    ordered = query.order_by(*[column.desc() if scan_descending else column for column in sort_columns])
+    items = ordered.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    if reverse:
+        items.reverse()
+
+    def cursor_for(item, cursor_direction):
+        return encode_cursor(getattr(item, sort_column.key), item.id, cursor_direction)
+
+    next_cursor = prev_cursor = None
+    if items:
+        # In avanti c'è una pagina successiva solo se abbiamo letto un elemento in più;
+        # tornando indietro la pagina successiva esiste sempre (è quella da cui veniamo)
+        if reverse or has_more:
+            next_cursor = cursor_for(items[-1], 'next')
+        if (not reverse and cursor) or (reverse and has_more):
+            prev_cursor = cursor_for(items[0], 'prev')
+
+    return Page(items, {
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'limit': limit
+    })
+
+# Paginazione delta per id (?after_id= oppure ?before_id=), per chi riprende da un elemento
+# già ricevuto: con after_id gli elementi successivi, con before_id i precedenti (per lo
+# scorrimento all'indietro). Gli elementi sono sempre in ordine crescente di id. Serve un
+# indice che termini con l'id (ad esempio (conversation_id, id)); nessun OFFSET né COUNT.
+# archive è l'eventuale tabella fredda (query, colonna id, ultimo id archiviato), che contiene
+# gli elementi con id fino all'ultimo archiviato: viene letta solo quando la pagina va oltre
+# gli elementi della tabella principale.
+def paginate_by_id(query, id_column, per_page=50, archive=None):
+    limit = max(1, min(request.args.get('limit', per_page, type=int), MAX_LIMIT))
+    if 'after_id' in request.args and 'before_id' in request.args:
+        abort(make_response(jsonify({'error': 'Usare after_id oppure before_id, non entrambi'}), 400))
+    name = 'after_id' if 'after_id' in request.args else 'before_id'
+    try:
+        boundary = int(request.args[name])
+    except ValueError:
+        abort(make_response(jsonify({'error': f'{name} non valido'}), 400))
+
+    if name == 'after_id':
+        items = []
+        if archive and boundary < archive[2]:
+            items = archive[0].filter(archive[1] > boundary).order_by(archive[1]).limit(limit + 1).all()
+        if len(items) <= limit:
+            items += query.filter(id_column > boundary).order_by(id_column).limit(limit + 1 - len(items)).all()
+    else:
+        items = query.filter(id_column < boundary).order_by(id_column.desc()).limit(limit + 1).all()
+        if archive and len(items) <= limit:
+            items += archive[0].filter(archive[1] < boundary).order_by(archive[1].desc()).limit(limit + 1 - len(items)).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    if name == 'before_id':
+        items.reverse()
+
+    return Page(items, {
+        'has_more': has_more,
+        'first_id': items[0].id if items else None,
+        'last_id': items[-1].id if items else None,
+        'limit': limit
+    })
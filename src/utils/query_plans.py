@@ -0,0 +1,119 @@
+from sqlalchemy import event
+from src.models.user import User, db
+from src.models.company.company import Company, CompanyUser
+from src.models.company.job_posting import Application, JobPosting
+from src.models.company.communication import Conversation, Message
+
+# Modello da cui prendere un id di esempio per ogni parametro di URL
+SAMPLE_MODELS = {
+    'company_id': Company,
+    'job_posting_id': JobPosting,
+    'application_id': Application,
+    'conversation_id': Conversation,
+    'message_id': Message,
+    'user_id': User
+}
+
+# Varianti della query string da provare oltre alla richiesta semplice, per endpoint
+QUERY_VARIANTS = {
+    'company_section.job_posting.get_job_postings': ['is_published=1', 'company_id={company_id}&is_published=1', 'cursor='],
+    'company_section.job_posting.search_job_postings': ['q=developer', 'q=developer&is_published=1'],
+    'company_section.job_posting.get_company_job_postings': ['is_published=1', 'cursor='],
+    'company_section.application.get_applications': ['job_posting_id={job_posting_id}', 'user_id={user_id}', 'cursor='],
+    'company_section.application.get_job_posting_applications': ['cursor=', 'status=pending'],
+    'company_section.application.get_user_applications': ['cursor='],
+    'company_section.messaging.get_company_conversations': ['cursor=', 'is_archived=1'],
+    'company_section.messaging.get_user_conversations': ['cursor=', 'is_archived=1'],
+    'company_section.messaging.get_conversation_messages': ['cursor=', 'after_id=0', 'before_id={message_id}'],
+    'company_section.messaging.sync_user_conversations': ['since='],
+    'company_section.company.get_companies': ['cursor='],
+    'company_section.company_user.get_company_users': ['cursor='],
+    'company_section.export.export_job_posting_applications': ['updated_since=2000-01-01T00:00:00'],
+    'company_section.export.export_company_job_postings': ['updated_since=2000-01-01T00:00:00']
+}
+
+# Endpoint esclusi dal controllo (file statici e risposte senza fine)
+EXCLUDED_ENDPOINTS = {'serve', 'static', 'company_section.event.get_user_events', 'company_section.event.get_company_events'}
+
+def sample_values():
+    values = {}
+    for name, model in SAMPLE_MODELS.items():
+        values[name] = db.session.query(db.func.min(model.id)).scalar()
+    values['company_user_id'] = db.session.query(db.func.min(CompanyUser.id)).scalar()
+    values['company_slug'] = db.session.query(Company.slug).order_by(Company.id).limit(1).scalar()
+    values['job_posting_slug'] = db.session.query(JobPosting.slug).order_by(JobPosting.id).limit(1).scalar()
+    return values
+
+# Costruisce le URL di tutti gli endpoint GET dell'applicazione con parametri di esempio
+def build_requests(app, values):
+    requests = []
+    adapter = app.url_map.bind('localhost')
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in EXCLUDED_ENDPOINTS:
+            continue
+        arguments = {}
+        for argument in rule.arguments:
+            if argument == 'slug':
+                arguments[argument] = values['company_slug'] if '/companies/' in rule.rule else values['job_posting_slug']
+            elif argument == 'user_id' and rule.rule.startswith('/api/company-users'):
+                arguments[argument] = values['company_user_id']
+            else:
+                arguments[argument] = values.get(argument)
+        if any(value is None for value in arguments.values()):
+            continue
+        path = adapter.build(rule.endpoint, arguments)
+        requests.append((rule.endpoint, path))
+        for variant in QUERY_VARIANTS.get(rule.endpoint, []):
+            requests.append((rule.endpoint, f'{path}?{variant.format(**values)}'))
+    return requests
+
+# Esegue EXPLAIN su una query catturata e restituisce i problemi trovati
+def explain_problems(connection, statement, parameters, ignored_tables):
+    problems = []
+    rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings().all()
+    for row in rows:
+        table = row.get('table')
+        if table in ignored_tables:
+            continue
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL':
+            problems.append(f'full scan su {table}')
+        if 'Using filesort' in extra:
+            problems.append(f'filesort su {table}')
+    return problems
+
+# Esegue tutte le richieste GET, cattura le SELECT generate e ne controlla il piano di esecuzione.
+# Restituisce una lista di (endpoint, url, sql, problemi).
+def check_query_plans(app, ignored_tables=()):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'information_schema' not in statement:
+            captured.append((statement, parameters))
+
+    with app.app_context():
+        values = sample_values()
+        requests = build_requests(app, values)
+
+    client = app.test_client()
+    failures = []
+    seen = set()
+    with app.app_context():
+        engine = db.engine
+    for endpoint, url in requests:
+        captured.clear()
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            client.get(url)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        with engine.connect() as connection:
+            for statement, parameters in list(captured):
+                key = (statement, repr(parameters))
+                if key in seen:
+                    continue
+                seen.add(key)
+                problems = explain_problems(connection, statement, parameters, set(ignored_tables))
+                if problems:
+                    failures.append((endpoint, url, statement, problems))
+    return failures
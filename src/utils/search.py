@@ -0,0 +1,269 @@
+from flask import current_app
+from src.models.company.job_posting import JobPosting
+from src.utils.events import JobPostingDeleted, JobPostingPublished, JobPostingsChanged, event_bus
+from sqlalchemy.orm import undefer_group
+from datetime import datetime
+import atexit
+import gzip
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+
+# Parole troppo comuni per essere utili nella ricerca (italiano e inglese)
+STOPWORDS = {
+    'a', 'ad', 'al', 'alla', 'alle', 'and', 'che', 'con', 'da', 'dal', 'dei', 'del', 'della', 'delle', 'di', 'e',
+    'for', 'gli', 'i', 'il', 'in', 'is', 'la', 'le', 'lo', 'nel', 'nella', 'o', 'of', 'on', 'or', 'per', 'su',
+    'the', 'to', 'tra', 'un', 'una', 'uno', 'with'
+}
+
+# Peso dei campi di un annuncio nel calcolo della frequenza dei termini
+JOB_POSTING_FIELD_WEIGHTS = {
+    'title': 3,
+    'skills': 2,
+    'description': 1,
+    'requirements': 1,
+    'responsibilities': 1
+}
+
+SNAPSHOT_VERSION = 1
+
+# Divide un testo in termini normalizzati (minuscolo, senza accenti, senza stopword)
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [token for token in re.findall(r'\w+', text) if token not in STOPWORDS]
+
+class SearchIndex:
+    # Indice invertito in memoria con punteggio BM25
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # termine -> {doc_id: frequenza}
+        self._doc_terms = {}  # doc_id -> {termine: frequenza}
+        self._doc_lengths = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_id, weighted_fields):
+        # weighted_fields: lista di coppie (testo, peso)
+        frequencies = {}
+        for text, weight in weighted_fields:
+            for token in tokenize(text):
+                frequencies[token] = frequencies.get(token, 0) + weight
+        with self._lock:
+            self._remove(doc_id)
+            self._insert(doc_id, frequencies)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _insert(self, doc_id, frequencies):
+        length = sum(frequencies.values())
+        self._doc_terms[doc_id] = frequencies
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+
+    def _remove(self, doc_id):
+        frequencies = self._doc_terms.pop(doc_id, None)
+        if frequencies is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in frequencies:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query, limit=None):
+        # Restituisce una lista di (doc_id, punteggio) ordinata per punteggio decrescente
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._doc_lengths)
+            if not terms or not count:
+                return []
+            average_length = self._total_length / count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._total_length = 0
+
+    def dump(self):
+        with self._lock:
+            return {str(doc_id): frequencies for doc_id, frequencies in self._doc_terms.items()}
+
+    def load(self, documents):
+        with self._lock:
+            self.clear()
+            for doc_id, frequencies in documents.items():
+                self._insert(int(doc_id), frequencies)
+
+class JobPostingSearch:
+    # Indice di ricerca degli annunci, caricato alla prima ricerca da snapshot o dal database
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self.loaded = False
+        self.watermark = None  # updated_at massimo garantito presente nell'indice
+        self.snapshot_path = None
+        self._dirty = False
+        self._load_lock = threading.Lock()
+        self._stale = set()  # annunci modificati da altri worker, da rileggere
+        self._stale_lock = threading.Lock()
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        with self._load_lock:
+            if self.loaded:
+                return
+            self.snapshot_path = current_app.config.get('SEARCH_INDEX_PATH')
+            if not (self.snapshot_path and self.load_snapshot(self.snapshot_path)):
+                self.rebuild()
+            else:
+                # Recupera le modifiche avvenute dopo lo snapshot
+                self.catch_up()
+            if self.snapshot_path:
+                atexit.register(self.save_on_exit)
+            self.loaded = True
+
+    @staticmethod
+    def weighted_fields(job_posting):
+        skills = job_posting.skills
+        try:
+            parsed = json.loads(skills) if skills else None
+            if isinstance(parsed, list):
+                skills = ' '.join(str(skill) for skill in parsed)
+        except ValueError:
+            pass
+        values = {
+            'title': job_posting.title,
+            'skills': skills,
+            'description': job_posting.description,
+            'requirements': job_posting.requirements,
+            'responsibilities': job_posting.responsibilities
+        }
+        return [(values[field], weight) for field, weight in JOB_POSTING_FIELD_WEIGHTS.items()]
+
+    def add(self, job_posting):
+        self.index.add(job_posting.id, self.weighted_fields(job_posting))
+        self._dirty = True
+
+    def remove(self, job_posting_id):
+        self.index.remove(job_posting_id)
+        self._dirty = True
+
+    def _index_query(self, query):
+        watermark = self.watermark
+        # I testi indicizzati sono colonne differite: vanno caricati nella stessa SELECT
+        for job_posting in query.options(undefer_group('details')).order_by(JobPosting.id).yield_per(500):
+            self.add(job_posting)
+            if job_posting.updated_at and (watermark is None or job_posting.updated_at > watermark):
+                watermark = job_posting.updated_at
+        self.watermark = watermark
+
+    def rebuild(self):
+        self.index.clear()
+        self.watermark = None
+        self._index_query(JobPosting.query)
+        self._dirty = True
+        return len(self.index)
+
+    def catch_up(self):
+        query = JobPosting.query
+        if self.watermark:
+            # ">=" perché updated_at ha la risoluzione del secondo
+            query = query.filter(JobPosting.updated_at >= self.watermark)
+        self._index_query(query)
+
+    def mark_stale(self, job_posting_ids):
+        if self.loaded:
+            with self._stale_lock:
+                self._stale.update(job_posting_ids)
+
+    def refresh_stale(self):
+        with self._stale_lock:
+            job_posting_ids, self._stale = self._stale, set()
+        if not job_posting_ids:
+            return
+        found = set()
+        for job_posting in JobPosting.query.options(undefer_group('details')).filter(JobPosting.id.in_(job_posting_ids)):
+            self.add(job_posting)
+            found.add(job_posting.id)
+        for job_posting_id in job_posting_ids - found:
+            self.remove(job_posting_id)
+
+    def search(self, query, limit=None):
+        self.ensure_loaded()
+        self.refresh_stale()
+        return self.index.search(query, limit)
+
+    def save_snapshot(self, path):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'documents': self.index.dump()
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Scrittura atomica: file temporaneo e poi rename
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as file:
+            file.write(json.dumps(snapshot, separators=(',', ':')).encode())
+        os.replace(tmp_path, path)
+        self._dirty = False
+
+    def load_snapshot(self, path):
+        try:
+            with gzip.open(path, 'rb') as file:
+                snapshot = json.loads(file.read())
+        except (OSError, ValueError):
+            return False
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return False
+        self.index.load(snapshot['documents'])
+        self.watermark = datetime.fromisoformat(snapshot['watermark']) if snapshot['watermark'] else None
+        return True
+
+    def save_on_exit(self):
+        if self._dirty and self.snapshot_path:
+            self.save_snapshot(self.snapshot_path)
+
+job_posting_search = JobPostingSearch()
+
+# Annunci creati, modificati, pubblicati o eliminati, anche dagli altri worker: vengono
+# riletti dal database (o rimossi) alla ricerca successiva. Se l'indice non è ancora caricato
+# le modifiche verranno lette dal database al primo caricamento.
+@event_bus.subscribe(JobPostingsChanged, remote=True)
+def _job_postings_changed(event):
+    job_posting_search.mark_stale(event.job_posting_ids)
+
+@event_bus.subscribe([JobPostingPublished, JobPostingDeleted], remote=True)
+def _job_posting_changed(event):
+    job_posting_search.mark_stale([event.job_posting_id])
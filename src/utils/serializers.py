@@ -0,0 +1,95 @@
+from sqlalchemy import Column, Date, DateTime, Numeric, Time, inspect
+from sqlalchemy.orm import undefer_group
+import threading
+
+# Serializzatori generati una sola volta per modello (e sottoinsieme di campi) a partire dai
+# metadati delle colonne: una funzione con un unico dizionario letterale, senza cicli né getattr.
+# Ogni modello dichiara serialize_fields (campi e ordine di to_dict) ed eventualmente
+# serialize_presets (sottoinsiemi con nome, ad esempio per le risposte annidate).
+_serializers = {}
+_serializers_lock = threading.Lock()
+
+def _value_expression(getter, column):
+    if isinstance(column.type, (DateTime, Date, Time)):
+        return f'(value.isoformat() if (value := {getter}) is not None else None)'
+    if isinstance(column.type, Numeric) and column.type.asdecimal:
+        return f'(float(value) if (value := {getter}) is not None else None)'
+    return getter
+
+# Campo -> (attributo del modello, colonna). I campi si indicano con il nome della colonna
+# (quello esposto nelle risposte) o dell'attributo, che di solito coincidono
+def field_columns(model):
+    columns = {}
+    for attribute in inspect(model).column_attrs:
+        column = attribute.columns[0]
+        columns[attribute.key] = (attribute.key, column)
+        # Le proprietà calcolate (column_property su un'espressione) hanno solo il nome dell'attributo
+        if isinstance(column, Column):
+            columns[column.name] = (attribute.key, column)
+    return columns
+
+def compile_serializer(model, fields):
+    columns = field_columns(model)
+    # Percorso veloce: valori letti direttamente da __dict__ dell'istanza (senza passare dai
+    # descrittori di SQLAlchemy). Se una colonna non è caricata (scaduta o differita) si usa
+    # l'accesso normale agli attributi, che la carica.
+    fast = ['    state = obj.__dict__', '    try:', '        return {']
+    slow = ['def load_and_serialize(obj):', '    return {']
+    for field in fields:
+        attribute, column = columns[field]
+        fast.append(f'            {field!r}: {_value_expression(f"state[{attribute!r}]", column)},')
+        slow.append(f'        {field!r}: {_value_expression(f"obj.{attribute}", column)},')
+    fast += ['        }', '    except KeyError:', '        return load_and_serialize(obj)']
+    slow.append('    }')
+    source = '\n'.join(slow + ['', 'def serialize(obj):'] + fast)
+    namespace = {}
+    exec(compile(source, f'<serializer {model.__name__}>', 'exec'), namespace)
+    return namespace['serialize']
+
+# Risolve fields (None, nome di un preset o sequenza di campi) nella tupla di campi da serializzare
+def resolve_fields(model, fields=None):
+    if fields is None:
+        return model.serialize_fields
+    if isinstance(fields, str):
+        presets = getattr(model, 'serialize_presets', {})
+        if fields not in presets:
+            raise ValueError(f'Preset non valido per {model.__name__}: {fields}')
+        return presets[fields]
+    fields = tuple(fields)
+    unknown = [field for field in fields if field not in model.serialize_fields]
+    if unknown:
+        raise ValueError(f'Campi non validi per {model.__name__}: {", ".join(unknown)}')
+    return fields
+
+def get_serializer(model, fields=None):
+    fields = resolve_fields(model, fields)
+    key = (model, fields)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.get(key)
+            if serializer is None:
+                serializer = _serializers[key] = compile_serializer(model, fields)
+    return serializer
+
+# Opzioni di caricamento per serializzare fields: i gruppi di colonne differite (db.deferred)
+# che contengono campi richiesti vengono caricati nella stessa SELECT (una query per gruppo
+# altrimenti, al primo accesso di ogni istanza)
+def serialization_options(model, fields=None):
+    columns = field_columns(model)
+    groups = []
+    for field in resolve_fields(model, fields):
+        group = inspect(model).attrs[columns[field][0]].group
+        if group is not None and group not in groups:
+            groups.append(group)
+    return [undefer_group(group) for group in groups]
+
+def serialize(obj, fields=None):
+    return get_serializer(type(obj), fields)(obj)
+
+def serialize_many(objs, fields=None):
+    objs = list(objs)
+    if not objs:
+        return []
+    serializer = get_serializer(type(objs[0]), fields)
+    return [serializer(obj) for obj in objs]
@@ -0,0 +1,24 @@
+from sqlalchemy.dialects import mysql, sqlite
+from src.models.user import db
+
+# Costruisce un INSERT ... ON DUPLICATE KEY UPDATE (MySQL) o ON CONFLICT DO UPDATE (SQLite)
+# per le righe indicate: le colonne in "increment" vengono sommate al valore esistente,
+# quelle in "replace" sovrascritte.
+def upsert_statement(model, rows, increment=(), replace=()):
+    table = model.__table__
+    if db.engine.dialect.name == 'mysql':
+        statement = mysql.insert(table).values(rows)
+        inserted = statement.inserted
+        updates = {column: table.c[column] + inserted[column] for column in increment}
+        updates.update({column: inserted[column] for column in replace})
+        return statement.on_duplicate_key_update(**updates)
+
+    statement = sqlite.insert(table).values(rows)
+    excluded = statement.excluded
+    updates = {column: table.c[column] + excluded[column] for column in increment}
+    updates.update({column: excluded[column] for column in replace})
+    return statement.on_conflict_do_update(index_elements=[column.name for column in table.primary_key], set_=updates)
+
+def upsert(model, rows, increment=(), replace=()):
+    if rows:
+        db.session.execute(upsert_statement(model, rows, increment, replace))
@@ -0,0 +1,131 @@
+from flask import current_app
+from src.models.company.job_posting import JobPosting, db
+from src.utils import company_stats
+from src.utils.entity_cache import entity_cache
+from src.utils.job_posting_stats import record_daily_views
+from datetime import datetime
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di annunci aggiornati da ogni singola UPDATE
+FLUSH_CHUNK_SIZE = 500
+
+class ViewCounter:
+    # Contatore delle visualizzazioni in memoria: aggrega gli incrementi per annuncio
+    # e li scrive periodicamente con UPDATE atomiche (views_count = views_count + n)
+
+    def __init__(self):
+        self.app = None
+        self.flush_interval = 5
+        self.max_pending_postings = 1000
+        self.max_pending_views = 10000
+        self._pending = {}
+        self._pending_daily = {}  # (job_posting_id, giorno) -> visualizzazioni, per le serie storiche
+        self._pending_views = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 5)
+        self.max_pending_postings = app.config.get('VIEW_COUNTER_MAX_PENDING_POSTINGS', 1000)
+        self.max_pending_views = app.config.get('VIEW_COUNTER_MAX_PENDING_VIEWS', 10000)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self.app is None:
+                self.init_app(current_app._get_current_object())
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def increment(self, job_posting_id, count=1):
+        self._ensure_started()
+        with self._lock:
+            self._pending[job_posting_id] = self._pending.get(job_posting_id, 0) + count
+            key = (job_posting_id, datetime.utcnow().date())
+            self._pending_daily[key] = self._pending_daily.get(key, 0) + count
+            self._pending_views += count
+            full = len(self._pending) >= self.max_pending_postings or self._pending_views >= self.max_pending_views
+        if full:
+            # Anticipa lo scaricamento senza bloccare la richiesta
+            self._wakeup.set()
+
+    def pending(self, job_posting_id):
+        with self._lock:
+            return self._pending.get(job_posting_id, 0)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Scaricamento del contatore delle visualizzazioni fallito')
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                daily_batch = self._pending_daily
+                self._pending = {}
+                self._pending_daily = {}
+                self._pending_views = 0
+            if not batch:
+                return 0
+            try:
+                with self.app.app_context():
+                    self.write(batch, daily_batch)
+            except Exception:
+                # Rimetti in coda gli incrementi non scritti
+                with self._lock:
+                    for job_posting_id, count in batch.items():
+                        self._pending[job_posting_id] = self._pending.get(job_posting_id, 0) + count
+                        self._pending_views += count
+                    for key, count in daily_batch.items():
+                        self._pending_daily[key] = self._pending_daily.get(key, 0) + count
+                raise
+            return len(batch)
+
+    def write(self, batch, daily_batch):
+        job_posting_ids = sorted(batch)
+        for start in range(0, len(job_posting_ids), FLUSH_CHUNK_SIZE):
+            chunk = {job_posting_id: batch[job_posting_id] for job_posting_id in job_posting_ids[start:start + FLUSH_CHUNK_SIZE]}
+            # Una sola UPDATE per blocco; updated_at resta invariato perché le visualizzazioni non modificano l'annuncio
+            db.session.execute(
+                db.update(JobPosting)
+                .where(JobPosting.id.in_(chunk))
+                .values(
+                    views_count=db.func.coalesce(JobPosting.views_count, 0) + db.case(chunk, value=JobPosting.id, else_=0),
+                    updated_at=JobPosting.updated_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            company_stats.record_views(chunk)
+        record_daily_views(daily_batch)
+        db.session.commit()
+        # Le UPDATE in blocco non passano dagli eventi ORM: i contatori in cache vanno invalidati qui
+        entity_cache.invalidate(JobPosting, job_posting_ids)
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Scaricamento finale del contatore delle visualizzazioni fallito')
+
+view_counter = ViewCounter()